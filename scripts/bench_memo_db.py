@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+备忘录数据库访问延迟对比：每次操作新建连接（原有方式） vs 线程级长连接
+分别统计列表查询、新增、搜索三类操作的 p50 / p99 延迟
+
+用法：python scripts/bench_memo_db.py [--rows 2000] [--ops 500] [--threads 4]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from zapp.services.sqlite_manager import SQLiteConnectionManager
+
+CREATE_SQL = '''
+    CREATE TABLE IF NOT EXISTS memos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+'''
+
+
+def prepare_db(path, rows):
+    with sqlite3.connect(path) as conn:
+        conn.execute(CREATE_SQL)
+        conn.executemany(
+            'INSERT INTO memos (content, created_at) VALUES (?, ?)',
+            [(f'备忘录内容 {i} 明天上午开会写周报', '2025-01-01 00:00:00') for i in range(rows)]
+        )
+
+
+class FreshConnectionStore:
+    """原有实现：每次操作都 sqlite3.connect 一个新连接"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def list(self):
+        with sqlite3.connect(self.path) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(r) for r in conn.execute('SELECT * FROM memos ORDER BY id DESC').fetchall()]
+
+    def add(self, content):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute('INSERT INTO memos (content, created_at) VALUES (?, ?)', (content, '2025-01-01 00:00:00'))
+            conn.commit()
+
+    def search(self, keyword):
+        with sqlite3.connect(self.path) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(r) for r in conn.execute(
+                'SELECT * FROM memos WHERE content LIKE ? ORDER BY id DESC', (f'%{keyword}%',)).fetchall()]
+
+
+class PooledConnectionStore:
+    """新实现：线程级长连接 + WAL等PRAGMA"""
+
+    def __init__(self, path):
+        self.path = path
+        self.manager = SQLiteConnectionManager()
+
+    def list(self):
+        conn = self.manager.get_connection(self.path)
+        with conn:
+            return [dict(r) for r in conn.execute('SELECT * FROM memos ORDER BY id DESC').fetchall()]
+
+    def add(self, content):
+        conn = self.manager.get_connection(self.path)
+        with conn:
+            conn.execute('INSERT INTO memos (content, created_at) VALUES (?, ?)', (content, '2025-01-01 00:00:00'))
+
+    def search(self, keyword):
+        conn = self.manager.get_connection(self.path)
+        with conn:
+            return [dict(r) for r in conn.execute(
+                'SELECT * FROM memos WHERE content LIKE ? ORDER BY id DESC', (f'%{keyword}%',)).fetchall()]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def run(store, ops, threads):
+    workloads = {
+        'list': lambda i: timed(store.list),
+        'add': lambda i: timed(store.add, f'新增备忘录 {i}'),
+        'search': lambda i: timed(store.search, f'{i % 100} 明天'),
+    }
+    results = {}
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for name, func in workloads.items():
+            samples = list(pool.map(func, range(ops)))
+            results[name] = (percentile(samples, 50), percentile(samples, 99), statistics.mean(samples))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='备忘录数据库访问延迟对比')
+    parser.add_argument('--rows', type=int, default=2000, help='预置备忘录条数')
+    parser.add_argument('--ops', type=int, default=500, help='每类操作执行次数')
+    parser.add_argument('--threads', type=int, default=4, help='并发线程数（模拟worker线程）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"预置 {args.rows} 条备忘录，每类操作 {args.ops} 次，{args.threads} 个线程")
+        print(f"{'方式':<8} | {'操作':<6} | {'p50(ms)':>8} | {'p99(ms)':>8} | {'平均(ms)':>8}")
+        print('-' * 52)
+        for label, store_cls in (('fresh', FreshConnectionStore), ('pooled', PooledConnectionStore)):
+            path = os.path.join(tmp, f'{label}.db')
+            prepare_db(path, args.rows)
+            for name, (p50, p99, mean) in run(store_cls(path), args.ops, args.threads).items():
+                print(f"{label:<8} | {name:<6} | {p50:>8.3f} | {p99:>8.3f} | {mean:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+敏感词检查性能对比：原有逐词循环 vs Aho-Corasick自动机
+分别在 1k / 10k / 全量(约51k) 敏感词规模下测试
+
+用法：python scripts/bench_sensitive_words.py [--repeat 20]
+"""
+
+import argparse
+import base64
+import os
+import random
+import sys
+import time
+
+# 添加项目根目录到路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from zapp.services.sensitive_matcher import AhoCorasickMatcher
+
+WORDS_FILE = os.path.join(PROJECT_ROOT, 'zapp', 'services', 'sensitive_words.txt')
+
+
+def load_words():
+    """与MemoService._load_sensitive_words相同的解码逻辑"""
+    words = []
+    with open(WORDS_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            encoded_word = line.strip()
+            if not encoded_word:
+                continue
+            try:
+                words.append(base64.b64decode(encoded_word).decode('utf-8'))
+            except (base64.binascii.Error, UnicodeDecodeError):
+                continue
+    return words
+
+
+def loop_check(words, content):
+    """原有实现：对每个敏感词做小写转换和子串查找"""
+    content_lower = content.lower()
+    for keyword in words:
+        if keyword.lower() in content_lower:
+            return True
+    return False
+
+
+def make_contents(matcher, count=50):
+    """生成不含敏感词的典型备忘录内容（最坏情况：原有实现需要扫描全部敏感词）"""
+    random.seed(42)
+    phrases = ['明天上午开会', '写周报', '运动半小时', '读书笔记', '多喝水早睡', '整理房间', '复习功课']
+    contents = []
+    while len(contents) < count:
+        content = '，'.join(random.choice(phrases) for _ in range(random.randint(2, 40)))
+        if not matcher.contains(content):
+            contents.append(content)
+    return contents
+
+
+def bench(func, contents, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for content in contents:
+            func(content)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(contents)) * 1e6  # 每次检查耗时（微秒）
+
+
+def main():
+    parser = argparse.ArgumentParser(description='敏感词检查性能对比')
+    parser.add_argument('--repeat', type=int, default=20, help='每组内容重复次数')
+    args = parser.parse_args()
+
+    all_words = load_words()
+    contents = make_contents(AhoCorasickMatcher(all_words))
+
+    print(f"敏感词总数: {len(all_words)}，测试内容: {len(contents)} 条")
+    print(f"{'规模':>8} | {'构建(ms)':>10} | {'循环(us/次)':>12} | {'自动机(us/次)':>14} | {'加速比':>8}")
+    print('-' * 66)
+
+    for size in (1000, 10000, len(all_words)):
+        words = all_words[:size]
+        start = time.perf_counter()
+        matcher = AhoCorasickMatcher(words)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # 结果一致性校验
+        for content in contents:
+            assert loop_check(words, content) == matcher.contains(content)
+
+        loop_us = bench(lambda c: loop_check(words, c), contents, max(1, args.repeat // 10))
+        ac_us = bench(matcher.contains, contents, args.repeat)
+        print(f"{size:>8} | {build_ms:>10.1f} | {loop_us:>12.1f} | {ac_us:>14.1f} | {loop_us / ac_us:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态文件接口的内存与吞吐对比：整体读入内存（原有实现：读出整个文件后 HttpResponse）
+vs FileResponse 按块迭代 vs sendfile（模拟 gunicorn 的 wsgi.file_wrapper）
+
+每种方式、每个文件大小都在独立子进程中运行，统计峰值RSS的增量和吞吐量。
+
+用法：python scripts/bench_static_files.py [--sizes 200K,10M,200M] [--repeat 5]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+MODES = ('buffered', 'stream', 'sendfile')
+UNITS = {'K': 1024, 'M': 1024 * 1024}
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(text[:-1]) * UNITS[text[-1]]
+    return int(text)
+
+
+def peak_rss_kb():
+    # Linux 下 ru_maxrss 以KB为单位，macOS 下为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def serve_once(mode, path, sink):
+    """模拟一次请求：构造响应并把响应体写到 /dev/null"""
+    from zapp.services.static_service import guess_mime_type, stream_file_response
+    from django.http import HttpResponse
+
+    if mode == 'buffered':
+        with open(path, 'rb') as f:
+            content = f.read()
+        response = HttpResponse(content, content_type=guess_mime_type(path))
+        os.write(sink, response.content)
+        return
+    response = stream_file_response(path)
+    try:
+        if mode == 'stream':
+            for chunk in response:
+                os.write(sink, chunk)
+        else:
+            source = response.file_to_stream
+            offset, remaining = 0, os.fstat(source.fileno()).st_size
+            while remaining:
+                sent = os.sendfile(sink, source.fileno(), offset, remaining)
+                offset += sent
+                remaining -= sent
+    finally:
+        response.close()
+
+
+def worker(mode, path, repeat):
+    """子进程入口：输出 峰值RSS增量(KB) 和 吞吐(MB/s)"""
+    import django
+    from django.conf import settings
+    settings.configure()
+    django.setup()
+
+    import zapp.services.static_service  # noqa: F401  先导入模块，避免计入RSS增量
+    with open(path, 'rb') as f:  # 预热页缓存
+        while f.read(1024 * 1024):
+            pass
+    sink = os.open(os.devnull, os.O_WRONLY)
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        serve_once(mode, path, sink)
+    elapsed = time.perf_counter() - start
+    os.close(sink)
+    size_mb = os.path.getsize(path) * repeat / (1024 * 1024)
+    print(peak_rss_kb() - baseline, size_mb / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='静态文件接口内存与吞吐对比')
+    parser.add_argument('--sizes', default='200K,10M,200M', help='测试文件大小，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=5, help='每种方式重复请求次数')
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], args.worker[1], args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"每种方式重复 {args.repeat} 次")
+        print(f"{'大小':<8} | {'方式':<9} | {'峰值RSS增量(MB)':>16} | {'吞吐(MB/s)':>10}")
+        print('-' * 54)
+        for label in args.sizes.split(','):
+            path = os.path.join(tmp, f'bench_{label.strip()}.mp3')
+            with open(path, 'wb') as f:
+                remaining = parse_size(label)
+                while remaining:
+                    chunk = os.urandom(min(remaining, 1024 * 1024))
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            for mode in MODES:
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--repeat', str(args.repeat),
+                     '--worker', mode, path],
+                    check=True, capture_output=True, text=True,
+                ).stdout.split()
+                rss_kb, throughput = int(output[0]), float(output[1])
+                print(f"{label.strip():<8} | {mode:<9} | {rss_kb / 1024:>16.1f} | {throughput:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把 zapp/services/sensitive_words.txt 编译为二进制词库（部署时执行一次即可）
+
+MemoService 启动时发现词库缺失或与源文件不一致也会自动编译，
+提前执行可以避免第一个 worker 启动时的编译耗时。
+
+用法：python scripts/build_sensitive_lexicon.py [--source 源文件] [--output 输出文件]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from zapp.services.sensitive_lexicon import CompiledLexicon, build_lexicon
+
+DEFAULT_SOURCE = os.path.join(PROJECT_ROOT, 'zapp', 'services', 'sensitive_words.txt')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='编译敏感词词库')
+    parser.add_argument('--source', default=DEFAULT_SOURCE, help='base64编码的敏感词文件')
+    parser.add_argument('--output', default=None, help='输出路径（默认与源文件同目录）')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    lexicon_path = build_lexicon(args.source, args.output)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    lexicon = CompiledLexicon(lexicon_path)
+    print(f"✅ 词库已生成: {lexicon_path}")
+    print(f"   词条数: {len(lexicon)}，版本: {lexicon.version}")
+    print(f"   文件大小: {os.path.getsize(lexicon_path) / 1024:.1f} KB，耗时: {elapsed:.0f} ms")
+    lexicon.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+为静态目录中可压缩的文件（txt、字体等）预先生成 .gz 副本（部署或 collectstatic 后执行）
+
+副本的mtime与源文件一致：源文件未变化时跳过，变化后重新生成；
+static_file_access 只发送与源文件mtime一致的副本，过期副本不会被使用。
+
+用法：python scripts/compress_static.py [目录 ...]（默认 STATIC_ROOT）
+"""
+
+import argparse
+import os
+import sys
+
+# 添加项目根目录到路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from zapp.services.static_service import compress_static_dir
+
+# 与 settings.STATIC_ROOT 一致；assets 目录会被 /api/getAllCodes/ 列出，不放副本
+DEFAULT_DIRS = [os.path.join(PROJECT_ROOT, 'staticfiles')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预先生成静态文件的gzip副本')
+    parser.add_argument('dirs', nargs='*', default=DEFAULT_DIRS, help='静态文件目录')
+    args = parser.parse_args()
+
+    for root in args.dirs:
+        if not os.path.isdir(root):
+            print(f"⚠️ 跳过不存在的目录: {root}")
+            continue
+        for path, status in compress_static_dir(root):
+            line = f"{status:<8} {os.path.relpath(path, PROJECT_ROOT)}"
+            if status != 'skipped':
+                line += f"  {os.path.getsize(path) / 1024:.1f} KB -> {os.path.getsize(path + '.gz') / 1024:.1f} KB"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
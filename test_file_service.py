@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试资源目录列表及其缓存、静态文件的base64响应
+使用临时目录，不依赖数据库
+"""
+
+import sys
+import os
+import base64
+import json
+import mimetypes
+import tempfile
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 设置Django环境变量（接口测试需要）
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zproject.settings')
+
+import django
+django.setup()
+
+from django.test import Client, override_settings
+from django.utils.http import http_date
+
+from zapp.services import file_service
+from zapp.services.file_service import get_base64_response, get_directory_contents, get_directory_listing
+
+
+def make_assets(tmp):
+    """在临时目录中创建几个资源文件"""
+    files = {'a.txt': '贵州茅台(600519)', 'b.mp3': 'ID3', 'notes.txt': 'x' * 50}
+    for name, content in files.items():
+        with open(os.path.join(tmp, name), 'w', encoding='utf-8') as f:
+            f.write(content)
+    os.mkdir(os.path.join(tmp, 'sub'))
+    return files
+
+
+def test_directory_contents():
+    """测试按名称排序、过滤、分页以及txt内容按需返回"""
+    print("\n=== 测试目录列表 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_assets(tmp)
+
+        data = get_directory_contents(tmp)["data"]
+        assert [item["name"] for item in data["items"]] == ['a.txt', 'b.mp3', 'notes.txt', 'sub']
+        assert data["total"] == 4 and data["count"] == 4
+        # 默认不返回txt内容；目录没有大小
+        assert all(item["content"] is None for item in data["items"])
+        assert data["items"][1]["size"] == 3 and data["items"][3]["size"] is None
+        assert data["items"][3]["type"] == "directory"
+
+        data = get_directory_contents(tmp, pattern='*.txt', content_pattern='a.txt', preview_size=10)["data"]
+        items = {item["name"]: item for item in data["items"]}
+        assert list(items) == ['a.txt', 'notes.txt']
+        assert items['a.txt']["content"] == '贵州茅台(600519)' and not items['a.txt']["truncated"]
+        assert items['notes.txt']["content"] == 'x' * 10 and items['notes.txt']["truncated"]
+
+        data = get_directory_contents(tmp, limit=2, offset=1)["data"]
+        assert [item["name"] for item in data["items"]] == ['b.mp3', 'notes.txt']
+        assert data["total"] == 4 and data["offset"] == 1 and data["count"] == 2
+
+        assert get_directory_contents(tmp, offset=-1)["code"] == 400
+        assert get_directory_contents(os.path.join(tmp, 'missing'))["code"] == 404
+        assert get_directory_contents(os.path.join(tmp, 'a.txt'))["code"] == 400
+        print("✓ 排序、过滤、分页及内容按需读取")
+
+
+def test_directory_listing_cache():
+    """测试目录列表缓存按stat校验，以及 getAllCodes 接口的ETag/Last-Modified/304"""
+    print("\n=== 测试目录列表缓存与304 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_assets(tmp)
+        options = {"content_pattern": 'a.txt'}
+        result, body, etag, last_modified = get_directory_listing(tmp, **options)
+        assert result["code"] == 200 and etag
+        # 未变化时直接返回缓存的JSON字节
+        assert get_directory_listing(tmp, **options)[1] is body
+        # 不同参数各自缓存
+        assert get_directory_listing(tmp, pattern='*.mp3')[2] != etag
+
+        # 文件内容变化（大小和mtime都变）后重新读取
+        path = os.path.join(tmp, 'a.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('平安银行(000001)')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+        result, new_body, new_etag, _ = get_directory_listing(tmp, **options)
+        assert new_etag != etag and new_body is not body
+        assert result["data"]["items"][0]["content"] == '平安银行(000001)'
+
+        # 新增文件改变目录的mtime（再推后一点，避免与缓存时的mtime落在同一时间粒度内）
+        with open(os.path.join(tmp, 'c.txt'), 'w') as f:
+            f.write('c')
+        os.utime(tmp, ns=(0, os.stat(tmp).st_mtime_ns + 5_000_000_000))
+        assert get_directory_listing(tmp, **options)[0]["data"]["total"] == 5
+
+        with override_settings(ASSETS_DIR=tmp):
+            client = Client(HTTP_HOST='localhost')
+            response = client.get('/api/getAllCodes/', {'content': 'a.txt'})
+            etag, last_modified = response["ETag"], response["Last-Modified"]
+            assert response.status_code == 200 and response.json()["data"]["total"] == 5
+            assert client.get('/api/getAllCodes/', {'content': 'a.txt'}, HTTP_IF_NONE_MATCH=etag).status_code == 304
+            assert client.get('/api/getAllCodes/', {'content': 'a.txt'},
+                              HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+            # If-None-Match 优先于 If-Modified-Since
+            assert client.get('/api/getAllCodes/', {'content': 'a.txt'}, HTTP_IF_NONE_MATCH='"other"',
+                              HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 200
+            assert client.get('/api/getAllCodes/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+            assert client.get('/api/getAllCodes/', {'limit': 'x'}).status_code == 400
+            assert client.get('/api/getAllCodes/', {'content': 'a.txt'},
+                              HTTP_IF_MODIFIED_SINCE=http_date(0)).status_code == 200
+        print(f"✓ ETag {etag}")
+
+
+def legacy_base64_body(path):
+    """原先的实现：整个文件读入内存，base64编码后由 JsonResponse 序列化"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return json.dumps({
+        "code": 200,
+        "data": {
+            "content": base64.b64encode(content).decode('utf-8'),
+            "mime_type": mimetypes.guess_type(path)[0] or 'application/octet-stream',
+            "encoding": "base64"
+        },
+        "message": "success"
+    }).encode('utf-8')
+
+
+def test_base64_response():
+    """测试base64响应体（缓存及流式）与原先 json.dumps 的输出逐字节一致，文件变化后缓存失效"""
+    print("\n=== 测试base64响应 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'beep.mp3')
+        for size in (0, 1, 2, 3, 1000):
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size))
+            os.utime(path, ns=(0, size * 1_000_000_000))
+            expected = legacy_base64_body(path)
+            body, length = get_base64_response(path)
+            assert body == expected and length == len(expected), size
+
+        # 大文件按块流式编码（块边界不影响结果）
+        threshold = file_service.BASE64_STREAM_THRESHOLD
+        file_service.BASE64_STREAM_THRESHOLD = 100
+        try:
+            with open(path, 'wb') as f:
+                f.write(os.urandom(file_service.BASE64_CHUNK_SIZE * 2 + 7))
+            expected = legacy_base64_body(path)
+            stream, length = get_base64_response(path)
+            assert not isinstance(stream, bytes)
+            assert b''.join(stream) == expected and length == len(expected)
+        finally:
+            file_service.BASE64_STREAM_THRESHOLD = threshold
+
+        # 缓存按 (路径, mtime, size) 命中；内容改变但大小不变时靠mtime失效
+        with open(path, 'wb') as f:
+            f.write(b'a' * 30)
+        first, _ = get_base64_response(path)
+        assert get_base64_response(path)[0] is first
+        with open(path, 'wb') as f:
+            f.write(b'b' * 30)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+        second, _ = get_base64_response(path)
+        assert second != first and second == legacy_base64_body(path)
+        # 旧版本已从缓存中移除
+        assert [key for key in file_service._base64_cache if key[0] == path] == [
+            (path, os.stat(path).st_mtime_ns, 30, 'audio/mpeg')]
+        print("✓ 响应体一致，mtime变化后重新编码")
+
+
+if __name__ == "__main__":
+    print("开始测试资源目录列表...")
+
+    test_directory_contents()
+    test_directory_listing_cache()
+    test_base64_response()
+
+    print("\n所有资源目录列表测试完成！")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试备忘录存储层：连接复用、全文索引、分页、数据版本与批量操作
+每个测试使用临时目录中的数据库和敏感词文件
+"""
+
+import sys
+import os
+import asyncio
+import base64
+import sqlite3
+import tempfile
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 设置Django环境变量（写入时间需要读取时区配置）
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zproject.settings')
+
+import django
+django.setup()
+
+from zapp.services.memo_service import AsyncMemoService, MemoService
+
+
+def make_service(tmp, words=('forbidden',)):
+    """在临时目录中创建使用独立数据库和敏感词文件的 MemoService"""
+    source = os.path.join(tmp, 'words.txt')
+    with open(source, 'w', encoding='utf-8') as f:
+        for word in words:
+            f.write(base64.b64encode(word.encode('utf-8')).decode('utf-8') + '\n')
+    return MemoService(db_path=os.path.join(tmp, 'memo.db'), sensitive_words_file=source)
+
+
+def test_connection_reuse():
+    """测试同一线程复用同一个连接、不同线程各自持有连接，且连接启用了WAL"""
+    print("\n=== 测试连接复用 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(tmp)
+        conn = service._get_connection()
+        assert service._get_connection() is conn
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(service._get_connection()))
+        thread.start()
+        thread.join()
+        assert other[0] is not conn
+
+        service.add_memo('写入后其他线程可见')
+        assert len(service.get_all_memos()) == 1
+        service._connections.close()
+        assert service._get_connection() is not conn
+        print("✓ 同线程复用，跨线程隔离")
+
+
+def test_fts_migration_and_search():
+    """测试旧数据库（无全文索引）迁移后可搜到已有数据，新增/删除后索引同步，短关键词走LIKE"""
+    print("\n=== 测试全文索引迁移与搜索 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 按旧版本的表结构创建数据库
+        conn = sqlite3.connect(os.path.join(tmp, 'memo.db'))
+        conn.execute('''
+            CREATE TABLE memos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                content TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        conn.executemany('INSERT INTO memos (content, created_at) VALUES (?, ?)', [
+            ('周一下午开会讨论预算', '2024-01-01 10:00:00'),
+            ('买牛奶和面包', '2024-01-02 10:00:00'),
+        ])
+        conn.commit()
+        conn.close()
+
+        service = make_service(tmp)
+        assert service._fts_enabled
+        # 迁移时回填已有数据
+        assert [m["id"] for m in service.search_memos('讨论预算')] == [1]
+
+        memo = service.add_memo('下周讨论预算调整')
+        assert [m["id"] for m in service.search_memos('讨论预算')] == [memo["id"], 1]
+        assert service.delete_memo(1)
+        assert [m["id"] for m in service.search_memos('讨论预算')] == [memo["id"]]
+
+        # 少于3个字符的关键词使用LIKE
+        assert [m["id"] for m in service.search_memos('牛奶')] == [2]
+        assert [m["id"] for m in service.search_memos('预算')] == [memo["id"]]
+        assert service.search_memos('不存在的内容') == []
+        # 含引号的关键词按字面匹配，不会被当作FTS语法
+        assert service.search_memos('"预算" OR x') == []
+        print("✓ 回填、增删同步及LIKE回退")
+
+
+def test_keyset_pagination():
+    """测试游标分页的页边界、next_before_id 及参数校验"""
+    print("\n=== 测试游标分页 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(tmp)
+        ids = [service.add_memo(f'备忘录{i}')["id"] for i in range(5)]
+
+        first = service.get_memos_page(limit=2)
+        assert [m["id"] for m in first["items"]] == [ids[4], ids[3]]
+        assert first["has_more"] and first["next_before_id"] == ids[3]
+
+        second = service.get_memos_page(before_id=first["next_before_id"], limit=2)
+        assert [m["id"] for m in second["items"]] == [ids[2], ids[1]]
+        # 最后一页正好取完：不再有下一页
+        last = service.get_memos_page(before_id=str(second["next_before_id"]), limit='1')
+        assert [m["id"] for m in last["items"]] == [ids[0]]
+        assert not last["has_more"] and last["next_before_id"] is None
+
+        # 分页过程中插入新数据不影响后续页
+        service.add_memo('新插入的备忘录')
+        again = service.get_memos_page(before_id=first["next_before_id"], limit=2)
+        assert again["items"] == second["items"]
+
+        for before_id, limit in ((0, 2), ('abc', 2), (None, 0), (None, 101), (None, True)):
+            try:
+                service.get_memos_page(before_id=before_id, limit=limit)
+                assert False, (before_id, limit)
+            except ValueError:
+                pass
+        print("✓ 页边界与游标正确")
+
+
+def test_data_version_and_etag():
+    """测试每次写入都使版本号递增、列表JSON按版本缓存，以及列表接口的ETag/304"""
+    print("\n=== 测试数据版本与ETag ===")
+
+    from django.test import Client
+    from zapp import views
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(tmp)
+        versions = [service.get_data_version()]
+
+        def bumped():
+            versions.append(service.get_data_version())
+            return versions[-1] > versions[-2]
+
+        memo = service.add_memo('第一条')
+        assert bumped()
+        service.add_memos(['第二条', '第三条'])
+        assert bumped()
+        assert not service.delete_memo(9999) and not bumped()
+        assert service.delete_memo(memo["id"]) and bumped()
+        service.delete_memos([memo["id"] + 1])
+        assert bumped()
+        with service._get_connection() as conn:
+            conn.execute("UPDATE memos SET content = '改' WHERE id = ?", (memo["id"] + 2,))
+        assert bumped()
+
+        version, body = service.get_memos_json()
+        assert version == versions[-1]
+        assert service.get_memos_json() == (version, body) and service.get_memos_json()[1] is body
+        service.add_memo('第四条')
+        assert service.get_memos_json()[1] != body
+
+        # 列表接口：If-None-Match 命中时返回304，写入后返回新数据
+        original, views.memo_service = views.memo_service, service
+        try:
+            client = Client(HTTP_HOST='localhost')
+            response = client.get('/api/memos/')
+            etag = response["ETag"]
+            assert response.status_code == 200 and etag == f'"memos-v{service.get_data_version()}"'
+            response = client.get('/api/memos/', HTTP_IF_NONE_MATCH=f'W/{etag}')
+            assert response.status_code == 304 and response["ETag"] == etag
+            service.add_memo('第五条')
+            response = client.get('/api/memos/', HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200 and response["ETag"] != etag
+            assert len(response.json()["data"]) == 3
+        finally:
+            views.memo_service = original
+        print(f"✓ 版本 {versions[0]} -> {service.get_data_version()}")
+
+
+def test_batch_partial_failure():
+    """测试批量新增/删除中无效条目单独报错，其余条目在一个事务中写入且返回的id与数据库一致"""
+    print("\n=== 测试批量操作部分失败 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(tmp)
+        service.add_memo('已有的备忘录')
+
+        result = service.add_memos(['第一条', '', 'xx FORBIDDEN xx', 'x' * 1001, '  第二条 ', None, '<b>第三条</b>'])
+        assert [error["index"] for error in result["errors"]] == [1, 2, 3, 5], result["errors"]
+        assert result["errors"][1]["message"] == "Content contains sensitive word"
+        created = result["created"]
+        assert [m["content"] for m in created] == ['第一条', '第二条', '&lt;b&gt;第三条&lt;/b&gt;']
+        # 根据 last_insert_rowid 推算的id与实际写入的行一致
+        stored = {m["id"]: m["content"] for m in service.get_all_memos()}
+        assert all(stored[m["id"]] == m["content"] for m in created)
+        assert [m["id"] for m in created] == [2, 3, 4]
+
+        # 全部无效时不写入
+        version = service.get_data_version()
+        assert service.add_memos(['', 'forbidden'])["created"] == []
+        assert service.get_data_version() == version
+
+        result = service.delete_memos([2, '3', 'abc', 9999, 2, 0])
+        assert result["deleted"] == [2, 3]
+        assert result["not_found"] == [9999]
+        assert [error["index"] for error in result["errors"]] == [2, 5]
+        assert sorted(stored.keys() - {2, 3}) == [m["id"] for m in reversed(service.get_all_memos())]
+
+        for bad in ('not a list', [None] * 501):
+            for method in (service.add_memos, service.delete_memos):
+                try:
+                    method(bad)
+                    assert False, method
+                except ValueError:
+                    pass
+        print(f"✓ 新增 {len(created)} 条，删除 {result['deleted']}")
+
+
+def test_async_facade():
+    """测试异步门面在专用线程池中执行数据库操作，结果与同步接口一致"""
+    print("\n=== 测试异步门面 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(tmp)
+        async_service = AsyncMemoService(service, max_workers=2)
+        threads = set()
+        original = service.get_all_memos
+
+        def get_all_memos():
+            threads.add(threading.current_thread().name)
+            return original()
+        service.get_all_memos = get_all_memos
+
+        async def run():
+            created = await asyncio.gather(*(async_service.add_memo(f'异步{i}') for i in range(6)))
+            memos, page, found = await asyncio.gather(
+                async_service.get_all_memos(),
+                async_service.get_memos_page(limit=4),
+                async_service.search_memos('异步3'),
+            )
+            try:
+                await async_service.add_memo('')
+                assert False
+            except ValueError:
+                pass
+            deleted = await async_service.delete_memos([m["id"] for m in created[:2]])
+            return created, memos, page, found, deleted
+
+        created, memos, page, found, deleted = asyncio.run(run())
+        executed = sorted(threads)
+        assert executed and all(name.startswith('memo-db') for name in executed), executed
+        assert sorted(m["id"] for m in memos) == sorted(m["id"] for m in created)
+        assert len(page["items"]) == 4 and page["has_more"]
+        assert [m["content"] for m in found] == ['异步3']
+        assert len(deleted["deleted"]) == 2 and len(service.get_all_memos()) == 4
+        async_service._executor.shutdown()
+        print(f"✓ 在 {executed} 中执行")
+
+
+if __name__ == "__main__":
+    print("开始测试备忘录存储层...")
+
+    test_connection_reuse()
+    test_fts_migration_and_search()
+    test_keyset_pagination()
+    test_data_version_and_etag()
+    test_batch_partial_failure()
+    test_async_facade()
+
+    print("\n所有备忘录存储层测试完成！")
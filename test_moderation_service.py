@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批量内容审核（当前进程检查、进程池检查及词库热更新时的处理）
+使用临时目录中的词库，不依赖数据库和Django环境
+"""
+
+import sys
+import os
+import base64
+import tempfile
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from zapp.services import moderation_service
+from zapp.services.moderation_service import moderate_texts, _scan_chunk
+from zapp.services.sensitive_lexicon import CompiledLexicon, build_lexicon
+
+
+def write_source(path, words):
+    """按 sensitive_words.txt 的格式写入base64编码的敏感词"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for word in words:
+            f.write(base64.b64encode(word.encode('utf-8')).decode('utf-8') + '\n')
+
+
+def test_moderate_in_process():
+    """测试小批量在当前进程中检查，返回命中位置；无效输入抛出ValueError"""
+    print("\n=== 测试当前进程审核 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'words.txt')
+        write_source(source, ['alpha', '敏感'])
+        lexicon = CompiledLexicon(build_lexicon(source))
+        try:
+            results = moderate_texts(lexicon, ['正常内容', 'xALPHA 敏感'])
+            assert results[0] == {"index": 0, "sensitive": False, "matches": []}
+            assert results[1]["matches"] == [
+                {"word": "alpha", "start": 1, "end": 6},
+                {"word": "敏感", "start": 7, "end": 9},
+            ], results[1]
+
+            for bad in ('text', [1], ['x' * (moderation_service.MAX_TEXT_LENGTH + 1)]):
+                try:
+                    moderate_texts(lexicon, bad)
+                    assert False, bad
+                except ValueError:
+                    pass
+            print(f"✓ {results[1]}")
+        finally:
+            lexicon.close()
+
+
+def test_worker_reload_on_version_change():
+    """测试子进程词库版本落后时重新映射；磁盘上的版本与请求不符时返回None而不是抛异常"""
+    print("\n=== 测试子进程词库重新加载 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'words.txt')
+        write_source(source, ['alpha'])
+        first = CompiledLexicon(build_lexicon(source))
+        assert _scan_chunk(first.path, first.version, ['alpha'])[0]
+
+        write_source(source, ['beta'])
+        second = CompiledLexicon(build_lexicon(source))
+        # 子进程持有的词库落后于请求的版本：重新映射后正常检查
+        assert _scan_chunk(second.path, second.version, ['beta', 'alpha']) == [[(0, 4, 'beta')], []]
+        # 请求的是旧版本，而磁盘上已是新版本：交回调用方检查
+        assert _scan_chunk(first.path, first.version, ['alpha']) is None
+        print(f"✓ 版本 {first.version} -> {second.version}")
+        first.close()
+        second.close()
+        moderation_service._worker_lexicon.close()
+        moderation_service._worker_lexicon = None
+
+
+def test_pool_survives_lexicon_reload():
+    """测试进程池检查结果与当前进程一致；请求期间词库被替换时不重建进程池"""
+    print("\n=== 测试进程池审核与热更新 ===")
+
+    threshold, workers = moderation_service.PARALLEL_THRESHOLD_CHARS, moderation_service.POOL_WORKERS
+    moderation_service.PARALLEL_THRESHOLD_CHARS, moderation_service.POOL_WORKERS = 1, 2
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'words.txt')
+            write_source(source, ['alpha'])
+            lexicon = CompiledLexicon(build_lexicon(source))
+            texts = ['x alpha', 'beta'] * 60
+
+            results = moderate_texts(lexicon, texts)
+            pool = moderation_service._pool
+            assert pool is not None
+            assert [r["sensitive"] for r in results] == [True, False] * 60
+
+            # 热更新：磁盘上的词库换成新版本，调用方仍持有旧词库
+            write_source(source, ['beta'])
+            build_lexicon(source)
+            results = moderate_texts(lexicon, texts)
+            assert [r["sensitive"] for r in results] == [True, False] * 60
+            assert moderation_service._pool is pool
+            lexicon.close()
+            print("✓ 词库替换后进程池未被重建")
+    finally:
+        moderation_service.PARALLEL_THRESHOLD_CHARS, moderation_service.POOL_WORKERS = threshold, workers
+        if moderation_service._pool is not None:
+            moderation_service._pool.shutdown()
+            moderation_service._pool = None
+
+
+if __name__ == "__main__":
+    print("开始测试批量内容审核...")
+
+    test_moderate_in_process()
+    test_worker_reload_on_version_change()
+    test_pool_survives_lexicon_reload()
+
+    print("\n所有审核测试完成！")
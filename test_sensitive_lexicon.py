@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试预编译敏感词词库的构建、加载、自动重建与热更新
+使用临时目录中的词库和数据库，不依赖Django配置
+"""
+
+import sys
+import os
+import base64
+import stat
+import subprocess
+import tempfile
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from zapp.services import memo_service as memo_module
+from zapp.services.memo_service import MemoService
+from zapp.services.sensitive_lexicon import CompiledLexicon, build_lexicon, load_lexicon
+from zapp.services.sensitive_matcher import AhoCorasickMatcher
+
+
+def write_source(path, words):
+    """按 sensitive_words.txt 的格式写入base64编码的敏感词"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for word in words:
+            f.write(base64.b64encode(word.encode('utf-8')).decode('utf-8') + '\n')
+        f.write('not-base64!!\n')  # 无效行应被跳过
+
+
+def test_build_and_match():
+    """测试编译产物的词条规范化及匹配结果"""
+    print("\n=== 测试编译与匹配 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'words.txt')
+        words = ['Foo', 'foo', ' bar ', '敏感词', '感词汇']
+        write_source(source, words)
+
+        lexicon = CompiledLexicon(build_lexicon(source))
+        try:
+            # 去空白、转小写并去重
+            assert list(lexicon) == ['foo', 'bar', '敏感词', '感词汇']
+            assert lexicon[:2] == ['foo', 'bar'] and lexicon[-1] == '感词汇'
+
+            content = 'xFOO 敏感词汇 bar'
+            expected = AhoCorasickMatcher(w.strip() for w in words).find_all(content)
+            assert lexicon.find_all(content) == expected, lexicon.find_all(content)
+            assert lexicon.search('正常内容') is None
+            print(f"✓ 命中: {lexicon.find_all(content)}")
+        finally:
+            lexicon.close()
+
+
+def test_rebuild_when_source_changes():
+    """测试源文件内容变化后自动重新编译"""
+    print("\n=== 测试源文件变化后自动重建 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'words.txt')
+        write_source(source, ['alpha'])
+        first = load_lexicon(source)
+        assert isinstance(first, CompiledLexicon) and first.contains('ALPHA')
+
+        write_source(source, ['beta'])
+        second = load_lexicon(source)
+        assert second.version != first.version
+        assert second.contains('beta') and not second.contains('alpha')
+        # 已映射旧文件的实例不受原子替换影响
+        assert first.contains('alpha')
+        print(f"✓ 版本 {first.version} -> {second.version}")
+        first.close()
+        second.close()
+
+
+def test_rebuild_when_file_corrupted():
+    """测试编译产物损坏时自动重新编译"""
+    print("\n=== 测试损坏文件自动重建 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'words.txt')
+        write_source(source, ['gamma'])
+        lexicon_path = build_lexicon(source)
+        with open(lexicon_path, 'r+b') as f:
+            f.truncate(10)
+
+        lexicon = load_lexicon(source)
+        assert isinstance(lexicon, CompiledLexicon) and lexicon.contains('gamma')
+        print("✓ 损坏的词库已重新编译")
+        lexicon.close()
+
+
+def test_lexicon_file_mode():
+    """测试编译产物的权限与源文件一致（不是临时文件的0600）"""
+    print("\n=== 测试词库文件权限 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'words.txt')
+        write_source(source, ['delta'])
+        os.chmod(source, 0o644)
+        lexicon_path = build_lexicon(source)
+        mode = stat.S_IMODE(os.stat(lexicon_path).st_mode)
+        assert mode == 0o644, oct(mode)
+        print(f"✓ 权限 {oct(mode)}")
+
+
+def test_watcher_hot_reload():
+    """测试导入模块不启动监听线程；首次检查内容时启动，源文件变化后自动换用新词库"""
+    print("\n=== 测试词库热更新 ===")
+
+    code = ("import threading, zapp.services.memo_service; "
+            "print(sorted(t.name for t in threading.enumerate()))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    assert 'sensitive-words-watcher' not in output, output
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'words.txt')
+        write_source(source, ['alpha'])
+        interval = memo_module.LEXICON_WATCH_INTERVAL
+        service = MemoService(db_path=os.path.join(tmp, 'memo.db'), sensitive_words_file=source)
+        assert service._lexicon_watcher is None
+        memo_module.LEXICON_WATCH_INTERVAL = 0.05
+        try:
+            assert service.find_sensitive_words('ALPHA') == [{"word": "alpha", "start": 0, "end": 5}]
+        finally:
+            memo_module.LEXICON_WATCH_INTERVAL = interval
+        assert service._lexicon_watcher is not None
+        old_version = service.get_lexicon_stats()["version"]
+
+        write_source(source, ['beta'])
+        deadline = time.monotonic() + 5
+        while service.get_lexicon_stats()["version"] == old_version and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stats = service.get_lexicon_stats()
+        assert stats["reload_count"] == 1 and stats["version"] != old_version, stats
+        assert not service.find_sensitive_words('alpha') and service.find_sensitive_words('beta')
+
+        # fork 出的子进程中监听线程会重新启动
+        pid = os.fork()
+        if pid == 0:
+            time.sleep(0.1)
+            watcher = service._lexicon_watcher
+            os._exit(0 if watcher is not None and watcher.is_alive() else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.WEXITSTATUS(status) == 0
+        service._lexicon_watcher = None
+        print(f"✓ 版本 {old_version} -> {stats['version']}")
+
+
+if __name__ == "__main__":
+    print("开始测试预编译敏感词词库...")
+
+    test_build_and_match()
+    test_rebuild_when_source_changes()
+    test_rebuild_when_file_corrupted()
+    test_lexicon_file_mode()
+    test_watcher_hot_reload()
+
+    print("\n所有词库测试完成！")
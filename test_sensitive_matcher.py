@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试Aho-Corasick敏感词匹配引擎
+不依赖数据库和Django环境
+"""
+
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from zapp.services.sensitive_matcher import AhoCorasickMatcher
+
+
+def naive_find_all(words, text):
+    """朴素实现：逐个敏感词做子串查找，作为对照"""
+    text_lower = text.lower()
+    matches = set()
+    for word in set(w.lower() for w in words if w):
+        start = text_lower.find(word)
+        while start != -1:
+            matches.add((start, start + len(word), word))
+            start = text_lower.find(word, start + 1)
+    return matches
+
+
+def test_find_all_with_offsets():
+    """测试命中结果及偏移量"""
+    print("\n=== 测试命中结果及偏移量 ===")
+
+    matcher = AhoCorasickMatcher(["he", "she", "his", "hers"])
+    matches = matcher.find_all("ushers")
+
+    assert matches == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")], matches
+    print(f"✓ 'ushers' 命中: {matches}")
+
+
+def test_case_insensitive():
+    """测试不区分大小写，且偏移对应原始文本"""
+    print("\n=== 测试大小写不敏感 ===")
+
+    matcher = AhoCorasickMatcher(["ABC", "敏感"])
+    content = "xxAbC和敏感内容"
+    matches = matcher.find_all(content)
+
+    assert matches == [(2, 5, "abc"), (6, 8, "敏感")], matches
+    for start, end, word in matches:
+        assert content[start:end].lower() == word
+    print(f"✓ 命中: {matches}")
+
+
+def test_offsets_when_lower_changes_length():
+    """测试小写后长度变化的字符（如 'İ'）不影响偏移"""
+    print("\n=== 测试小写后长度变化的字符 ===")
+
+    matcher = AhoCorasickMatcher(["ab"])
+    content = "İxAB"
+    matches = matcher.find_all(content)
+
+    assert matches == [(2, 4, "ab")], matches
+    print(f"✓ 命中: {matches}")
+
+
+def test_search_and_contains():
+    """测试首个命中和布尔判断"""
+    print("\n=== 测试search/contains ===")
+
+    matcher = AhoCorasickMatcher(["foo", "", "bar", "FOO"])
+
+    assert len(matcher) == 2
+    assert matcher.search("a bar and foo") == (2, 5, "bar")
+    assert matcher.contains("FoO")
+    assert not matcher.contains("正常内容")
+    assert matcher.search("") is None
+    assert not AhoCorasickMatcher([]).contains("anything")
+    print("✓ search/contains 结果正确")
+
+
+def test_matches_naive_implementation():
+    """与朴素实现对比，结果必须完全一致"""
+    print("\n=== 与朴素实现对比 ===")
+
+    words = ["a", "ab", "bab", "bc", "bca", "c", "caa", "测试", "试一"]
+    text = "abccab测试一下babcaa"
+    matcher = AhoCorasickMatcher(words)
+
+    assert set(matcher.find_all(text)) == naive_find_all(words, text)
+    print("✓ 与朴素实现结果一致")
+
+
+if __name__ == "__main__":
+    print("开始测试Aho-Corasick敏感词匹配引擎...")
+
+    test_find_all_with_offsets()
+    test_case_insensitive()
+    test_offsets_when_lower_changes_length()
+    test_search_and_contains()
+    test_matches_naive_implementation()
+
+    print("\n所有匹配引擎测试完成！")
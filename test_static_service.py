@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试静态文件服务的底层功能：Range 请求头解析、.gz 预压缩及热点缓存（AssetCache）
+不依赖数据库和Django配置
+"""
+
+import sys
+import os
+import gzip
+import stat
+import tempfile
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from zapp.services.asset_cache import AssetCache
+from zapp.services.static_service import parse_range_header, precompress_file
+
+
+def test_parse_range_header():
+    """测试单段、后缀、多段合并及无效/无法满足的区间"""
+    print("\n=== 测试Range解析 ===")
+
+    size = 1000
+    cases = [
+        ('bytes=0-99', [(0, 99)]),
+        ('bytes=900-', [(900, 999)]),
+        ('bytes=-100', [(900, 999)]),
+        ('bytes=-5000', [(0, 999)]),
+        ('bytes=950-5000', [(950, 999)]),
+        ('bytes=0-9, 5-19, 100-109', [(0, 19), (100, 109)]),
+        ('bytes=1000-', []),          # 起点超出文件 -> 416
+        ('bytes=-0', []),
+        ('bytes=5-1', None),          # 格式无效 -> 忽略
+        ('items=0-1', None),
+        ('bytes=a-b', None),
+        ('bytes=' + ','.join(['0-1'] * 17), None),  # 区间过多 -> 忽略
+    ]
+    for header, expected in cases:
+        result = parse_range_header(header, size)
+        assert result == expected, (header, result)
+        print(f"✓ {header[:40]} -> {result}")
+
+
+def test_precompress_file():
+    """测试 .gz 副本只在源文件变化后重新生成，且权限与源文件一致"""
+    print("\n=== 测试预压缩副本 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'codes.txt')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write('平安银行(000001)\n' * 200)
+        os.chmod(source, 0o644)
+
+        assert precompress_file(source) == 'written'
+        # 副本权限与源文件一致（不是临时文件的0600）
+        assert stat.S_IMODE(os.stat(source + '.gz').st_mode) == 0o644
+        assert precompress_file(source) == 'fresh'
+        with open(source + '.gz', 'rb') as f, open(source, 'rb') as raw:
+            assert gzip.decompress(f.read()) == raw.read()
+
+        # 修改源文件后副本过期，重新生成
+        with open(source, 'a', encoding='utf-8') as f:
+            f.write('万科A(000002)\n')
+        os.utime(source, ns=(0, os.stat(source).st_mtime_ns + 1))
+        assert precompress_file(source) == 'written'
+
+        # 压缩收益不足时不保留副本
+        noise = os.path.join(tmp, 'noise.txt')
+        with open(noise, 'wb') as f:
+            f.write(os.urandom(4096))
+        assert precompress_file(noise) == 'skipped' and not os.path.exists(noise + '.gz')
+        print("✓ 副本按源文件mtime重新生成")
+
+
+def test_asset_cache():
+    """测试热点缓存的字节预算、LRU淘汰、mmap及按mtime失效"""
+    print("\n=== 测试热点文件缓存 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(3):
+            path = os.path.join(tmp, f'font{i}.ttf')
+            with open(path, 'wb') as f:
+                f.write(bytes([i]) * 400)
+            paths.append(path)
+        big = os.path.join(tmp, 'big.mp3')
+        with open(big, 'wb') as f:
+            f.write(b'\xff' * 5000)
+
+        cache = AssetCache(max_bytes=1000, mmap_threshold=1000)
+        assert cache.get(paths[0]) == bytes([0]) * 400
+        assert cache.get(paths[0]) is cache.get(paths[0])
+        cache.get(paths[1])
+        cache.get(paths[2])  # 超出预算，淘汰最久未使用的 font0
+        stats = cache.get_stats()
+        assert stats["cached_files"] == 2 and stats["cached_bytes"] == 800 and stats["evictions"] == 1
+
+        assert cache.get(big)[:2] == b'\xff\xff' and cache.get(big, allow_mmap=False) is None
+        assert cache.get_stats()["mapped_bytes"] == 5000
+
+        # 文件被替换后重新加载
+        with open(paths[2], 'wb') as f:
+            f.write(b'new')
+        os.utime(paths[2], ns=(0, os.stat(paths[2]).st_mtime_ns + 1))
+        assert cache.get(paths[2]) == b'new'
+        print(f"✓ {cache.get_stats()}")
+
+
+if __name__ == "__main__":
+    print("开始测试静态文件服务...")
+
+    test_parse_range_header()
+    test_precompress_file()
+    test_asset_cache()
+
+    print("\n所有静态文件服务测试完成！")
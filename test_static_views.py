@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试静态文件接口（/static/<path>）：流式下载、路径校验等
+静态目录使用临时目录，不依赖数据库
+"""
+
+import sys
+import os
+import contextlib
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 设置Django环境变量
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zproject.settings')
+
+import django
+django.setup()
+
+from django.http import FileResponse
+from django.test import Client
+
+from zapp.services import static_manifest
+from zapp.services.asset_cache import asset_cache
+
+
+@contextlib.contextmanager
+def static_dirs(*dirs):
+    """让静态文件接口在给定目录中查找文件"""
+    original = static_manifest._manifest
+    static_manifest._manifest = static_manifest.StaticManifest(list(dirs))
+    asset_cache.clear()
+    try:
+        yield Client(HTTP_HOST='localhost')
+    finally:
+        static_manifest._manifest = original
+        asset_cache.clear()
+
+
+def write_file(directory, name, data):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def parse_byteranges(response):
+    """解析 multipart/byteranges 响应体，返回 [(Content-Type, Content-Range, 内容)]"""
+    content_type, _, boundary = response["Content-Type"].partition('; boundary=')
+    assert content_type == 'multipart/byteranges' and boundary
+    body = b''.join(response.streaming_content)
+    assert len(body) == int(response["Content-Length"])
+    delimiter = f'--{boundary}'.encode('ascii')
+    assert body.endswith(delimiter + b'--\r\n')
+    parts = []
+    for part in body.split(delimiter)[1:-1]:
+        head, _, data = part.partition(b'\r\n\r\n')
+        headers = dict(line.split(': ', 1) for line in head.decode('ascii').strip().split('\r\n'))
+        assert data.endswith(b'\r\n')
+        parts.append((headers["Content-Type"], headers["Content-Range"], data[:-2]))
+    return parts
+
+
+def test_download():
+    """测试完整下载（小文件来自缓存，大文件交给 FileResponse）、文件不存在及路径越界"""
+    print("\n=== 测试静态文件下载 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'static')
+        os.mkdir(root)
+        small = os.urandom(1000)
+        large = os.urandom(asset_cache.mmap_threshold + 4096)
+        write_file(root, 'beep.mp3', small)
+        write_file(root, 'long.mp3', large)
+        write_file(tmp, 'secret.txt', b'outside the static dir')
+
+        with static_dirs(root) as client:
+            response = client.get('/static/beep.mp3')
+            assert response.status_code == 200 and response.content == small
+            assert response["Content-Type"] == 'audio/mpeg'
+            assert response["Content-Length"] == '1000'
+            assert response["Content-Disposition"] == 'inline; filename="beep.mp3"'
+
+            # 服务器提供 wsgi.file_wrapper 时大文件交给 FileResponse（sendfile）
+            response = client.get('/static/long.mp3', **{'wsgi.file_wrapper': object})
+            assert isinstance(response, FileResponse)
+            assert response["Content-Length"] == str(len(large))
+            assert b''.join(response.streaming_content) == large
+            response.close()
+            # 否则从 mmap 按块发送
+            response = client.get('/static/long.mp3')
+            assert response.streaming and b''.join(response.streaming_content) == large
+
+            assert client.get('/static/missing.mp3').status_code == 404
+            for path in ('/static/../secret.txt', '/static/%2e%2e/secret.txt',
+                         '/static/sub/%2e%2e/%2e%2e/secret.txt', '/static/' + os.path.join(tmp, 'secret.txt')):
+                response = client.get(path)
+                assert response.status_code == 404, (path, response.status_code)
+                assert b'outside' not in response.content
+        print("✓ 下载、404及路径越界")
+
+
+def test_conditional_requests():
+    """测试 ETag/Last-Modified、304、按扩展名的 Cache-Control 以及文件变化后ETag更新"""
+    print("\n=== 测试静态文件条件请求 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_file(tmp, 'beep.mp3', b'a' * 100)
+        write_file(tmp, 'a.txt', b'x')
+        write_file(tmp, 'data.bin', b'y')
+
+        with static_dirs(tmp) as client:
+            response = client.get('/static/beep.mp3')
+            etag, last_modified = response["ETag"], response["Last-Modified"]
+            assert etag.startswith('"') and response["Cache-Control"] == 'public, max-age=604800'
+            assert client.get('/static/a.txt')["Cache-Control"] == 'no-cache'
+            assert client.get('/static/data.bin')["Cache-Control"] == 'public, max-age=3600'
+
+            response = client.get('/static/beep.mp3', HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+            assert response.status_code == 304 and response["ETag"] == etag and not response.content
+            assert client.get('/static/beep.mp3', HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+            # If-None-Match 不匹配时忽略 If-Modified-Since
+            assert client.get('/static/beep.mp3', HTTP_IF_NONE_MATCH='"other"',
+                              HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 200
+            # If-Range 匹配时返回部分内容，否则返回完整文件
+            response = client.get('/static/beep.mp3', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+            assert response.status_code == 206 and response.content == b'a' * 10
+            response = client.get('/static/beep.mp3', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"other"')
+            assert response.status_code == 200 and len(response.content) == 100
+
+            with open(path, 'ab') as f:
+                f.write(b'b')
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+            response = client.get('/static/beep.mp3', HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200 and response["ETag"] != etag
+            assert response.content == b'a' * 100 + b'b'
+        print(f"✓ ETag {etag}")
+
+
+def test_shared_content():
+    """测试内容相同的文件共用一份内容，但MIME类型、Cache-Control、gzip副本各按请求的文件名确定"""
+    print("\n=== 测试内容相同的文件 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        content = b'body { color: red; }' * 10
+        for name in ('a.txt', 'data.bin', 'site.css'):
+            write_file(tmp, name, content)
+        # 只有 site.css 有预压缩副本
+        from zapp.services.static_service import precompress_file
+        precompress_file(os.path.join(tmp, 'site.css'))
+
+        with static_dirs(tmp) as client:
+            entries = [static_manifest._manifest.get(name) for name in ('a.txt', 'data.bin', 'site.css')]
+            assert len({entry["path"] for entry in entries}) == 1
+
+            expected = {
+                'a.txt': ('text/plain', 'no-cache'),
+                'data.bin': ('application/octet-stream', 'public, max-age=3600'),
+                'site.css': ('text/css', 'public, max-age=3600'),
+            }
+            for name, (mime_type, cache_control) in expected.items():
+                response = client.get(f'/static/{name}', HTTP_ACCEPT_ENCODING='gzip')
+                assert response["Content-Type"].split(';')[0] == mime_type, (name, response["Content-Type"])
+                assert response["Cache-Control"] == cache_control, (name, response["Cache-Control"])
+                assert response["Content-Disposition"] == f'inline; filename="{name}"'
+                # 只有 site.css 发送gzip副本
+                assert response.has_header("Content-Encoding") == (name == 'site.css'), name
+                if name != 'site.css':
+                    assert response.content == content
+
+                response = client.get(f'/static/{name}', HTTP_RANGE='bytes=0-3')
+                assert response.status_code == 206 and response.content == content[:4]
+                assert response["Content-Type"].split(';')[0] == mime_type
+
+                data = client.get(f'/static/{name}', {'format': 'base64'}).json()["data"]
+                assert data["mime_type"] == mime_type, (name, data["mime_type"])
+        print("✓ 各文件名使用自己的MIME类型和缓存策略")
+
+
+def test_manifest_built_once():
+    """测试多个线程同时首次访问时清单只建立一次"""
+    print("\n=== 测试清单并发建立 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_file(tmp, 'a.txt', b'x')
+        manifest = static_manifest.StaticManifest([tmp])
+        builds = []
+        original = manifest._build_locked
+
+        def build_locked():
+            builds.append(threading.current_thread().name)
+            time.sleep(0.05)
+            original()
+        manifest._build_locked = build_locked
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(manifest.get('a.txt'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(builds) == 1, builds
+        assert len(results) == 8 and all(entry is not None and entry["name"] == 'a.txt' for entry in results)
+        print("✓ 只建立一次")
+
+
+def test_methods():
+    """测试静态文件及缓存指标接口只接受GET，其他方法返回405"""
+    print("\n=== 测试请求方法 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_file(tmp, 'a.txt', b'x')
+        with static_dirs(tmp) as client:
+            assert client.get('/static/a.txt').status_code == 200
+            assert client.get('/api/static/stats/').status_code == 200
+            for method in (client.post, client.put, client.patch, client.delete):
+                for path in ('/static/a.txt', '/static/missing.txt', '/api/static/stats/'):
+                    response = method(path)
+                    assert response.status_code == 405, (method.__name__, path, response.status_code)
+                    assert response["Allow"] == 'GET'
+        print("✓ 非GET请求返回405")
+
+
+def test_range_requests():
+    """测试单段/多段Range（缓存内容、mmap 和 sendfile 三条路径）、416 以及 If-Range 不匹配"""
+    print("\n=== 测试Range请求 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        small = os.urandom(1000)
+        large = os.urandom(asset_cache.mmap_threshold + 4096)
+        write_file(tmp, 'small.mp3', small)
+        write_file(tmp, 'large.mp3', large)
+
+        with static_dirs(tmp) as client:
+            for name, data in (('small.mp3', small), ('large.mp3', large)):
+                size = len(data)
+                # 无 file_wrapper 时大文件走 mmap，有 file_wrapper 时直接读文件
+                for extra in ({}, {'wsgi.file_wrapper': object}):
+                    response = client.get(f'/static/{name}', HTTP_RANGE='bytes=10-19', **extra)
+                    assert response.status_code == 206, (name, extra)
+                    assert response["Content-Range"] == f'bytes 10-19/{size}'
+                    assert response["Content-Length"] == '10'
+                    assert response["Content-Type"] == 'audio/mpeg'
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                    assert body == data[10:20]
+                    if hasattr(response, 'close'):
+                        response.close()
+
+                    # 多段：重叠的区间合并，按起点排序
+                    response = client.get(f'/static/{name}', HTTP_RANGE='bytes=-5, 0-3, 2-7', **extra)
+                    assert response.status_code == 206
+                    assert parse_byteranges(response) == [
+                        ('audio/mpeg', f'bytes 0-7/{size}', data[:8]),
+                        ('audio/mpeg', f'bytes {size - 5}-{size - 1}/{size}', data[-5:]),
+                    ], (name, extra)
+
+                    response = client.get(f'/static/{name}', HTTP_RANGE=f'bytes={size}-', **extra)
+                    assert response.status_code == 416 and response["Content-Range"] == f'bytes */{size}'
+
+                etag = client.get(f'/static/{name}', HTTP_RANGE='bytes=0-0')["ETag"]
+                response = client.get(f'/static/{name}', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+                assert response.status_code == 200 and not response.has_header("Content-Range")
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                assert body == data and response["Content-Length"] == str(size)
+                response = client.get(f'/static/{name}', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+                assert response.status_code == 206
+        print("✓ 206/多段/416/If-Range")
+
+
+if __name__ == "__main__":
+    print("开始测试静态文件接口...")
+
+    test_download()
+    test_conditional_requests()
+    test_range_requests()
+    test_shared_content()
+    test_manifest_built_once()
+    test_methods()
+
+    print("\n所有静态文件接口测试完成！")
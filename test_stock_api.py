@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试行情请求层：共享连接池、异步客户端和批量行情接口
+上游使用本地HTTP服务模拟，不访问外网
+"""
+
+import sys
+import os
+import asyncio
+import contextlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 设置Django环境变量（接口测试需要）
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zproject.settings')
+
+import django
+django.setup()
+
+from django.test import Client
+from urllib3.util.retry import Retry
+
+from zapp import stock_api_utils
+from zapp.services import quote_batch
+from zapp.services.quote_cache import quote_cache
+from zapp.stock_api_utils import (
+    AsyncStockApiUtils, StockApiUtils, get_async_client, get_session_stats, get_shared_session, retry_backoff,
+)
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    """模拟行情接口：代码含 slow 时延迟 slow_delay 秒，含 bad 时返回404，含 fail 时返回500，
+    含 gzip 时声明 gzip 编码但返回未压缩的内容
+    请求记录和并发数记在各自的服务实例上（calls、active、max_active）"""
+
+    protocol_version = 'HTTP/1.1'
+    slow_delay = 3.0
+
+    def do_GET(self):
+        server = self.server
+        code = parse_qs(urlparse(self.path).query)['code'][0]
+        with server.lock:
+            server.calls.append(code)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        if 'slow' in code:
+            time.sleep(FakeUpstream.slow_delay)
+        with server.lock:
+            server.active -= 1
+        status = 404 if 'bad' in code else 500 if 'fail' in code else 200
+        rows = ";".join(f"{1700000000 + i * 86400},2024-01-{i + 1:02d},{10 + i},{11 + i},{1000 + i}"
+                        for i in range(5))
+        body = json.dumps({"ResultCode": 0, "code": code, "Result": {"newMarketData": {
+            "keys": ["timestamp", "time", "open", "close", "volume"], "marketData": rows}}}).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            if 'gzip' in code:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已超时断开
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def fake_upstream():
+    """启动本地模拟上游，并让 StockApiUtils 和共享 Session 指向它"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeUpstream)
+    server.calls, server.active, server.max_active, server.lock = [], 0, 0, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original = StockApiUtils.BASE_URL
+    StockApiUtils.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/"
+    stock_api_utils._session = None
+    quote_cache.clear()
+    try:
+        yield server
+    finally:
+        StockApiUtils.BASE_URL = original
+        stock_api_utils._session = None
+        quote_cache.clear()
+        server.shutdown()
+        server.server_close()
+
+
+def test_shared_session():
+    """测试进程内复用同一个 Session 及其长连接，pid 变化后重新创建，统计计数正确"""
+    print("\n=== 测试共享 Session ===")
+
+    with fake_upstream() as server:
+        session = get_shared_session()
+        assert get_shared_session() is session
+
+        for _ in range(5):
+            data = StockApiUtils('sh600519').fetch_stock_data(timeout=5)
+            assert data["code"] == 'sh600519'
+        stats = get_session_stats()
+        assert stats["requests"] == 5 and stats["errors"] == 0
+        # 5次请求只建立了一个连接
+        assert stats["connections_opened"] == 1 and stats["http_requests"] == 5, stats
+        assert stats["reuse_ratio"] == 0.8
+
+        # 4xx 不重试，记为失败
+        data = StockApiUtils('bad000001').fetch_stock_data(timeout=5)
+        assert data["success"] is False and '404' in data["error"]
+        assert get_session_stats()["errors"] == 1 and server.calls.count('bad000001') == 1
+
+        response = Client(HTTP_HOST='localhost').get('/api/stocks/session/')
+        assert response.json()["data"]["requests"] == 6
+
+        # 模拟 fork 后的子进程：重新创建 Session，计数清零
+        stock_api_utils._session_pid = -1
+        assert get_session_stats()["connections_opened"] == 0
+        new_session = get_shared_session()
+        assert new_session is not session and get_session_stats()["requests"] == 0
+        session.close()
+        new_session.close()
+        print(f"✓ 复用率 {stats['reuse_ratio']}")
+
+
+def test_fetch_stocks_validation():
+    """测试批量接口的参数校验：代码列表、截止时间和K线类型"""
+    print("\n=== 测试批量接口参数校验 ===")
+
+    client = Client(HTTP_HOST='localhost')
+    for params in ({}, {'codes': ' , ,'},
+                   {'codes': ','.join(f'sh{i:06d}' for i in range(quote_batch.BATCH_MAX_CODES + 1))},
+                   {'codes': 'x' * (quote_batch.MAX_CODE_LENGTH + 1)},
+                   {'codes': 'sh600519', 'deadline': '0'},
+                   {'codes': 'sh600519', 'deadline': str(quote_batch.BATCH_MAX_DEADLINE + 1)},
+                   {'codes': 'sh600519', 'deadline': 'abc'},
+                   {'codes': 'sh600519', 'ktype': 'minute'}):
+        response = client.get('/api/fetch_stocks/', params)
+        assert response.status_code == 400 and response.json()["code"] == 400, params
+    # 截止时间上限小于 gunicorn 的 --timeout（30秒）
+    assert quote_batch.BATCH_MAX_DEADLINE < 30
+    print("✓ 无效参数返回400")
+
+
+def test_fetch_stocks_errors():
+    """测试单只股票失败不影响其他；与单只接口一样对 5xx 重试"""
+    print("\n=== 测试批量接口单只失败 ===")
+
+    factor = stock_api_utils.RETRY_BACKOFF_FACTOR
+    stock_api_utils.RETRY_BACKOFF_FACTOR = 0.01
+    try:
+        with fake_upstream() as server:
+            client = Client(HTTP_HOST='localhost')
+            response = client.get('/api/fetch_stocks/', {'codes': 'sh600519, bad000001,sh600519,fail000002',
+                                                         'deadline': '4'})
+            data = response.json()["data"]
+            results = {item["code"]: item for item in data["results"]}
+            assert data["total"] == 3 and data["failed"] == 2 and data["timed_out"] == 0
+            assert results["sh600519"]["ok"] and results["sh600519"]["data"]["code"] == 'sh600519'
+            assert not results["bad000001"]["ok"] and '404' in results["bad000001"]["error"]
+            assert not results["fail000002"]["ok"] and '500' in results["fail000002"]["error"]
+            assert server.calls.count('fail000002') == stock_api_utils.RETRY_TOTAL + 1
+
+            # 流式返回：每只股票一行
+            response = client.get('/api/fetch_stocks/', {'codes': 'sh600519,bad000001', 'stream': '1'})
+            lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+            assert sorted(item["code"] for item in lines) == ['bad000001', 'sh600519']
+            # 成功的结果已缓存，失败的不缓存
+            assert {item["code"]: item["cache"] for item in lines} == {'sh600519': 'HIT', 'bad000001': 'MISS'}
+        print(f"✓ {sorted(results)}")
+    finally:
+        stock_api_utils.RETRY_BACKOFF_FACTOR = factor
+
+
+def wait_for_loads(timeout=10):
+    """等待行情缓存的后台加载完成，避免遗留的请求写入后续测试的缓存"""
+    end = time.monotonic() + timeout
+    while quote_cache.get_stats()["inflight"] and time.monotonic() < end:
+        time.sleep(0.05)
+    assert not quote_cache.get_stats()["inflight"]
+
+
+def test_fetch_stocks_deadline():
+    """测试截止时间到期：未完成的股票标记为timeout，已开始的上游请求在后台完成并写入缓存"""
+    print("\n=== 测试批量接口截止时间 ===")
+
+    delay, slots = FakeUpstream.slow_delay, quote_batch.BATCH_REQUEST_SLOTS
+    FakeUpstream.slow_delay, quote_batch.BATCH_REQUEST_SLOTS = 3.0, 1
+    try:
+        with fake_upstream() as server:
+            client = Client(HTTP_HOST='localhost')
+            started = time.monotonic()
+            response = client.get('/api/fetch_stocks/', {'codes': 'slow1,slow2,sh600519', 'deadline': '1.5'})
+            elapsed = time.monotonic() - started
+            data = response.json()["data"]
+            results = {item["code"]: item for item in data["results"]}
+            assert elapsed < 2.0, elapsed
+            assert data["total"] == 3 and data["failed"] == 3 and data["timed_out"] == 3
+            # slow1 已开始请求，slow2 和 sh600519 没有轮到
+            assert all(item["error"] == 'timeout' for item in results.values())
+            assert server.calls == ['slow1']
+            wait_for_loads()
+            assert quote_cache.peek(('slow1', 'day'))["code"] == 'slow1'
+        print(f"✓ {elapsed:.2f}秒内返回")
+    finally:
+        FakeUpstream.slow_delay, quote_batch.BATCH_REQUEST_SLOTS = delay, slots
+
+
+def test_fetch_stocks_deadline_not_shared():
+    """测试批量请求的截止时间不影响同时请求同一只股票的单只接口：两者共用一次上游请求，
+    批量请求超时，单只接口仍拿到数据"""
+    print("\n=== 测试截止时间不影响合并的请求 ===")
+
+    delay = FakeUpstream.slow_delay
+    FakeUpstream.slow_delay = 1.0
+    try:
+        with fake_upstream() as server:
+            batch = {}
+
+            def fetch_batch():
+                response = Client(HTTP_HOST='localhost').get('/api/fetch_stocks/',
+                                                             {'codes': 'slow1', 'deadline': '0.3'})
+                batch.update(response.json()["data"]["results"][0])
+
+            thread = threading.Thread(target=fetch_batch)
+            thread.start()
+            while not server.calls:
+                time.sleep(0.01)
+            response = Client(HTTP_HOST='localhost').get('/api/fetch_stock/', {'code': 'slow1'})
+            thread.join()
+            assert batch["error"] == 'timeout'
+            assert response.status_code == 200 and response["X-Cache"] == 'COALESCED'
+            assert response.json()["data"]["code"] == 'slow1'
+            assert server.calls == ['slow1']
+            response = Client(HTTP_HOST='localhost').get('/api/fetch_stock/', {'code': 'slow1'})
+            assert response["X-Cache"] == 'HIT'
+        print("✓ 单只接口拿到数据")
+    finally:
+        FakeUpstream.slow_delay = delay
+
+
+def test_fetch_stocks_slots():
+    """测试单个批量请求同时占用的线程数不超过 BATCH_REQUEST_SLOTS"""
+    print("\n=== 测试批量请求并发上限 ===")
+
+    delay, slots = FakeUpstream.slow_delay, quote_batch.BATCH_REQUEST_SLOTS
+    FakeUpstream.slow_delay, quote_batch.BATCH_REQUEST_SLOTS = 0.2, 2
+    try:
+        with fake_upstream() as server:
+            codes = [f'slow{i}' for i in range(6)]
+            results = list(quote_batch.iter_quotes(codes, deadline=20))
+            assert sorted(item["code"] for item in results) == codes
+            assert all(item["ok"] for item in results)
+            assert server.max_active == 2 and len(server.calls) == 6
+        print(f"✓ 同时最多 {server.max_active} 个上游请求")
+    finally:
+        FakeUpstream.slow_delay, quote_batch.BATCH_REQUEST_SLOTS = delay, slots
+
+
+def test_stock_kline_view():
+    """测试 /api/stocks/kline/：列、指标和 limit 参数，参数错误返回400（不请求上游），上游失败返回502"""
+    print("\n=== 测试K线接口 ===")
+
+    with fake_upstream() as server:
+        client = Client(HTTP_HOST='localhost')
+        # 模拟上游返回5根K线：收盘价 11..15，没有 high/low
+        response = client.get('/api/stocks/kline/', {'code': 'sh600519', 'columns': 'date, CLOSE',
+                                                     'indicators': 'ma2,macd,ma2', 'limit': '3'})
+        data = response.json()["data"]
+        assert response.status_code == 200 and response["X-Cache"] == 'MISS'
+        assert data["stock_code"] == 'sh600519' and data["ktype"] == 'day' and data["count"] == 3
+        assert data["fields"] == ['date', 'close', 'ma2', 'dif', 'dea', 'macd']
+        columns = dict(zip(data["fields"], data["columns"]))
+        assert columns["date"] == ['2024-01-03', '2024-01-04', '2024-01-05']
+        assert columns["close"] == [13, 14, 15]
+        # 指标按完整序列计算后再截取
+        assert columns["ma2"] == [12.5, 13.5, 14.5]
+        assert all(len(column) == 3 for column in data["columns"])
+
+        response = client.get('/api/stocks/kline/', {'code': 'sh600519'})
+        data = response.json()["data"]
+        assert response["X-Cache"] == 'HIT' and data["count"] == 5
+        assert data["fields"] == ['date', 'open', 'high', 'low', 'close', 'volume']
+        columns = dict(zip(data["fields"], data["columns"]))
+        assert columns["high"] == [None] * 5 and columns["volume"] == [1000, 1001, 1002, 1003, 1004]
+
+        for params in ({}, {'ktype': 'hour'}, {'indicators': 'kdj'}, {'indicators': 'ma'},
+                       {'indicators': 'ma0'}, {'indicators': 'macd5'}, {'columns': 'date,price'},
+                       {'limit': '0'}, {'limit': 'abc'}):
+            params = {'code': 'sz000001', **params} if params else params
+            response = client.get('/api/stocks/kline/', params)
+            assert response.status_code == 400 and response.json()["code"] == 400, params
+        assert server.calls == ['sh600519']
+
+        response = client.get('/api/stocks/kline/', {'code': 'bad000001'})
+        assert response.status_code == 502 and response.json()["code"] == 502
+    print("✓ 参数解析及错误码")
+
+
+def test_retry_backoff_matches_urllib3():
+    """测试异步重试的等待时间与同步 Session 使用的 urllib3 Retry 相同（第一次重试立即进行）"""
+    print("\n=== 测试重试退避 ===")
+
+    retry = Retry(total=stock_api_utils.RETRY_TOTAL, backoff_factor=stock_api_utils.RETRY_BACKOFF_FACTOR)
+    expected = []
+    for _ in range(stock_api_utils.RETRY_TOTAL):
+        retry = retry.increment(method='GET', url='/')
+        expected.append(retry.get_backoff_time())
+    assert [retry_backoff(n) for n in range(1, stock_api_utils.RETRY_TOTAL + 1)] == expected == [0, 1.0, 2.0]
+    print(f"✓ {expected}")
+
+
+def test_async_client():
+    """测试同一事件循环复用一个异步客户端并在事件循环关闭时关闭；httpx 错误返回502"""
+    print("\n=== 测试异步客户端 ===")
+
+    factor = stock_api_utils.RETRY_BACKOFF_FACTOR
+    stock_api_utils.RETRY_BACKOFF_FACTOR = 0.01
+    try:
+        with fake_upstream() as server:
+            async def run():
+                first = await get_async_client()
+                results = await asyncio.gather(*(AsyncStockApiUtils(code).fetch_stock_data(timeout=5)
+                                                 for code in ('sh600519', 'fail000002', 'gzip000003')))
+                assert await get_async_client() is first
+                return first, results
+
+            client, results = asyncio.run(run())
+            # asyncio.run 关闭事件循环时一并关闭了客户端
+            assert client.is_closed
+            assert results[0]["code"] == 'sh600519'
+            assert results[1]["success"] is False and '500' in results[1]["error"]
+            # 5xx 与同步 Session 一样重试3次
+            assert server.calls.count('fail000002') == stock_api_utils.RETRY_TOTAL + 1
+            # 解码错误不是 TransportError，同样返回失败结果
+            assert results[2]["success"] is False
+
+            # WSGI 下每个请求在新的事件循环中执行，不复用也不遗留客户端
+            other, _ = asyncio.run(run())
+            assert other is not client and other.is_closed
+
+            client = Client(HTTP_HOST='localhost')
+            response = client.get('/api/async/fetch_stock/', {'code': 'gzip000004'})
+            assert response.status_code == 502 and response.json()["code"] == 502
+            response = client.get('/api/async/fetch_stock/', {'code': 'sh600000'})
+            assert response.status_code == 200 and response["X-Cache"] == 'MISS'
+        print("✓ 客户端随事件循环关闭，错误返回502")
+    finally:
+        stock_api_utils.RETRY_BACKOFF_FACTOR = factor
+
+
+if __name__ == "__main__":
+    print("开始测试行情请求层...")
+
+    test_shared_session()
+    test_fetch_stocks_validation()
+    test_fetch_stocks_errors()
+    test_fetch_stocks_deadline()
+    test_fetch_stocks_deadline_not_shared()
+    test_fetch_stocks_slots()
+    test_stock_kline_view()
+    test_retry_backoff_matches_urllib3()
+    test_async_client()
+
+    print("\n所有行情请求层测试完成！")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试股票池（StockUniverse）：市场判断、按文件签名缓存、分页参数以及 /api/stocks/ 接口的ETag/304
+股票池文件使用临时文件，不依赖数据库
+"""
+
+import sys
+import os
+import tempfile
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 设置Django环境变量（接口测试需要）
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zproject.settings')
+
+import django
+django.setup()
+
+from django.test import Client
+
+from zapp import views
+from zapp.services.stock_universe import StockUniverse, market_of
+
+SAMPLE = '贵州茅台(600519)平安银行(000001)宁德时代(300750)北交样本(830799)\n新北交(920001)沪B股(900901)深B股(200002)'
+
+
+def write_universe(path, text, mtime_offset=0):
+    """写入股票池文件；mtime_offset 用于让改写后的 mtime 一定与之前不同"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    if mtime_offset:
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset * 1_000_000_000))
+
+
+def test_market_of():
+    """测试按代码前缀判断市场，包括北交所 920、沪B 900、深B 200"""
+    print("\n=== 测试市场判断 ===")
+
+    expected = {'600519': 'sh', '688981': 'sh', '900901': 'sh', '000001': 'sz', '300750': 'sz',
+                '200002': 'sz', '830799': 'bj', '430047': 'bj', '920001': 'bj', '510300': None, '159915': None}
+    assert {code: market_of(code) for code in expected} == expected
+    print("✓ 前缀映射正确")
+
+
+def test_universe_cache():
+    """测试未变化时复用解析结果，文件改写（mtime变化）后重新解析并清空分页缓存"""
+    print("\n=== 测试股票池缓存 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'a.txt')
+        write_universe(path, SAMPLE)
+        universe = StockUniverse(path)
+        version = universe.get_version()
+        records = universe._load()[1]
+        assert universe._load()[1] is records and len(records) == 7
+        body = universe.get_page_json()[1]
+        assert universe.get_page_json()[1] is body
+
+        # 大小不变、内容变化：靠mtime识别
+        write_universe(path, SAMPLE.replace('贵州茅台', '茅台股份'), mtime_offset=5)
+        assert universe.get_version() != version
+        assert universe.get_page(limit=1)["items"][0]["label"] == '茅台股份'
+        new_version, new_body = universe.get_page_json()
+        assert new_version == universe.get_version() and new_body != body
+        assert '茅台股份'.encode('utf-8') in new_body
+
+        # 版本和内容来自同一次加载：两次加载之间文件变化也不会把旧版本配上新数据
+        loads = []
+        load = universe._load
+        universe._load = lambda: loads.append(1) or load()
+        universe.get_page_json(offset=3)
+        assert len(loads) == 1
+        print(f"✓ 版本 {version} -> {new_version}")
+
+
+def test_universe_pages():
+    """测试 offset/limit/market 分页及无效参数"""
+    print("\n=== 测试股票池分页 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'a.txt')
+        write_universe(path, SAMPLE)
+        universe = StockUniverse(path)
+
+        page = universe.get_page(offset='1', limit='2')
+        assert [item["code"] for item in page["items"]] == ['000001', '300750']
+        assert page["total"] == 7 and page["count"] == 2 and page["has_more"]
+        page = universe.get_page(offset=6, limit=5)
+        assert page["count"] == 1 and not page["has_more"]
+
+        page = universe.get_page(market='bj')
+        assert [item["code"] for item in page["items"]] == ['830799', '920001'] and page["total"] == 2
+        page = universe.get_page(offset=1, limit=1, market='sz')
+        assert [item["code"] for item in page["items"]] == ['300750'] and page["has_more"]
+
+        version, body = universe.get_page_json(limit=2, market='sh')
+        assert body.startswith(b'{"total":2,') and b'"fields":["code","label","market"]' in body
+        assert b'["900901","\xe6\xb2\xaa' in body
+
+        for offset, limit, market in (('x', 1, None), (0, 'y', None), (-1, 1, None), (0, 0, None), (0, 1, 'hk')):
+            for method in (universe.get_page, universe.get_page_json):
+                try:
+                    method(offset, limit, market)
+                    assert False, (offset, limit, market)
+                except ValueError:
+                    pass
+        print("✓ 分页及参数校验")
+
+
+def test_stock_list_view():
+    """测试 /api/stocks/：ETag/304、文件变化后返回新数据、参数错误400、文件不存在404"""
+    print("\n=== 测试股票池接口 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'a.txt')
+        write_universe(path, SAMPLE)
+        original, views.stock_universe = views.stock_universe, StockUniverse(path)
+        try:
+            client = Client(HTTP_HOST='localhost')
+            response = client.get('/api/stocks/', {'market': 'sz', 'limit': '10'})
+            etag = response["ETag"]
+            data = response.json()["data"]
+            assert response.status_code == 200 and response["Cache-Control"] == 'no-cache'
+            assert [item[0] for item in data["items"]] == ['000001', '300750', '200002']
+
+            response = client.get('/api/stocks/', {'market': 'sz'}, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304 and response["ETag"] == etag
+
+            write_universe(path, SAMPLE + '新股(301000)', mtime_offset=5)
+            response = client.get('/api/stocks/', {'market': 'sz'}, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200 and response["ETag"] != etag
+            assert response.json()["data"]["total"] == 4
+
+            assert client.get('/api/stocks/', {'limit': 'abc'}).status_code == 400
+            assert client.get('/api/stocks/', {'market': 'hk'}).status_code == 400
+            os.remove(path)
+            assert client.get('/api/stocks/').status_code == 404
+        finally:
+            views.stock_universe = original
+        print(f"✓ ETag {etag}")
+
+
+if __name__ == "__main__":
+    print("开始测试股票池...")
+
+    test_market_of()
+    test_universe_cache()
+    test_universe_pages()
+    test_stock_list_view()
+
+    print("\n所有股票池测试完成！")
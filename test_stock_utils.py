@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试股票相关的纯计算逻辑（股票池解析等）
+不依赖网络和Django环境
+"""
+
+import sys
+import os
+import math
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from array import array
+
+from zapp.services import kline as kline_module
+from zapp.services.kline import bollinger, ema, macd, rsi, sma, parse_kline, parse_indicators, build_compact_kline
+from zapp.services.quote_cache import QuoteCache
+from zapp.services.stock_universe import parse_stock_universe
+
+
+def test_parse_stock_universe():
+    """测试 "名称(代码)" 解析、市场判断和去重"""
+    print("\n=== 测试股票池解析 ===")
+
+    text = '贵州茅台(600519) 平安银行(000001)\n*ST中程(300208)北交所样本(830799)平安银行(000001)(123)'
+    records = parse_stock_universe(text)
+    assert records == [
+        {"code": "600519", "label": "贵州茅台", "market": "sh"},
+        {"code": "000001", "label": "平安银行", "market": "sz"},
+        {"code": "300208", "label": "*ST中程", "market": "sz"},
+        {"code": "830799", "label": "北交所样本", "market": "bj"},
+    ], records
+    print(f"✓ 解析出 {len(records)} 条记录")
+
+
+def test_quote_cache_single_flight():
+    """测试并发未命中合并为一次上游请求，失败结果不缓存"""
+    print("\n=== 测试行情缓存请求合并 ===")
+
+    calls = []
+    gate = threading.Event()
+
+    def loader():
+        calls.append(1)
+        gate.wait(1)
+        return {"price": 1}
+
+    cache = QuoteCache(ttl=60, stale_ttl=0)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(cache.get, ('600519', 'day'), loader) for _ in range(6)]
+        time.sleep(0.1)
+        gate.set()
+        results = [f.result() for f in futures]
+    assert len(calls) == 1
+    assert sorted(status for _, status in results) == ['COALESCED'] * 5 + ['MISS']
+    assert cache.get(('600519', 'day'), loader) == ({"price": 1}, 'HIT')
+
+    failure = {'success': False, 'error': 'timeout'}
+    assert cache.get(('000001', 'day'), lambda: failure) == (failure, 'MISS')
+    assert cache.get(('000001', 'day'), lambda: {"price": 2}) == ({"price": 2}, 'MISS')
+    print(f"✓ {cache.get_stats()}")
+
+
+def wait_until(predicate, timeout=5):
+    """等待后台刷新等异步操作完成"""
+    end = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < end:
+        time.sleep(0.01)
+    assert predicate()
+
+
+def test_quote_cache_stale_while_revalidate():
+    """测试过期后在 stale_ttl 内返回旧数据且每个键只有一个后台刷新；刷新失败保留旧数据；
+    超出 ttl + stale_ttl 后丢弃"""
+    print("\n=== 测试行情缓存过期刷新 ===")
+
+    key = ('600519', 'day')
+    cache = QuoteCache(ttl=0.2, stale_ttl=0.5)
+    assert cache.get(key, lambda: {"price": 1}) == ({"price": 1}, 'MISS')
+
+    calls = []
+    gate = threading.Event()
+
+    def refresh():
+        calls.append(1)
+        gate.wait(1)
+        return {"price": 2}
+
+    time.sleep(0.25)
+    assert [cache.get(key, refresh) for _ in range(3)] == [({"price": 1}, 'STALE')] * 3
+    wait_until(lambda: calls)
+    gate.set()
+    wait_until(lambda: cache.get_stats()["refreshing"] == 0)
+    assert len(calls) == 1 and cache.get_stats()["refreshes"] == 1
+    assert cache.get(key, refresh) == ({"price": 2}, 'HIT')
+
+    # 刷新失败（返回失败结果或抛出异常）时保留旧数据
+    time.sleep(0.25)
+    for loader in (lambda: {'success': False, 'error': 'timeout'}, lambda: 1 / 0):
+        assert cache.get(key, loader) == ({"price": 2}, 'STALE')
+        wait_until(lambda: cache.get_stats()["refreshing"] == 0)
+    assert cache.get_stats()["refresh_errors"] == 2 and cache.get_stats()["entries"] == 1
+
+    # 超出 ttl + stale_ttl 后不再返回旧数据
+    time.sleep(0.5)
+    assert cache.get(key, lambda: {"price": 3}) == ({"price": 3}, 'MISS')
+    print(f"✓ {cache.get_stats()}")
+
+
+def test_quote_cache_timeout():
+    """测试 timeout 只影响该调用方：加载在后台完成并写入缓存，合并的其他调用方拿到数据"""
+    print("\n=== 测试行情缓存等待超时 ===")
+
+    key = ('600519', 'day')
+    gate = threading.Event()
+
+    def loader():
+        gate.wait(1)
+        return {"price": 1}
+
+    cache = QuoteCache(ttl=60, stale_ttl=0)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert cache.get(key, loader, timeout=0.05) == ({'success': False, 'error': 'timeout'}, 'TIMEOUT')
+        waiting = pool.submit(cache.get, key, lambda: {"price": 0})
+        time.sleep(0.05)
+        gate.set()
+        assert waiting.result() == ({"price": 1}, 'COALESCED')
+    assert cache.get(key, loader, timeout=0) == ({"price": 1}, 'HIT')
+    assert cache.get_stats()["timeouts"] == 1
+
+    # 在超时前完成时与不带 timeout 相同
+    assert cache.get(('000001', 'day'), lambda: {"price": 2}, timeout=1) == ({"price": 2}, 'MISS')
+    print(f"✓ {cache.get_stats()}")
+
+
+def test_kline_indicators():
+    """测试K线解析（含缺失值）和紧凑输出中的指标"""
+    print("\n=== 测试K线解析和指标 ===")
+
+    rows = [f"2024-01-{i + 1:02d},{i + 1},{i + 2},{i},{i + 1},{100 * (i + 1)},--" for i in range(6)]
+    rows[2] = "2024-01-03,--,--,--,--,--,--"
+    payload = {"Result": {"newMarketData": {
+        "keys": ["time", "open", "high", "low", "close", "volume", "ma5avgprice"],
+        "marketData": ";".join(rows)}}}
+    kline = parse_kline(payload)
+    assert len(kline) == 6 and kline.dates[0] == "2024-01-01"
+    assert list(kline.columns['close'][:2]) == [1.0, 2.0]
+
+    specs = parse_indicators("ma2,ema3,rsi2,macd,boll2")
+    data = build_compact_kline(kline, ["date", "close", "volume"], specs, limit=3)
+    columns = dict(zip(data["fields"], data["columns"]))
+    assert data["count"] == 3
+    assert columns["date"] == ["2024-01-04", "2024-01-05", "2024-01-06"]
+    assert columns["volume"] == [400, 500, 600]
+    # 缺失值所在窗口的均线为 null
+    assert columns["ma2"] == [None, 4.5, 5.5]
+    assert columns["rsi2"][-1] == 100.0
+    assert columns["boll2_upper"][-1] == 6.5 and columns["boll2_lower"][-1] == 4.5
+    assert {"dif", "dea", "macd"} <= set(columns)
+
+    for bad in ("ma", "kdj", "ma0", "macd5"):
+        try:
+            parse_indicators(bad)
+            assert False, bad
+        except ValueError:
+            pass
+    print(f"✓ {data['fields']}")
+
+
+def test_kline_sorted_by_date():
+    """测试上游的行乱序时按日期升序排列，各列随日期一起移动"""
+    print("\n=== 测试K线按日期排序 ===")
+
+    payload = {"Result": {"newMarketData": {
+        "keys": ["time", "close", "volume"],
+        "marketData": "2024-01-03,3,300;2024-01-01,1,100;2024-01-02,2,200"}}}
+    kline = parse_kline(payload)
+    assert kline.dates == ["2024-01-01", "2024-01-02", "2024-01-03"]
+    assert list(kline.columns['close']) == [1.0, 2.0, 3.0]
+    assert list(kline.columns['volume']) == [100.0, 200.0, 300.0]
+    assert all(math.isnan(value) for value in kline.columns['open'])
+    print(f"✓ {kline.dates}")
+
+
+def without_numpy(function, *args):
+    """用纯Python实现计算（未安装NumPy时跳过测试）"""
+    if kline_module.np is None:
+        raise unittest.SkipTest("未安装NumPy")
+    kline_module.np, np = None, kline_module.np
+    try:
+        return function(*args)
+    finally:
+        kline_module.np = np
+
+
+def assert_same_series(vectorized, pure):
+    """逐点比较两种实现的结果：NaN 的位置相同，其余数值一致"""
+    assert len(vectorized) == len(pure)
+    for value, expected in zip(vectorized, pure):
+        if math.isnan(expected):
+            assert math.isnan(value), value
+        else:
+            assert math.isclose(value, expected, rel_tol=1e-9, abs_tol=1e-9), (value, expected)
+
+
+def test_bollinger_numpy_matches_pure():
+    """测试价格数值很大时，NumPy 与纯Python实现的布林带一致（未安装NumPy时跳过）"""
+    print("\n=== 测试布林带两种实现一致 ===")
+
+    close = array('d', (1e9 + 0.01 * math.sin(i) for i in range(300)))
+    close[100] = float('nan')
+    pure = without_numpy(bollinger, close, 20)
+    vectorized = bollinger(close, 20)
+
+    checked = 0
+    for (mid, upper, _), (pure_mid, pure_upper, _) in zip(zip(*vectorized), zip(*pure)):
+        if math.isnan(pure_upper):
+            assert math.isnan(upper)
+            continue
+        # 比较偏离中轨的距离（约0.014），而不是1e9量级的轨道本身
+        assert math.isclose(upper - mid, pure_upper - pure_mid, rel_tol=1e-4), (upper - mid, pure_upper - pure_mid)
+        checked += 1
+    assert checked == 300 - 19 - 20
+    print(f"✓ 比较了 {checked} 个点")
+
+
+def test_indicators_numpy_matches_pure():
+    """测试 NumPy 与纯Python实现的 MA、EMA、MACD、RSI 一致：序列跨多个递推块、含缺失值，
+    周期覆盖 1 到 250（未安装NumPy时跳过）"""
+    print("\n=== 测试指标两种实现一致 ===")
+
+    close = array('d', (100 + 10 * math.sin(i / 7) + (i % 5) for i in range(1000)))
+    for i in (0, 1, 130, 131, 640):
+        close[i] = float('nan')
+    cases = [(function, period) for function in (sma, ema, rsi) for period in (1, 2, 6, 14, 250)]
+    for function, period in cases:
+        assert_same_series(function(close, period), without_numpy(function, close, period))
+    for vectorized, pure in zip(macd(close), without_numpy(macd, close)):
+        assert_same_series(vectorized, pure)
+    # 有效数据不足一个周期时全部为 NaN
+    short = close[:10]
+    assert all(math.isnan(value) for value in rsi(short, 14))
+    assert_same_series(ema(array('d'), 12), array('d'))
+    print(f"✓ 比较了 {len(cases) + 1} 组指标")
+
+
+if __name__ == "__main__":
+    print("开始测试股票工具...")
+
+    test_parse_stock_universe()
+    test_quote_cache_single_flight()
+    test_quote_cache_stale_while_revalidate()
+    test_quote_cache_timeout()
+    test_kline_indicators()
+    test_kline_sorted_by_date()
+    for test in (test_bollinger_numpy_matches_pure, test_indicators_numpy_matches_pure):
+        try:
+            test()
+        except unittest.SkipTest as e:
+            print(f"- 跳过：{e}")
+
+    print("\n所有股票工具测试完成！")
@@ -0,0 +1,140 @@
+# zapp/services/asset_cache.py
+"""进程内的热点静态文件缓存
+
+首页和计时页反复请求同一批字体和音频：小文件整体读入内存，以不可变的
+bytes 保存，总字节数受预算限制，超出时按LRU淘汰；大文件用 mmap 只读映射，
+由内核页缓存承载，不占用预算。每次使用前比较 (size, mtime)，文件变化后重新加载。
+
+更新静态文件应写新文件后重命名替换，不要原地截断：被映射的文件变短后，
+读取超出新长度的部分会导致进程收到 SIGBUS。
+"""
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+# 小文件缓存的总字节预算
+ASSET_CACHE_MAX_BYTES = int(os.environ.get('STATIC_ASSET_CACHE_BYTES', str(32 * 1024 * 1024)))
+# 超过该大小的文件使用mmap
+ASSET_MMAP_THRESHOLD = int(os.environ.get('STATIC_ASSET_MMAP_THRESHOLD', str(1024 * 1024)))
+
+
+class AssetCache:
+    """静态文件内容缓存（线程安全）"""
+
+    def __init__(self, max_bytes=ASSET_CACHE_MAX_BYTES, mmap_threshold=ASSET_MMAP_THRESHOLD):
+        """
+        Args:
+            max_bytes (int): 小文件缓存的总字节预算
+            mmap_threshold (int): 超过该大小的文件使用mmap
+        """
+        self.max_bytes = max_bytes
+        self.mmap_threshold = mmap_threshold
+        self._lock = threading.Lock()
+        self._files = OrderedDict()  # 路径 -> ((size, mtime_ns), bytes)
+        self._maps = {}  # 路径 -> ((size, mtime_ns), mmap)
+        self._cached_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._bytes_served = 0
+
+    def get(self, full_path, allow_mmap=True):
+        """
+        获取文件内容
+
+        Args:
+            full_path (str): 文件绝对路径
+            allow_mmap (bool): 为False时大文件直接返回None（由调用方用sendfile等方式发送）
+
+        Returns:
+            bytes | mmap.mmap | None: 文件内容（mmap 只读，不要关闭）
+
+        Raises:
+            OSError: 如果文件无法读取
+        """
+        stat = os.stat(full_path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        large = stat.st_size > self.mmap_threshold
+        if large and not allow_mmap:
+            return None
+        store = self._maps if large else self._files
+        with self._lock:
+            cached = store.get(full_path)
+            if cached is not None and cached[0] == key:
+                if store is self._files:
+                    self._files.move_to_end(full_path)
+                self._hits += 1
+                self._bytes_served += stat.st_size
+                return cached[1]
+            self._misses += 1
+            self._bytes_served += stat.st_size
+
+        if store is self._maps:
+            content = self._map(full_path)
+        else:
+            with open(full_path, 'rb') as f:
+                content = f.read()
+        if len(content) != stat.st_size:
+            # 读取期间文件被修改：本次直接使用，不缓存
+            return content
+
+        with self._lock:
+            # 文件大小跨过阈值时清掉另一种存储中的旧版本
+            self._discard(full_path)
+            if store is self._maps:
+                self._maps[full_path] = (key, content)
+            elif len(content) <= self.max_bytes:
+                self._files[full_path] = (key, content)
+                self._cached_bytes += len(content)
+                while self._cached_bytes > self.max_bytes:
+                    _, (_, evicted) = self._files.popitem(last=False)
+                    self._cached_bytes -= len(evicted)
+                    self._evictions += 1
+        return content
+
+    @staticmethod
+    def _map(full_path):
+        with open(full_path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _discard(self, full_path):
+        cached = self._files.pop(full_path, None)
+        if cached is not None:
+            self._cached_bytes -= len(cached[1])
+        # 旧的映射不主动关闭：可能仍有响应在读取，引用释放后自动解除映射
+        self._maps.pop(full_path, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._files.clear()
+            self._maps.clear()
+            self._cached_bytes = 0
+
+    def get_stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 命中/未命中次数、淘汰次数、缓存字节数、映射字节数等
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else None,
+                "evictions": self._evictions,
+                "cached_files": len(self._files),
+                "cached_bytes": self._cached_bytes,
+                "max_bytes": self.max_bytes,
+                "mapped_files": len(self._maps),
+                "mapped_bytes": sum(len(m) for _, m in self._maps.values()),
+                "mmap_threshold": self.mmap_threshold,
+                "bytes_served": self._bytes_served,
+            }
+
+
+# 创建全局缓存实例
+asset_cache = AssetCache()
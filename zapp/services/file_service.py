@@ -1,12 +1,43 @@
 # zapp/services/file_service.py
 import os
+import json
 import base64
+import fnmatch
+import hashlib
 import mimetypes
+import threading
+from collections import OrderedDict
 
-def get_directory_contents(target_dir):
+# 目录列表缓存最多保留的参数组合数
+LISTING_CACHE_MAX_ENTRIES = 32
+# base64响应缓存的总字节上限
+BASE64_CACHE_MAX_BYTES = int(os.environ.get('BASE64_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+# 超过该大小的文件不缓存，按块流式编码
+BASE64_STREAM_THRESHOLD = int(os.environ.get('BASE64_STREAM_THRESHOLD', str(1024 * 1024)))
+# 流式编码时每次读取的字节数（3的倍数，保证各块编码结果可以直接拼接）
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+_listing_cache = OrderedDict()
+_listing_cache_lock = threading.Lock()
+
+# (路径, mtime_ns, size, MIME类型) -> JSON响应体
+_base64_cache = OrderedDict()
+_base64_cache_bytes = 0
+_base64_cache_lock = threading.Lock()
+
+
+def get_directory_contents(target_dir, limit=None, offset=0, pattern=None,
+                           content_pattern=None, preview_size=None):
     """
-    读取目标目录的内容，若为txt文件则额外返回文件内容
+    读取目标目录的内容（基于os.scandir，复用目录项自带的类型和stat信息）
+    txt文件的内容需要显式请求：匹配 content_pattern 的文件返回全文，
+    或通过 preview_size 为所有txt文件返回前若干个字符的预览
     :param target_dir: 目标目录路径
+    :param limit: 最多返回的条目数，None表示不限制
+    :param offset: 跳过的条目数（条目按名称排序）
+    :param pattern: 文件名过滤（glob，如 *.mp3）
+    :param content_pattern: 需要返回全文的txt文件名（glob，如 a.txt 或 *.txt）
+    :param preview_size: 其余txt文件返回的预览字符数，None表示不返回内容
     :return: 包含状态码、数据、消息的字典
     """
     try:
@@ -26,30 +57,47 @@ def get_directory_contents(target_dir):
                 "message": f"不是目录：{target_dir}"
             }
         
-        # 读取目录内容并构造详细信息
-        items = os.listdir(target_dir)
+        # 分页参数校验
+        if offset < 0 or (limit is not None and limit < 0) or (preview_size is not None and preview_size < 0):
+            return {
+                "code": 400,
+                "data": None,
+                "message": "参数错误：limit/offset/preview 不能为负数"
+            }
+        
+        # 一次scandir拿到名称、类型和stat，按名称排序保证分页稳定
+        with os.scandir(target_dir) as it:
+            entries = sorted(
+                (entry for entry in it if pattern is None or fnmatch.fnmatch(entry.name, pattern)),
+                key=lambda entry: entry.name
+            )
+        total = len(entries)
+        page = entries[offset:] if limit is None else entries[offset:offset + limit]
+        
         items_detail = []
-        for item in items:
-            item_path = os.path.join(target_dir, item)
-            item_type = "file" if os.path.isfile(item_path) else "directory"
-            modify_time = int(os.path.getmtime(item_path))  # 最后修改时间戳
+        for entry in page:
+            is_file = entry.is_file()
+            item_type = "file" if is_file else "directory"
+            stat = entry.stat()
+            modify_time = int(stat.st_mtime)  # 最后修改时间戳
             
-            # 新增：读取txt文件内容（非txt文件或目录则content为None）
+            # txt文件内容按需读取（非txt文件或目录则content为None）
             content = None
-            if item_type == "file" and item.lower().endswith(".txt"):
-                try:
-                    # 读取txt文件内容（处理编码问题，Windows常见gbk/utf-8）
-                    with open(item_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()  # 读取全部内容（大文件可考虑限制长度）
-                except Exception as e:
-                    content = f"读取失败：{str(e)}"  # 记录读取错误，不中断整体流程
+            truncated = False
+            if is_file and entry.name.lower().endswith(".txt"):
+                if content_pattern is not None and fnmatch.fnmatch(entry.name, content_pattern):
+                    content, truncated = _read_text(entry.path, None)
+                elif preview_size is not None:
+                    content, truncated = _read_text(entry.path, preview_size)
             
             items_detail.append({
-                "name": item,
+                "name": entry.name,
                 "type": item_type,
                 "modify_time": modify_time,
-                "path": item_path,
-                "content": content  # 新增：文件内容（仅txt文件可能有值）
+                "size": stat.st_size if is_file else None,
+                "path": entry.path,
+                "content": content,  # 文件内容（仅请求了内容的txt文件有值）
+                "truncated": truncated  # content是否只是预览
             })
         
         # 返回成功结果
@@ -57,6 +105,8 @@ def get_directory_contents(target_dir):
             "code": 200,
             "data": {
                 "directory": str(target_dir),
+                "total": total,
+                "offset": offset,
                 "count": len(items_detail),
                 "items": items_detail
             },
@@ -71,68 +121,145 @@ def get_directory_contents(target_dir):
             "message": f"读取目录失败：{str(e)}"
         }
 
-def read_file(file_path, return_type='binary'):
+
+def _stat_signature(paths):
     """
-    读取文件内容，支持二进制和base64格式
-    :param file_path: 文件路径
-    :param return_type: 返回格式，'binary'或'base64'
-    :return: 包含状态码、数据、消息的字典
+    目录及列表中各条目的 (mtime, size, inode)，任一路径不存在时返回None
+    条目增删改名会改变目录的mtime，文件内容变化会改变文件自身的mtime/size
     """
-    try:
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            return {
-                "code": 404,
-                "data": None,
-                "message": f"文件不存在：{file_path}"
-            }
-        
-        # 检查是否为文件
-        if not os.path.isfile(file_path):
-            return {
-                "code": 400,
-                "data": None,
-                "message": f"不是文件：{file_path}"
-            }
-        
-        # 获取文件的MIME类型
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if not mime_type:
-            mime_type = 'application/octet-stream'  # 默认MIME类型
-        
-        # 读取文件内容
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        
-        # 根据返回类型处理内容
-        if return_type == 'base64':
-            # 转换为base64格式
-            base64_content = base64.b64encode(content).decode('utf-8')
-            return {
-                "code": 200,
-                "data": {
-                    "content": base64_content,
-                    "mime_type": mime_type,
-                    "encoding": "base64"
-                },
-                "message": "success"
-            }
-        else:
-            # 返回二进制内容
-            return {
-                "code": 200,
-                "data": {
-                    "content": content,
-                    "mime_type": mime_type,
-                    "encoding": "binary"
-                },
-                "message": "success"
-            }
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+    return tuple(signature)
+
+
+def get_directory_listing(target_dir, **options):
+    """
+    带缓存的目录列表：缓存 get_directory_contents 的结果及序列化后的JSON
+    每次使用前只stat目录和列表中的条目来校验，不重新遍历目录、不重新读取txt文件
+    :param target_dir: 目标目录路径
+    :param options: 透传给 get_directory_contents 的过滤、分页和内容参数
+    :return: (结果字典, JSON字节, ETag, 最后修改时间戳)；失败时后三项为None
+    """
+    key = (str(target_dir), tuple(sorted(options.items())))
+    with _listing_cache_lock:
+        cached = _listing_cache.get(key)
+    if cached is not None:
+        paths, signature, entry = cached
+        if _stat_signature(paths) == signature:
+            with _listing_cache_lock:
+                if key in _listing_cache:
+                    _listing_cache.move_to_end(key)
+            return entry
+    
+    result = get_directory_contents(target_dir, **options)
+    if result["code"] != 200:
+        return result, None, None, None
     
+    items = result["data"]["items"]
+    paths = [str(target_dir)] + [item["path"] for item in items]
+    signature = _stat_signature(paths)
+    # 读取期间文件发生变化（与列表中的stat结果不一致）时不缓存，避免缓存旧内容
+    if signature is None or any(
+        (item["size"] is not None and item["size"] != size) or item["modify_time"] != mtime_ns // 1_000_000_000
+        for item, (mtime_ns, size, _) in zip(items, signature[1:])
+    ):
+        return result, None, None, None
+    body = json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = '"dir-' + hashlib.sha1(repr((key, signature)).encode('utf-8')).hexdigest()[:16] + '"'
+    last_modified = max(mtime_ns for mtime_ns, _, _ in signature) // 1_000_000_000
+    entry = (result, body, etag, last_modified)
+    
+    with _listing_cache_lock:
+        _listing_cache[key] = (paths, signature, entry)
+        _listing_cache.move_to_end(key)
+        while len(_listing_cache) > LISTING_CACHE_MAX_ENTRIES:
+            _listing_cache.popitem(last=False)
+    return entry
+
+
+def _read_text(file_path, max_chars):
+    """
+    读取txt文件内容（处理编码问题，Windows常见gbk/utf-8）
+    :param max_chars: 最多读取的字符数，None表示读取全文
+    :return: (内容, 是否被截断)
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            if max_chars is None:
+                return f.read(), False
+            content = f.read(max_chars)
+            return content, bool(f.read(1))
     except Exception as e:
-        # 捕获文件读取异常
-        return {
-            "code": 500,
-            "data": None,
-            "message": f"读取文件失败：{str(e)}"
-        }
\ No newline at end of file
+        return f"读取失败：{str(e)}", False  # 记录读取错误，不中断整体流程
+
+
+def _base64_json_parts(mime_type):
+    """
+    base64响应体中内容前后的JSON片段
+    与原先把整个文件读入内存后 JsonResponse({"code": 200, "data": {"content", "mime_type", "encoding"},
+    "message": "success"}) 的结果逐字节一致（含默认分隔符的空格）
+    """
+    prefix = b'{"code": 200, "data": {"content": "'
+    suffix = ('", "mime_type": ' + json.dumps(mime_type) + ', "encoding": "base64"}, "message": "success"}').encode('utf-8')
+    return prefix, suffix
+
+
+def _iter_base64_chunks(file_path):
+    """按块读取文件并逐块编码为base64"""
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(BASE64_CHUNK_SIZE), b''):
+            yield base64.b64encode(chunk)
+
+
+def get_base64_response(file_path, mime_type=None):
+    """
+    获取文件的base64 JSON响应体
+    小文件的编码结果按 (路径, mtime, size, MIME类型) 缓存在总字节数有上限的LRU中；
+    大文件返回逐块编码的生成器，内存占用与文件大小无关
+    :param file_path: 文件路径
+    :param mime_type: 响应中的MIME类型，默认按路径推断（内容相同的文件共用路径时由调用方指定）
+    :return: (响应体字节或字节生成器, 响应体长度)
+    """
+    global _base64_cache_bytes
+    stat = os.stat(file_path)
+    mime_type = mime_type or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    prefix, suffix = _base64_json_parts(mime_type)
+    length = len(prefix) + 4 * ((stat.st_size + 2) // 3) + len(suffix)
+    
+    if stat.st_size > BASE64_STREAM_THRESHOLD or length > BASE64_CACHE_MAX_BYTES:
+        def stream():
+            yield prefix
+            yield from _iter_base64_chunks(file_path)
+            yield suffix
+        return stream(), length
+    
+    key = (file_path, stat.st_mtime_ns, stat.st_size, mime_type)
+    with _base64_cache_lock:
+        body = _base64_cache.get(key)
+        if body is not None:
+            _base64_cache.move_to_end(key)
+            return body, len(body)
+    
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    body = prefix + base64.b64encode(content) + suffix
+    if len(content) != stat.st_size:
+        # 读取期间文件被修改：直接返回，不缓存
+        return body, len(body)
+    
+    with _base64_cache_lock:
+        # 同一文件的旧版本不会再被命中，直接移除
+        for old_key in [k for k in _base64_cache if k[0] == file_path and k[1:3] != key[1:3]]:
+            _base64_cache_bytes -= len(_base64_cache.pop(old_key))
+        if key not in _base64_cache:
+            _base64_cache[key] = body
+            _base64_cache_bytes += len(body)
+        while _base64_cache_bytes > BASE64_CACHE_MAX_BYTES:
+            _, evicted = _base64_cache.popitem(last=False)
+            _base64_cache_bytes -= len(evicted)
+    return body, len(body)
@@ -0,0 +1,441 @@
+# zapp/services/kline.py
+"""K线数据：把百度 quotation_kline_ab 返回的数据解析为按列存储的数组，并在服务端计算技术指标
+
+上游数据形如 Result.newMarketData = {"keys": [...], "marketData": "行;行;..."}，
+每行是与 keys 对应的逗号分隔字符串（pointType=string），缺失值为 "--"。
+解析后日期保存为字符串列表，open/high/low/close/volume 保存为 array('d')，缺失值为 NaN；
+安装了 NumPy（见 requirements.txt）时指标直接在同一块缓冲区上向量化计算：滑动窗口类（MA、布林带）
+用累加和/滑动窗口视图，递推类（EMA、MACD、RSI 的平滑）按块用矩阵乘法展开递推；
+未安装时退回逐点计算的纯Python实现，结果一致。
+"""
+import math
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时使用纯Python实现
+    np = None
+
+# 可返回的列（date 来自上游的 time 字段）
+KLINE_COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+NUMERIC_COLUMNS = KLINE_COLUMNS[1:]
+# 上游的缺失值标记
+MISSING = '--'
+# 指标参数
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_DEFAULT_PERIOD = 14
+BOLL_DEFAULT_PERIOD = 20
+BOLL_WIDTH = 2.0
+MAX_INDICATOR_PERIOD = 250
+MAX_INDICATORS = 16
+# 输出时保留的小数位数
+KLINE_DECIMALS = 4
+# 解析结果缓存的键数量
+KLINE_CACHE_MAX_ENTRIES = 256
+# NumPy 递推时每块的长度
+SMOOTH_BLOCK = 64
+
+# 指标名称：ma5 / ema12 / rsi / rsi6 / boll / boll20 / macd
+INDICATOR_PATTERN = re.compile(r'^(ma|ema|rsi|boll|macd)(\d*)$')
+
+NAN = float('nan')
+
+
+class Kline:
+    """按列存储的K线序列"""
+
+    __slots__ = ('dates', 'columns')
+
+    def __init__(self, dates, columns):
+        """
+        Args:
+            dates (list): 日期字符串
+            columns (dict): 列名 -> array('d')，长度与 dates 相同
+        """
+        self.dates = dates
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, name):
+        """按列名取数据：date 返回日期列表，其余返回 array('d')"""
+        return self.dates if name == 'date' else self.columns[name]
+
+
+def _to_float(value):
+    if value == MISSING or value == '':
+        return NAN
+    try:
+        return float(value)
+    except ValueError:
+        return NAN
+
+
+def parse_kline(payload):
+    """
+    解析 quotation_kline_ab 的返回数据
+
+    Args:
+        payload (dict): StockApiUtils.fetch_stock_data 的返回值
+
+    Returns:
+        Kline: 按日期升序排列的K线序列（上游的行不是升序时按日期稳定排序）
+
+    Raises:
+        ValueError: 如果数据结构不符合预期
+    """
+    try:
+        market = payload['Result']['newMarketData']
+        keys = market['keys']
+        raw = market.get('marketData') or ''
+    except (KeyError, TypeError):
+        raise ValueError("Unexpected kline payload")
+    if 'time' not in keys or not isinstance(raw, str):
+        raise ValueError("Unexpected kline payload")
+
+    date_index = keys.index('time')
+    indexes = [keys.index(name) if name in keys else None for name in NUMERIC_COLUMNS]
+    width = len(keys)
+    dates = []
+    buffers = [array('d') for _ in NUMERIC_COLUMNS]
+    for row in raw.split(';'):
+        if not row:
+            continue
+        values = row.split(',')
+        if len(values) < width:
+            continue
+        dates.append(values[date_index])
+        for buffer, index in zip(buffers, indexes):
+            buffer.append(NAN if index is None else _to_float(values[index]))
+    # 指标按时间顺序递推/滑动，日期（YYYY-MM-DD）乱序时先排序
+    if any(dates[i] > dates[i + 1] for i in range(len(dates) - 1)):
+        order = sorted(range(len(dates)), key=dates.__getitem__)
+        dates = [dates[i] for i in order]
+        buffers = [array('d', (buffer[i] for i in order)) for buffer in buffers]
+    return Kline(dates, dict(zip(NUMERIC_COLUMNS, buffers)))
+
+
+_kline_cache = OrderedDict()
+_kline_cache_lock = threading.Lock()
+
+
+def parse_kline_cached(key, payload):
+    """
+    同一份上游数据只解析一次：行情缓存返回的是同一个对象时直接复用解析结果
+
+    Args:
+        key (tuple): 缓存键，如 (code, ktype)
+        payload (dict): 上游数据
+
+    Returns:
+        Kline: 解析结果
+    """
+    with _kline_cache_lock:
+        cached = _kline_cache.get(key)
+        if cached is not None and cached[0] is payload:
+            _kline_cache.move_to_end(key)
+            return cached[1]
+    kline = parse_kline(payload)
+    with _kline_cache_lock:
+        _kline_cache[key] = (payload, kline)
+        _kline_cache.move_to_end(key)
+        while len(_kline_cache) > KLINE_CACHE_MAX_ENTRIES:
+            _kline_cache.popitem(last=False)
+    return kline
+
+
+# ---------- 指标计算（输入输出均为 array('d')，不足一个窗口或缺失处为 NaN） ----------
+
+def sma(values, period):
+    """简单移动平均；窗口内有缺失值时结果为 NaN"""
+    n = len(values)
+    if np is not None:
+        data = np.frombuffer(values, dtype=np.float64)
+        missing = np.isnan(data)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, data))))
+        gaps = np.concatenate(([0], np.cumsum(missing)))
+        result = np.full(n, np.nan)
+        if n >= period:
+            window = sums[period:] - sums[:-period]
+            valid = gaps[period:] - gaps[:-period] == 0
+            result[period - 1:] = np.where(valid, window / period, np.nan)
+        return array('d', result.tobytes())
+
+    result = array('d', [NAN]) * n
+    total = 0.0
+    gaps = 0
+    for i, value in enumerate(values):
+        if math.isnan(value):
+            gaps += 1
+        else:
+            total += value
+        if i >= period:
+            old = values[i - period]
+            if math.isnan(old):
+                gaps -= 1
+            else:
+                total -= old
+        if i >= period - 1 and not gaps:
+            result[i] = total / period
+    return result
+
+
+def _np_smooth(data, alpha, initial):
+    """
+    NumPy 版本的指数平滑递推：y[i] = y[i-1] + alpha * (data[i] - y[i-1])，y[-1] = initial
+
+    按 SMOOTH_BLOCK 分块，块内各点是块内输入的加权和（下三角权重矩阵，一次矩阵乘法算出所有块）
+    加上上一块末值的衰减；Python 层只按块递推末值。权重最多衰减到 (1 - alpha) ** SMOOTH_BLOCK，不会下溢
+    """
+    n = len(data)
+    if n == 0:
+        return np.empty(0)
+    decay = 1.0 - alpha
+    size = min(SMOOTH_BLOCK, n)
+    blocks = np.zeros(-(-n // size) * size)
+    blocks[:n] = data
+    blocks = blocks.reshape(-1, size)
+    lags = np.arange(size)
+    distance = lags[:, np.newaxis] - lags[np.newaxis, :]
+    weights = np.where(distance >= 0, alpha * decay ** np.maximum(distance, 0), 0.0)
+    partial = blocks @ weights.T
+    powers = decay ** (lags + 1)
+    carry = np.empty(len(blocks))
+    last = initial
+    for i, value in enumerate(partial[:, -1]):
+        carry[i] = last
+        last = value + powers[-1] * last
+    return (partial + carry[:, np.newaxis] * powers).ravel()[:n]
+
+
+def ema(values, period):
+    """指数移动平均（alpha = 2 / (period + 1)，以第一个有效值为初值）；缺失处为 NaN，不打断递推"""
+    alpha = 2.0 / (period + 1)
+    if np is not None:
+        data = np.frombuffer(values, dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(data))
+        result = np.full(len(data), np.nan)
+        if len(valid):
+            first = data[valid[0]]
+            result[valid[0]] = first
+            result[valid[1:]] = _np_smooth(data[valid[1:]], alpha, first)
+        return array('d', result.tobytes())
+
+    result = array('d', [NAN]) * len(values)
+    current = None
+    for i, value in enumerate(values):
+        if math.isnan(value):
+            continue
+        current = value if current is None else current + alpha * (value - current)
+        result[i] = current
+    return result
+
+
+def macd(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    """
+    MACD（与国内行情软件一致，柱值为 2 * (DIF - DEA)）
+
+    Returns:
+        tuple: (dif, dea, macd)
+    """
+    fast_line, slow_line = ema(close, fast), ema(close, slow)
+    if np is not None:
+        dif = np.frombuffer(fast_line, dtype=np.float64) - np.frombuffer(slow_line, dtype=np.float64)
+        dea = ema(array('d', dif.tobytes()), signal)
+        bar = 2.0 * (dif - np.frombuffer(dea, dtype=np.float64))
+        return array('d', dif.tobytes()), dea, array('d', bar.tobytes())
+
+    dif = array('d', (a - b for a, b in zip(fast_line, slow_line)))
+    dea = ema(dif, signal)
+    bar = array('d', (2.0 * (a - b) for a, b in zip(dif, dea)))
+    return dif, dea, bar
+
+
+def rsi(close, period=RSI_DEFAULT_PERIOD):
+    """相对强弱指标（Wilder 平滑，前 period 个涨跌幅取简单平均作为初值）"""
+    if np is not None:
+        data = np.frombuffer(close, dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(data))
+        result = np.full(len(data), np.nan)
+        changes = np.diff(data[valid])
+        if len(changes) >= period:
+            # Wilder 平滑即 alpha = 1 / period 的指数平滑
+            averages = []
+            for moves in (np.maximum(changes, 0.0), np.maximum(-changes, 0.0)):
+                first = moves[:period].sum() / period
+                averages.append(np.concatenate(([first], _np_smooth(moves[period:], 1.0 / period, first))))
+            gain, loss = averages
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result[valid[period:]] = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+        return array('d', result.tobytes())
+
+    result = array('d', [NAN]) * len(close)
+    gain = loss = 0.0
+    count = 0
+    previous = None
+    for i, value in enumerate(close):
+        if math.isnan(value):
+            continue
+        if previous is not None:
+            change = value - previous
+            up, down = max(change, 0.0), max(-change, 0.0)
+            count += 1
+            if count <= period:
+                gain += up / period
+                loss += down / period
+            else:
+                gain = (gain * (period - 1) + up) / period
+                loss = (loss * (period - 1) + down) / period
+            if count >= period:
+                result[i] = 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+        previous = value
+    return result
+
+
+def bollinger(close, period=BOLL_DEFAULT_PERIOD, width=BOLL_WIDTH):
+    """
+    布林带（中轨为 period 日均线，上下轨为中轨 ± width 倍总体标准差）
+
+    Returns:
+        tuple: (mid, upper, lower)
+    """
+    mid = sma(close, period)
+    n = len(close)
+    if np is not None:
+        data = np.frombuffer(close, dtype=np.float64)
+        center = np.frombuffer(mid, dtype=np.float64)
+        std = np.full(n, np.nan)
+        if n >= period:
+            # 与纯Python实现相同，按窗口均值中心化后求方差；
+            # 不用 E[x²]-E[x]²，价格数值较大时两者相减会损失有效数字
+            windows = np.lib.stride_tricks.sliding_window_view(data, period)
+            deviations = windows - center[period - 1:, np.newaxis]
+            std[period - 1:] = np.sqrt(np.mean(deviations * deviations, axis=1))
+        upper = array('d', (center + width * std).tobytes())
+        lower = array('d', (center - width * std).tobytes())
+        return mid, upper, lower
+
+    upper = array('d', [NAN]) * n
+    lower = array('d', [NAN]) * n
+    for i in range(period - 1, n):
+        center = mid[i]
+        if math.isnan(center):
+            continue
+        variance = sum((close[j] - center) ** 2 for j in range(i - period + 1, i + 1)) / period
+        deviation = width * math.sqrt(variance)
+        upper[i], lower[i] = center + deviation, center - deviation
+    return mid, upper, lower
+
+
+def parse_indicators(raw):
+    """
+    解析指标列表，如 "ma5,ma20,ema12,macd,rsi,boll"
+
+    Returns:
+        list: [(名称, 周期)]，rsi/boll 未写周期时使用默认值，macd 周期为None
+
+    Raises:
+        ValueError: 如果指标名称或周期无效
+    """
+    specs = []
+    for name in dict.fromkeys(item.strip().lower() for item in (raw or '').split(',') if item.strip()):
+        match = INDICATOR_PATTERN.match(name)
+        if match is None:
+            raise ValueError(f"Unknown indicator '{name}'")
+        kind, period = match.group(1), match.group(2)
+        if kind == 'macd':
+            if period:
+                raise ValueError("macd does not take a period")
+            specs.append((kind, None))
+            continue
+        if not period:
+            if kind in ('ma', 'ema'):
+                raise ValueError(f"Indicator '{name}' requires a period, e.g. {kind}5")
+            period = RSI_DEFAULT_PERIOD if kind == 'rsi' else BOLL_DEFAULT_PERIOD
+        period = int(period)
+        if not 1 <= period <= MAX_INDICATOR_PERIOD:
+            raise ValueError(f"Indicator period must be between 1 and {MAX_INDICATOR_PERIOD}")
+        specs.append((kind, period))
+    if len(specs) > MAX_INDICATORS:
+        raise ValueError(f"Too many indicators (maximum {MAX_INDICATORS})")
+    return specs
+
+
+def compute_indicators(kline, specs):
+    """
+    按 parse_indicators 的结果计算指标
+
+    Returns:
+        OrderedDict: 输出列名 -> array('d')；macd 产生 dif/dea/macd，boll<N> 产生 boll<N>_mid/_upper/_lower
+    """
+    close = kline.columns['close']
+    result = OrderedDict()
+    for kind, period in specs:
+        if kind == 'ma':
+            result[f'ma{period}'] = sma(close, period)
+        elif kind == 'ema':
+            result[f'ema{period}'] = ema(close, period)
+        elif kind == 'rsi':
+            result[f'rsi{period}'] = rsi(close, period)
+        elif kind == 'boll':
+            mid, upper, lower = bollinger(close, period)
+            result[f'boll{period}_mid'] = mid
+            result[f'boll{period}_upper'] = upper
+            result[f'boll{period}_lower'] = lower
+        else:
+            result['dif'], result['dea'], result['macd'] = macd(close)
+    return result
+
+
+def parse_columns(raw):
+    """
+    解析需要返回的列，缺省返回全部列
+
+    Raises:
+        ValueError: 如果包含未知的列名
+    """
+    if not raw:
+        return list(KLINE_COLUMNS)
+    columns = list(dict.fromkeys(item.strip().lower() for item in raw.split(',') if item.strip()))
+    unknown = [name for name in columns if name not in KLINE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown column '{unknown[0]}', expected some of {', '.join(KLINE_COLUMNS)}")
+    return columns
+
+
+def _json_values(values, decimals):
+    """array('d') -> JSON列表：NaN 转为 null，decimals 为None时整数值输出为整数"""
+    if decimals is None:
+        return [None if math.isnan(v) else int(v) if v.is_integer() else v for v in values]
+    return [None if math.isnan(v) else round(v, decimals) for v in values]
+
+
+def build_compact_kline(kline, columns, specs, limit=None):
+    """
+    生成紧凑的按列输出：{"count", "fields", "columns"}，columns 与 fields 一一对应
+
+    指标在完整序列上计算后再截取最后 limit 根，保证开头几根的指标值不受截取影响
+
+    Args:
+        kline (Kline): K线序列
+        columns (list): 需要返回的K线列
+        specs (list): parse_indicators 的结果
+        limit (int): 只返回最近的若干根K线，None表示全部
+    """
+    start = max(len(kline) - limit, 0) if limit else 0
+    fields, values = [], []
+    for name in columns:
+        column = kline.column(name)[start:]
+        if name == 'date':
+            values.append(list(column))
+        else:
+            values.append(_json_values(column, None if name == 'volume' else KLINE_DECIMALS))
+        fields.append(name)
+    for name, column in compute_indicators(kline, specs).items():
+        fields.append(name)
+        values.append(_json_values(column[start:], KLINE_DECIMALS))
+    return {"count": len(kline) - start, "fields": fields, "columns": values}
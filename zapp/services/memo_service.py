@@ -1,11 +1,21 @@
 # zapp/services/memo_service.py
+import asyncio
+import functools
 import sqlite3
 import os
-import base64
 import logging
 import html
+import json
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from django.utils import timezone
+from .sensitive_lexicon import load_lexicon
+from .moderation_service import moderate_texts
+from .sqlite_manager import SQLiteConnectionManager
 
 # 设置日志记录器
 logger = logging.getLogger(__name__)
@@ -19,59 +29,361 @@ else:
 # Windows路径兼容
 WINDOWS_DB_PATH = DB_PATH
 
+# 异步门面使用的数据库线程数（每个线程持有自己的SQLite连接）
+ASYNC_DB_WORKERS = int(os.environ.get('MEMO_ASYNC_DB_WORKERS', '4'))
+
+# 备忘录内容最大长度
+MAX_CONTENT_LENGTH = 1000
+
+# 批量新增/删除单次最多处理的条数
+MAX_BATCH_SIZE = 500
+
+# 分页查询默认每页条数及上限
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# 列表响应缓存最多保留的条目数（不同分页参数各占一条）
+LIST_CACHE_MAX_ENTRIES = 64
+
+# trigram全文索引可匹配的最短关键词长度，更短的关键词使用LIKE
+FTS_MIN_KEYWORD_LENGTH = 3
+
+# 敏感词文件变更检查间隔（秒），设为0关闭热更新
+LEXICON_WATCH_INTERVAL = float(os.environ.get('SENSITIVE_WORDS_WATCH_INTERVAL', '5'))
+
 class MemoService:
-    def __init__(self):
-        self.db_path = WINDOWS_DB_PATH if os.name == 'nt' else DB_PATH
+    def __init__(self, db_path=None, sensitive_words_file=None):
+        """
+        Args:
+            db_path (str): 数据库路径，默认见 DB_PATH
+            sensitive_words_file (str): 敏感词源文件，默认为同目录下的 sensitive_words.txt
+        """
+        self.db_path = db_path or (WINDOWS_DB_PATH if os.name == 'nt' else DB_PATH)
+        # 每个线程保持一个长连接；新连接建立时确保表结构存在
+        self._connections = SQLiteConnectionManager(on_connect=self._init_schema)
+        # 全文索引是否可用（由 _init_schema 检测）
+        self._fts_enabled = False
+        # 列表响应缓存：(数据库, 版本号, 分页参数) -> 序列化好的JSON字节
+        self._list_cache = OrderedDict()
+        self._list_cache_version = None
+        self._list_cache_lock = threading.Lock()
         # 获取敏感词文件路径
-        self.sensitive_words_file = os.path.join(os.path.dirname(__file__), 'sensitive_words.txt')
-        # 加载并解码敏感词
-        self.sensitive_words = self._load_sensitive_words()
+        self.sensitive_words_file = sensitive_words_file or os.path.join(os.path.dirname(__file__), 'sensitive_words.txt')
+        # 敏感词库热更新相关状态
+        self._lexicon_reload_lock = threading.Lock()
+        self._lexicon_watch_lock = threading.Lock()
+        self._lexicon_watch_started = False
+        self._lexicon_watcher = None
+        self._lexicon_watch_interval = 0
+        self._lexicon_stats = {
+            "version": None,
+            "word_count": 0,
+            "loaded_at": None,
+            "last_rebuild_ms": None,
+            "reload_count": 0,
+            "last_error": None,
+        }
+        # 加载预编译的敏感词词库（mmap映射，源文件变化时自动重新编译）
+        self._source_signature = self._get_source_signature()
+        self.sensitive_matcher = None
+        self._swap_lexicon(self._load_lexicon_timed())
         # 在初始化时创建表（如果不存在），避免重复操作
         self._create_table()
         
-    def _load_sensitive_words(self):
-        """从文件加载base64编码的敏感词并解码
+    @property
+    def sensitive_words(self):
+        """当前生效的敏感词列表（词库实现了只读序列协议）"""
+        return self.sensitive_matcher
+    
+    def _get_source_signature(self):
+        """敏感词源文件的 (mtime, size)，文件不存在时返回None"""
+        try:
+            stat = os.stat(self.sensitive_words_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _load_lexicon_timed(self):
+        start = time.perf_counter()
+        lexicon = load_lexicon(self.sensitive_words_file)
+        self._lexicon_stats["last_rebuild_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return lexicon
+    
+    def _swap_lexicon(self, lexicon):
+        """原子替换当前词库：正在检查的请求继续使用旧词库，之后的请求使用新词库"""
+        self.sensitive_matcher = lexicon
+        self._lexicon_stats.update({
+            "version": getattr(lexicon, "version", None),
+            "word_count": len(lexicon),
+            "loaded_at": int(time.time()),
+            "last_error": None,
+        })
+    
+    def reload_sensitive_words(self, force=False):
+        """源文件有变化时重新加载敏感词库（在调用线程中编译，完成后原子替换）
+        
+        Args:
+            force (bool): 为True时忽略文件签名，强制重新加载
+            
+        Returns:
+            bool: True表示已加载新词库
+        """
+        # 已有重建在进行时直接返回，不排队等待
+        if not self._lexicon_reload_lock.acquire(blocking=False):
+            return False
+        try:
+            signature = self._get_source_signature()
+            if not force and signature == self._source_signature:
+                return False
+            try:
+                lexicon = self._load_lexicon_timed()
+            except Exception as e:
+                # 重建失败时保留旧词库继续服务
+                logger.error(f"Sensitive word lexicon reload failed: {str(e)}")
+                self._lexicon_stats["last_error"] = str(e)
+                return False
+            self._source_signature = signature
+            self._swap_lexicon(lexicon)
+            self._lexicon_stats["reload_count"] += 1
+            logger.info(f"Sensitive word lexicon reloaded, version {self._lexicon_stats['version']}")
+            return True
+        finally:
+            self._lexicon_reload_lock.release()
+    
+    def start_lexicon_watcher(self, interval=None):
+        """启动后台线程，定期检查敏感词文件并在变化时重建词库
+        
+        Args:
+            interval (float): 检查间隔（秒），默认取 SENSITIVE_WORDS_WATCH_INTERVAL，0表示不启动
+        """
+        interval = LEXICON_WATCH_INTERVAL if interval is None else interval
+        if interval <= 0:
+            return
+        if self._lexicon_watcher is None and hasattr(os, 'register_at_fork'):
+            # gunicorn --preload 时线程不会随fork复制，在子进程中重新启动
+            os.register_at_fork(after_in_child=self._restart_lexicon_watcher)
+        self._lexicon_watch_interval = interval
+        self._lexicon_watcher = threading.Thread(
+            target=self._watch_lexicon, name='sensitive-words-watcher', daemon=True
+        )
+        self._lexicon_watcher.start()
+    
+    def _ensure_lexicon_watcher(self):
+        """首次检查内容时启动词库监听线程
+
+        不在导入模块时启动，管理命令、测试等不检查内容的进程不会产生后台线程。
+        """
+        if self._lexicon_watch_started:
+            return
+        with self._lexicon_watch_lock:
+            if not self._lexicon_watch_started:
+                self._lexicon_watch_started = True
+                self.start_lexicon_watcher()
+    
+    def _restart_lexicon_watcher(self):
+        self._lexicon_reload_lock = threading.Lock()
+        self._lexicon_watch_lock = threading.Lock()
+        self.start_lexicon_watcher(self._lexicon_watch_interval)
+    
+    def _watch_lexicon(self):
+        watcher = threading.current_thread()
+        while True:
+            time.sleep(self._lexicon_watch_interval)
+            # 已被新线程替换或停止（_lexicon_watcher 置为None）时退出
+            if self._lexicon_watcher is not watcher:
+                break
+            self.reload_sensitive_words()
+    
+    def get_lexicon_stats(self):
+        """敏感词库指标：当前版本、词条数、最近一次重建耗时等
         
         Returns:
-            list: 解码后的敏感词列表
+            dict: 指标字典
         """
-        sensitive_words = []
+        stats = dict(self._lexicon_stats)
+        stats["watch_interval"] = self._lexicon_watch_interval if self._lexicon_watcher else 0
+        return stats
+    
+    def _init_schema(self, conn):
+        """在新连接上创建memos表及全文索引（如果不存在）"""
+        # IMMEDIATE事务：多个worker同时初始化时串行执行，避免重复回填索引
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS memos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    content TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            self._fts_enabled = self._init_search_index(conn)
+            self._init_version_counter(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    
+    def _init_search_index(self, conn):
+        """创建FTS5全文索引（trigram分词，支持中文子串搜索）及同步触发器
+        
+        索引首次创建时回填已有数据。
         
+        Returns:
+            bool: False表示当前SQLite不支持FTS5/trigram，搜索退回LIKE
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memos_fts'"
+        ).fetchone()
         try:
-            with open(self.sensitive_words_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    encoded_word = line.strip()
-                    if encoded_word:
-                        try:
-                            # 解码base64字符串
-                            word_bytes = base64.b64decode(encoded_word)
-                            word = word_bytes.decode('utf-8')
-                            sensitive_words.append(word)
-                        except (base64.binascii.Error, UnicodeDecodeError):
-                            # 跳过无效的编码行
-                            continue
-        except FileNotFoundError:
-            # 如果文件不存在，返回空列表
-            print(f"警告: 敏感词文件不存在: {self.sensitive_words_file}")
-        except Exception as e:
-            # 处理其他可能的错误
-            print(f"加载敏感词时出错: {e}")
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS memos_fts USING fts5(
+                    content, content='memos', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram index unavailable, search falls back to LIKE: {str(e)}")
+            return False
+        for statement in (
+            '''CREATE TRIGGER IF NOT EXISTS memos_fts_ai AFTER INSERT ON memos BEGIN
+                INSERT INTO memos_fts(rowid, content) VALUES (new.id, new.content);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS memos_fts_ad AFTER DELETE ON memos BEGIN
+                INSERT INTO memos_fts(memos_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS memos_fts_au AFTER UPDATE ON memos BEGIN
+                INSERT INTO memos_fts(memos_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                INSERT INTO memos_fts(rowid, content) VALUES (new.id, new.content);
+            END''',
+        ):
+            conn.execute(statement)
+        if not exists:
+            # 旧数据库迁移：为已有备忘录回填索引
+            conn.execute("INSERT INTO memos_fts(memos_fts) VALUES ('rebuild')")
+            logger.info("Memo full-text index created and backfilled")
+        return True
+    
+    def _init_version_counter(self, conn):
+        """创建数据版本计数器：memos表的任何写入都会通过触发器使版本号加一
         
-        return sensitive_words
+        版本号保存在数据库中，所有gunicorn worker都能看到，用作列表缓存的键和ETag。
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS memo_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        # 初始值取当前毫秒时间戳：数据库被删除重建后版本号也不会与旧ETag重复
+        conn.execute(
+            "INSERT OR IGNORE INTO memo_meta (key, value) "
+            "VALUES ('version', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))"
+        )
+        for event in ('INSERT', 'DELETE', 'UPDATE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS memos_version_{event.lower()} AFTER {event} ON memos BEGIN
+                    UPDATE memo_meta SET value = value + 1 WHERE key = 'version';
+                END
+            ''')
+    
+    def _read_data_version(self, conn):
+        row = conn.execute("SELECT value FROM memo_meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+    
+    def get_data_version(self):
+        """获取memos表当前的数据版本号（每次新增/删除后递增）
+        
+        Returns:
+            int: 版本号
+        """
+        try:
+            return self._read_data_version(self._get_connection())
+        except sqlite3.Error as e:
+            logger.error(f"Database read error: {str(e)}")
+            raise Exception("Database operation failed. Please try again later.")
+    
+    def get_memos_json(self, before_id=None, limit=None):
+        """获取序列化好的备忘录列表JSON（带版本号的读穿透缓存）
+        
+        同一数据版本、同一分页参数只查询和序列化一次；写入使版本号变化后旧缓存自动失效。
+        
+        Args:
+            before_id: 分页游标，与limit都为None时返回全部备忘录
+            limit: 每页条数
+            
+        Returns:
+            tuple: (版本号, JSON字节)；JSON内容与 get_all_memos / get_memos_page 的返回值一致
+            
+        Raises:
+            ValueError: 如果分页参数无效
+        """
+        paged = before_id is not None or limit is not None
+        if paged:
+            # 先校验并规范化参数，使等价的请求命中同一缓存项
+            before_id = self._parse_positive_int(before_id, "Before ID", allow_none=True)
+            limit = self._parse_positive_int(DEFAULT_PAGE_SIZE if limit is None else limit, "Limit")
+        version = self.get_data_version()
+        key = (self.db_path, version, paged, before_id, limit)
+        with self._list_cache_lock:
+            body = self._list_cache.get(key)
+            if body is not None:
+                self._list_cache.move_to_end(key)
+                return version, body
+        
+        try:
+            conn = self._get_connection()
+            # 在同一个读事务中读取版本号和数据，保证两者一致
+            conn.execute('BEGIN')
+            try:
+                version = self._read_data_version(conn)
+                data = self.get_memos_page(before_id, limit) if paged else self.get_all_memos()
+            finally:
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Database read error: {str(e)}")
+            raise Exception("Database operation failed. Please try again later.")
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        
+        key = (self.db_path, version, paged, before_id, limit)
+        with self._list_cache_lock:
+            cached_path, cached_version = self._list_cache_version or (None, -1)
+            if cached_path != self.db_path or version > cached_version:
+                # 版本已变化，旧版本的缓存不会再被命中
+                self._list_cache.clear()
+                self._list_cache_version = (self.db_path, version)
+            elif version < cached_version:
+                # 并发请求读到的旧版本数据，不再缓存
+                return version, body
+            self._list_cache[key] = body
+            while len(self._list_cache) > LIST_CACHE_MAX_ENTRIES:
+                self._list_cache.popitem(last=False)
+        return version, body
+    
+    def rebuild_search_index(self):
+        """根据memos表重建全文索引（索引损坏或手工修改数据后使用）
+        
+        Returns:
+            bool: False表示全文索引不可用
+        """
+        try:
+            conn = self._get_connection()
+            if not self._fts_enabled:
+                return False
+            with conn:
+                conn.execute("INSERT INTO memos_fts(memos_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Database search index rebuild error: {str(e)}")
+            raise Exception("Database operation failed. Please try again later.")
+    
+    def _get_connection(self):
+        """获取当前线程到 self.db_path 的长连接"""
+        return self._connections.get_connection(self.db_path)
     
     def _create_table(self):
         """创建memos表（如果不存在）"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS memos (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        content TEXT NOT NULL,
-                        created_at TEXT NOT NULL
-                    )
-                ''')
-                conn.commit()
+            # 建立连接时会执行 _init_schema
+            self._get_connection()
         except sqlite3.Error as e:
             # 记录详细错误日志，但只向用户返回通用错误信息
             logger.error(f"Database table creation error: {str(e)}")
@@ -91,22 +403,50 @@ class MemoService:
         """
         if not content:
             return False
+        self._ensure_lexicon_watcher()
             
-        # 转换为小写进行检查（不区分大小写）
-        content_lower = content.lower()
-        
-        for keyword in self.sensitive_words:
-            if keyword.lower() in content_lower:
-                raise ValueError(f"Content contains sensitive word")
+        # 自动机内部已做小写转换（不区分大小写），单次扫描即可
+        if self.sensitive_matcher.search(content) is not None:
+            raise ValueError(f"Content contains sensitive word")
                 
         return False
     
+    def find_sensitive_words(self, content):
+        """找出内容中命中的所有敏感词及其位置
+        
+        Args:
+            content (str): 要检查的内容
+            
+        Returns:
+            list: 每个命中为 {"word", "start", "end"} 字典，start/end 为内容中的偏移
+        """
+        self._ensure_lexicon_watcher()
+        return [
+            {"word": word, "start": start, "end": end}
+            for start, end, word in self.sensitive_matcher.find_all(content)
+        ]
+    
+    def check_contents(self, texts):
+        """批量检查文本是否包含敏感词，返回每条文本的结果及命中位置
+        
+        Args:
+            texts (list): 要检查的文本列表
+            
+        Returns:
+            list: 每项为 {"index", "sensitive", "matches": [{"word", "start", "end"}]}
+            
+        Raises:
+            ValueError: 如果输入无效
+        """
+        self._ensure_lexicon_watcher()
+        return moderate_texts(self.sensitive_matcher, texts)
+    
     def get_all_memos(self):
         """获取所有备忘录"""
         try:
             # 表已在初始化时创建，无需重复操作
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            conn = self._get_connection()
+            with conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM memos ORDER BY id DESC')
                 memos = cursor.fetchall()
@@ -116,6 +456,90 @@ class MemoService:
             logger.error(f"Database read error: {str(e)}")
             raise Exception("Database operation failed. Please try again later.")
     
+    def get_memos_page(self, before_id=None, limit=DEFAULT_PAGE_SIZE):
+        """按id倒序分页获取备忘录（游标分页，翻页代价与页码无关）
+        
+        Args:
+            before_id (int): 游标，只返回id小于该值的备忘录；None表示从最新的开始
+            limit (int): 每页条数，最大 MAX_PAGE_SIZE
+            
+        Returns:
+            dict: {"items": 备忘录列表, "next_before_id": 下一页游标, "has_more": 是否还有更多}
+            
+        Raises:
+            ValueError: 如果游标或条数无效
+        """
+        try:
+            before_id = self._parse_positive_int(before_id, "Before ID", allow_none=True)
+            limit = self._parse_positive_int(limit, "Limit")
+            if limit > MAX_PAGE_SIZE:
+                raise ValueError(f"Limit is too large (maximum {MAX_PAGE_SIZE})")
+            
+            conn = self._get_connection()
+            with conn:
+                cursor = conn.cursor()
+                # 多取一条用于判断是否还有下一页
+                if before_id is None:
+                    cursor.execute('SELECT * FROM memos ORDER BY id DESC LIMIT ?', (limit + 1,))
+                else:
+                    cursor.execute(
+                        'SELECT * FROM memos WHERE id < ? ORDER BY id DESC LIMIT ?',
+                        (before_id, limit + 1)
+                    )
+                memos = [dict(memo) for memo in cursor.fetchall()]
+            has_more = len(memos) > limit
+            memos = memos[:limit]
+            return {
+                "items": memos,
+                "next_before_id": memos[-1]["id"] if has_more else None,
+                "has_more": has_more,
+            }
+        except ValueError as e:
+            raise e
+        except sqlite3.Error as e:
+            logger.error(f"Database read error: {str(e)}")
+            raise Exception("Database operation failed. Please try again later.")
+    
+    @staticmethod
+    def _parse_positive_int(value, name, allow_none=False):
+        """把整数或纯数字字符串转换为正整数"""
+        if value is None and allow_none:
+            return None
+        if isinstance(value, str) and value.isdigit():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ValueError(f"{name} must be a positive integer")
+        return value
+    
+    @staticmethod
+    def _prepare_content(content):
+        """校验备忘录内容，返回 (去除首尾空白的内容, HTML转义后的内容)
+        
+        Raises:
+            ValueError: 如果内容为空或过长
+        """
+        if not content or not isinstance(content, str):
+            raise ValueError("Memo content cannot be empty")
+            
+        # 去除首尾空白字符
+        trimmed_content = content.strip()
+        if not trimmed_content:
+            raise ValueError("Memo content cannot be empty or just whitespace")
+        
+        # 内容长度限制（防止过长）
+        if len(trimmed_content) > MAX_CONTENT_LENGTH:
+            raise ValueError(f"Memo content is too long (maximum {MAX_CONTENT_LENGTH} characters)")
+        
+        # 对内容进行HTML转义，防止XSS攻击
+        return trimmed_content, html.escape(trimmed_content)
+    
+    @staticmethod
+    def _beijing_now():
+        """当前北京时间字符串"""
+        utc_time = timezone.now()
+        beijing_time = utc_time.astimezone(timezone.get_current_timezone())
+        return beijing_time.strftime('%Y-%m-%d %H:%M:%S')
+    
     def add_memo(self, content):
         """添加新备忘录
         
@@ -131,21 +555,7 @@ class MemoService:
         """
         try:
             # 1. 输入验证
-            if not content:
-                raise ValueError("Memo content cannot be empty")
-                
-            # 去除首尾空白字符
-            trimmed_content = content.strip()
-            if not trimmed_content:
-                raise ValueError("Memo content cannot be empty or just whitespace")
-            
-            # 对内容进行HTML转义，防止XSS攻击
-            sanitized_content = html.escape(trimmed_content)
-                
-            # 内容长度限制（防止过长）
-            MAX_LENGTH = 1000
-            if len(trimmed_content) > MAX_LENGTH:
-                raise ValueError(f"Memo content is too long (maximum {MAX_LENGTH} characters)")
+            trimmed_content, sanitized_content = self._prepare_content(content)
             
             # 2. 检查敏感词（使用原始内容进行检查）
             self._check_sensitive_words(trimmed_content)
@@ -153,18 +563,16 @@ class MemoService:
             # 表已在初始化时创建，无需重复操作
             
             # 4. 获取北京时间
-            utc_time = timezone.now()
-            beijing_time = utc_time.astimezone(timezone.get_current_timezone())
-            created_at = beijing_time.strftime('%Y-%m-%d %H:%M:%S')
+            created_at = self._beijing_now()
             
             # 5. 数据库操作
-            with sqlite3.connect(self.db_path) as conn:
+            conn = self._get_connection()
+            with conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     'INSERT INTO memos (content, created_at) VALUES (?, ?)',
                     (sanitized_content, created_at)
                 )
-                conn.commit()
                 memo_id = cursor.lastrowid
                 return {
                     "id": memo_id, 
@@ -214,10 +622,10 @@ class MemoService:
                 raise ValueError("Memo ID must be a positive integer")
             
             # 表已在初始化时创建，无需重复操作
-            with sqlite3.connect(self.db_path) as conn:
+            conn = self._get_connection()
+            with conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM memos WHERE id = ?', (memo_id,))
-                conn.commit()
                 return cursor.rowcount > 0
         except ValueError as e:
             raise e
@@ -228,6 +636,127 @@ class MemoService:
             logger.error(f"Unexpected error when deleting memo: {str(e)}")
             raise Exception("Failed to delete memo. Please try again later.")
     
+    def add_memos(self, contents):
+        """批量添加备忘录：整批只做一次敏感词扫描，并在同一个事务中写入
+        
+        无效或包含敏感词的条目不会写入，其余条目正常写入。
+        
+        Args:
+            contents (list): 备忘录内容列表
+            
+        Returns:
+            dict: {"created": 新建的备忘录列表, "errors": [{"index", "message"}]}
+            
+        Raises:
+            ValueError: 如果参数不是列表或条数超过上限
+            Exception: 如果数据库操作失败
+        """
+        if not isinstance(contents, (list, tuple)):
+            raise ValueError("Contents must be a list")
+        if len(contents) > MAX_BATCH_SIZE:
+            raise ValueError(f"Too many memos (maximum {MAX_BATCH_SIZE} per request)")
+        
+        errors = []
+        valid = []  # (下标, 原始内容, 转义后内容)
+        for index, content in enumerate(contents):
+            try:
+                trimmed_content, sanitized_content = self._prepare_content(content)
+            except ValueError as e:
+                errors.append({"index": index, "message": str(e)})
+                continue
+            valid.append((index, trimmed_content, sanitized_content))
+        
+        # 用词条中不会出现的分隔符拼接，整批只扫描一次，再按偏移映射回各条目
+        if valid:
+            self._ensure_lexicon_watcher()
+            starts = []
+            offset = 0
+            for _, trimmed_content, _ in valid:
+                starts.append(offset)
+                offset += len(trimmed_content) + 1
+            joined = '\x00'.join(trimmed_content for _, trimmed_content, _ in valid)
+            flagged = {bisect_right(starts, start) - 1
+                       for start, _, _ in self.sensitive_matcher.find_all(joined)}
+            for position in sorted(flagged):
+                errors.append({"index": valid[position][0], "message": "Content contains sensitive word"})
+            valid = [item for position, item in enumerate(valid) if position not in flagged]
+        errors.sort(key=lambda error: error["index"])
+        
+        if not valid:
+            return {"created": [], "errors": errors}
+        
+        created_at = self._beijing_now()
+        try:
+            conn = self._get_connection()
+            with conn:
+                # IMMEDIATE事务持有写锁，AUTOINCREMENT分配的id是连续的
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO memos (content, created_at) VALUES (?, ?)',
+                    [(sanitized_content, created_at) for _, _, sanitized_content in valid]
+                )
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Database write error when adding memos: {str(e)}")
+            raise Exception("Failed to add memos. Please try again later.")
+        
+        first_id = last_id - len(valid) + 1
+        created = [
+            {"id": first_id + position, "content": sanitized_content, "created_at": created_at}
+            for position, (_, _, sanitized_content) in enumerate(valid)
+        ]
+        return {"created": created, "errors": errors}
+    
+    def delete_memos(self, memo_ids):
+        """批量删除备忘录，在同一个事务中执行
+        
+        Args:
+            memo_ids (list): 备忘录ID列表
+            
+        Returns:
+            dict: {"deleted": 已删除的ID, "not_found": 不存在的ID, "errors": [{"index", "message"}]}
+            
+        Raises:
+            ValueError: 如果参数不是列表或条数超过上限
+            Exception: 如果数据库操作失败
+        """
+        if not isinstance(memo_ids, (list, tuple)):
+            raise ValueError("IDs must be a list")
+        if len(memo_ids) > MAX_BATCH_SIZE:
+            raise ValueError(f"Too many IDs (maximum {MAX_BATCH_SIZE} per request)")
+        
+        errors = []
+        ids = []
+        for index, memo_id in enumerate(memo_ids):
+            try:
+                ids.append(self._parse_positive_int(memo_id, "Memo ID"))
+            except ValueError as e:
+                errors.append({"index": index, "message": str(e)})
+        ids = list(dict.fromkeys(ids))  # 去重并保持顺序
+        
+        if not ids:
+            return {"deleted": [], "not_found": [], "errors": errors}
+        
+        try:
+            conn = self._get_connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                placeholders = ','.join('?' * len(ids))
+                existing = {row[0] for row in conn.execute(
+                    f'SELECT id FROM memos WHERE id IN ({placeholders})', ids
+                )}
+                deleted = [memo_id for memo_id in ids if memo_id in existing]
+                conn.executemany('DELETE FROM memos WHERE id = ?', [(memo_id,) for memo_id in deleted])
+        except sqlite3.Error as e:
+            logger.error(f"Database delete error: {str(e)}")
+            raise Exception("Database operation failed. Please try again later.")
+        
+        return {
+            "deleted": deleted,
+            "not_found": [memo_id for memo_id in ids if memo_id not in existing],
+            "errors": errors,
+        }
+    
     def search_memos(self, keyword):
         """搜索备忘录
         
@@ -257,14 +786,24 @@ class MemoService:
             if not keyword:
                 return self.get_all_memos()
             
-            # 表已在初始化时创建，无需重复操作
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            conn = self._get_connection()
+            with conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT * FROM memos WHERE content LIKE ? ORDER BY id DESC',
-                    (f'%{keyword}%',)
-                )
+                if self._fts_enabled and len(keyword) >= FTS_MIN_KEYWORD_LENGTH:
+                    # 全文索引：按相关度排序，相关度相同时新的在前
+                    cursor.execute(
+                        '''SELECT m.id, m.content, m.created_at
+                           FROM memos_fts JOIN memos m ON m.id = memos_fts.rowid
+                           WHERE memos_fts MATCH ?
+                           ORDER BY memos_fts.rank, m.id DESC''',
+                        ('"' + keyword.replace('"', '""') + '"',)
+                    )
+                else:
+                    # trigram索引无法匹配少于3个字符的关键词，使用LIKE
+                    cursor.execute(
+                        'SELECT * FROM memos WHERE content LIKE ? ORDER BY id DESC',
+                        (f'%{keyword}%',)
+                    )
                 memos = cursor.fetchall()
                 return [dict(memo) for memo in memos]
         except ValueError as e:
@@ -276,5 +815,49 @@ class MemoService:
             logger.error(f"Unexpected error when searching memo: {str(e)}")
             raise Exception("Failed to search memo. Please try again later.")
 
+class AsyncMemoService:
+    """MemoService 的异步门面，供 ASGI 下的异步视图使用
+    
+    所有数据库操作都提交到专用的有界线程池执行，事件循环不会被 sqlite3 阻塞；
+    线程池中的每个线程通过连接管理器持有自己的长连接。
+    """
+    
+    def __init__(self, service, max_workers=ASYNC_DB_WORKERS):
+        self.service = service
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='memo-db')
+    
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
+    async def get_all_memos(self):
+        return await self._run(self.service.get_all_memos)
+    
+    async def get_memos_page(self, before_id=None, limit=DEFAULT_PAGE_SIZE):
+        return await self._run(self.service.get_memos_page, before_id, limit)
+    
+    async def get_data_version(self):
+        return await self._run(self.service.get_data_version)
+    
+    async def get_memos_json(self, before_id=None, limit=None):
+        return await self._run(self.service.get_memos_json, before_id=before_id, limit=limit)
+    
+    async def add_memo(self, content):
+        return await self._run(self.service.add_memo, content)
+    
+    async def add_memos(self, contents):
+        return await self._run(self.service.add_memos, contents)
+    
+    async def delete_memo(self, memo_id):
+        return await self._run(self.service.delete_memo, memo_id)
+    
+    async def delete_memos(self, memo_ids):
+        return await self._run(self.service.delete_memos, memo_ids)
+    
+    async def search_memos(self, keyword):
+        return await self._run(self.service.search_memos, keyword)
+
+
 # 创建全局实例
-memo_service = MemoService()
\ No newline at end of file
+memo_service = MemoService()
+async_memo_service = AsyncMemoService(memo_service)
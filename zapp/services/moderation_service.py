@@ -0,0 +1,134 @@
+# zapp/services/moderation_service.py
+"""批量内容审核：用 MemoService 同一份敏感词库检查多段文本
+
+小批量直接在当前进程中检查；大批量按块分发到进程池，
+子进程通过 mmap 打开同一个编译好的词库文件，无需传输词表。
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .sensitive_lexicon import CompiledLexicon
+
+logger = logging.getLogger(__name__)
+
+# 单次请求最多检查的文本数量和单条文本的最大长度
+MAX_BATCH_TEXTS = 1000
+MAX_TEXT_LENGTH = 10000
+# 总字符数超过该值时使用进程池
+PARALLEL_THRESHOLD_CHARS = int(os.environ.get('MODERATION_PARALLEL_THRESHOLD', '200000'))
+# 每个子任务包含的文本条数
+CHUNK_SIZE = 50
+POOL_WORKERS = int(os.environ.get('MODERATION_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# 子进程内缓存的词库实例
+_worker_lexicon = None
+
+
+def _get_pool():
+    """惰性创建进程池；使用spawn避免在多线程的服务进程中fork"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_pool(broken):
+    """丢弃已损坏的进程池，下次使用时重新创建
+
+    只在 broken 仍是当前进程池时丢弃（其他请求可能已经换上了新池）；
+    不取消排队中的任务，损坏的池会让它们各自失败并退回当前进程检查。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def _scan(lexicon, texts):
+    return [lexicon.find_all(text) for text in texts]
+
+
+def _scan_chunk(lexicon_path, version, texts):
+    """子进程入口：按需（重新）打开词库后检查一批文本
+
+    Returns:
+        list | None: 检查结果；磁盘上的词库与请求的版本不一致时返回None，
+                     由调用方用自己持有的词库检查这一块
+    """
+    global _worker_lexicon
+    if _worker_lexicon is None or _worker_lexicon.version != version:
+        # 词库已被热更新替换时重新映射
+        _worker_lexicon = CompiledLexicon(lexicon_path)
+        if _worker_lexicon.version != version:
+            return None
+    return _scan(_worker_lexicon, texts)
+
+
+def _validate_texts(texts):
+    if not isinstance(texts, (list, tuple)):
+        raise ValueError("Texts must be a list of strings")
+    if len(texts) > MAX_BATCH_TEXTS:
+        raise ValueError(f"Too many texts (maximum {MAX_BATCH_TEXTS} per request)")
+    for text in texts:
+        if not isinstance(text, str):
+            raise ValueError("Texts must be a list of strings")
+        if len(text) > MAX_TEXT_LENGTH:
+            raise ValueError(f"Text is too long (maximum {MAX_TEXT_LENGTH} characters)")
+
+
+def moderate_texts(lexicon, texts):
+    """批量检查文本是否包含敏感词
+
+    Args:
+        lexicon: 敏感词库（CompiledLexicon 或 AhoCorasickMatcher）
+        texts (list): 要检查的文本列表
+
+    Returns:
+        list: 与输入顺序一致的结果，每项为
+              {"index", "sensitive", "matches": [{"word", "start", "end"}]}
+
+    Raises:
+        ValueError: 如果输入无效
+    """
+    _validate_texts(texts)
+
+    total_chars = sum(len(text) for text in texts)
+    if isinstance(lexicon, CompiledLexicon) and total_chars >= PARALLEL_THRESHOLD_CHARS and POOL_WORKERS > 1:
+        chunks = [texts[i:i + CHUNK_SIZE] for i in range(0, len(texts), CHUNK_SIZE)]
+        pool = None
+        try:
+            pool = _get_pool()
+            results = []
+            for chunk, chunk_result in zip(chunks, pool.map(_scan_chunk, [lexicon.path] * len(chunks),
+                                                            [lexicon.version] * len(chunks), chunks)):
+                # 词库在请求期间被热更新：这一块用调用方的词库检查，不算进程池故障
+                results.extend(_scan(lexicon, chunk) if chunk_result is None else chunk_result)
+        except Exception as e:
+            # 进程池不可用时退回当前进程检查
+            logger.warning(f"Moderation pool failed, scanning in-process: {str(e)}")
+            if isinstance(e, BrokenProcessPool):
+                _reset_pool(pool)
+            results = _scan(lexicon, texts)
+    else:
+        results = _scan(lexicon, texts)
+
+    return [
+        {
+            "index": index,
+            "sensitive": bool(matches),
+            "matches": [{"word": word, "start": start, "end": end} for start, end, word in matches],
+        }
+        for index, matches in enumerate(results)
+    ]
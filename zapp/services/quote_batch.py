@@ -0,0 +1,133 @@
+# zapp/services/quote_batch.py
+"""批量行情：在有界线程池中并发获取多只股票的数据
+
+每只股票单独经过行情缓存（quote_cache），失败互不影响；整体有截止时间，
+到期仍未完成的股票标记为超时。截止时间只限制批量请求等待的时长：上游请求与
+/api/fetch_stock/ 共用同一个不带截止时间的加载函数，在缓存的后台线程中完成并写入缓存，
+同时请求同一只股票的其他调用方不会拿到批量请求的超时结果。每个批量请求同时最多占用
+BATCH_REQUEST_SLOTS 个线程，大批量请求不会占满线程池而使其他请求一直排队。
+结果按完成顺序逐条产出，便于以 NDJSON 流式返回。
+"""
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .quote_cache import quote_cache, is_failure
+from ..stock_api_utils import StockApiUtils
+
+# 单次请求最多的股票数量
+BATCH_MAX_CODES = 500
+# 每个进程同时等待行情的线程数
+BATCH_WORKERS = int(os.environ.get('STOCK_BATCH_WORKERS', '8'))
+# 单个批量请求同时占用的线程数
+BATCH_REQUEST_SLOTS = int(os.environ.get('STOCK_BATCH_REQUEST_SLOTS', str(max(1, BATCH_WORKERS // 2))))
+# 整体截止时间（秒）；上限须小于 gunicorn 的 --timeout（30秒），否则worker在返回结果前被终止
+BATCH_DEFAULT_DEADLINE = 15.0
+BATCH_MAX_DEADLINE = 25.0
+# 股票代码的最大长度
+MAX_CODE_LENGTH = 16
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """获取进程级共享线程池（fork 后重新创建）"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='quote-batch')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def parse_codes(raw):
+    """
+    解析逗号分隔的股票代码（去空白、去重并保持顺序）
+
+    Args:
+        raw (str): 如 "sh600519,sz000001"
+
+    Returns:
+        list: 股票代码列表
+
+    Raises:
+        ValueError: 如果为空、数量超限或代码过长
+    """
+    codes = list(dict.fromkeys(code.strip() for code in (raw or '').split(',') if code.strip()))
+    if not codes:
+        raise ValueError("Missing 'codes' parameter")
+    if len(codes) > BATCH_MAX_CODES:
+        raise ValueError(f"Too many codes (maximum {BATCH_MAX_CODES} per request)")
+    if any(len(code) > MAX_CODE_LENGTH for code in codes):
+        raise ValueError(f"Code is too long (maximum {MAX_CODE_LENGTH} characters)")
+    return codes
+
+
+def parse_deadline(raw):
+    """解析截止时间参数（秒），缺省为 BATCH_DEFAULT_DEADLINE，上限 BATCH_MAX_DEADLINE"""
+    if raw in (None, ''):
+        return BATCH_DEFAULT_DEADLINE
+    try:
+        deadline = float(raw)
+    except ValueError:
+        raise ValueError("Deadline must be a number of seconds")
+    if not 0 < deadline <= BATCH_MAX_DEADLINE:
+        raise ValueError(f"Deadline must be between 0 and {BATCH_MAX_DEADLINE:g} seconds")
+    return deadline
+
+
+def _fetch_one(code, ktype, end):
+    data, cache_status = quote_cache.get(
+        (code, ktype), lambda: StockApiUtils(code, ktype).fetch_stock_data(),
+        timeout=max(0.0, end - time.monotonic()))
+    if is_failure(data):
+        return {"code": code, "ok": False, "error": data.get('error'), "cache": cache_status}
+    return {"code": code, "ok": True, "data": data, "cache": cache_status}
+
+
+def iter_quotes(codes, ktype='day', deadline=BATCH_DEFAULT_DEADLINE):
+    """
+    并发获取多只股票的数据，按完成顺序逐条产出
+
+    Args:
+        codes (list): 股票代码列表
+        ktype (str): K线类型
+        deadline (float): 整体截止时间（秒）
+
+    Yields:
+        dict: {"code", "ok", "data" | "error", "cache"}；超时的股票 error 为 "timeout"
+    """
+    end = time.monotonic() + deadline
+    executor = _get_executor()
+    queued = iter(codes)
+    pending = {}
+
+    def submit(count):
+        for code in itertools.islice(queued, count):
+            pending[executor.submit(_fetch_one, code, ktype, end)] = code
+
+    # 先提交 BATCH_REQUEST_SLOTS 个，之后每完成一个再提交一个
+    submit(BATCH_REQUEST_SLOTS)
+    try:
+        while pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                code = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield {"code": code, "ok": False, "error": str(e), "cache": None}
+            submit(len(done))
+        for code in itertools.chain(pending.values(), queued):
+            yield {"code": code, "ok": False, "error": "timeout", "cache": None}
+    finally:
+        # 截止或客户端断开：取消尚未开始的任务，已开始的在后台完成并写入缓存
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,207 @@
+# zapp/services/quote_cache.py
+"""行情缓存：按 (代码, K线类型) 缓存上游返回的数据
+
+- 未过期（TTL内）直接返回
+- 过期但仍在可容忍范围内时先返回旧数据，同时只启动一个后台刷新（stale-while-revalidate）
+- 同一个键的并发未命中合并为一次上游请求（single-flight），其余请求等待同一结果
+- 调用方可以只等待一段时间（timeout）：此时上游请求在后台线程中进行，超时只影响该调用方，
+  请求完成后照常写入缓存，等待同一结果的其他调用方不受影响
+- 上游失败的结果不缓存
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+# 数据新鲜期（秒）
+QUOTE_TTL = float(os.environ.get('STOCK_QUOTE_TTL', '10'))
+# 过期后仍可先返回旧数据的时长（秒）
+QUOTE_STALE_TTL = float(os.environ.get('STOCK_QUOTE_STALE_TTL', '60'))
+# 最多缓存的键数量
+QUOTE_CACHE_MAX_ENTRIES = 1024
+# 后台加载和刷新的线程数（不超过共享连接池大小）
+QUOTE_BACKGROUND_WORKERS = int(os.environ.get('STOCK_QUOTE_BACKGROUND_WORKERS', '8'))
+
+# get 返回的缓存状态
+HIT, STALE, MISS, COALESCED, TIMEOUT = 'HIT', 'STALE', 'MISS', 'COALESCED', 'TIMEOUT'
+
+
+def is_failure(data):
+    """StockApiUtils 用 {'success': False, 'error': ...} 表示上游失败"""
+    return isinstance(data, dict) and data.get('success') is False
+
+
+class QuoteCache:
+    """带 stale-while-revalidate 和请求合并的行情缓存（线程安全）"""
+
+    def __init__(self, ttl=QUOTE_TTL, stale_ttl=QUOTE_STALE_TTL, max_entries=QUOTE_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            ttl (float): 数据新鲜期（秒）
+            stale_ttl (float): 过期后仍可返回旧数据的时长（秒）
+            max_entries (int): 最多缓存的键数量
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 键 -> (获取时间, 数据)
+        self._inflight = {}  # 键 -> Future（同步加载）
+        self._refreshing = set()  # 正在后台刷新的键
+        self._executor = None
+        self._executor_pid = None
+        self._counters = dict.fromkeys(
+            ('hits', 'stale_hits', 'misses', 'coalesced', 'timeouts', 'refreshes', 'refresh_errors',
+             'upstream_errors'), 0)
+
+    def get(self, key, loader, timeout=None):
+        """
+        获取缓存的数据，必要时调用 loader 从上游加载
+
+        同一个键的加载和后台刷新会被所有调用方共用，loader 不应带有调用方自己的截止时间，
+        只等待一段时间请使用 timeout
+
+        Args:
+            key (tuple): 缓存键，如 (code, ktype)
+            loader (callable): 无参数函数，返回上游数据
+            timeout (float): 最多等待的秒数；None 表示在当前线程加载并等到完成
+
+        Returns:
+            tuple: (数据, 缓存状态 HIT / STALE / MISS / COALESCED / TIMEOUT)；
+                TIMEOUT 时数据为 {'success': False, 'error': 'timeout'}
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[0]
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return entry[1], HIT
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._counters['stale_hits'] += 1
+                    if key not in self._refreshing and key not in self._inflight:
+                        self._refreshing.add(key)
+                        self._submit(self._refresh, key, loader)
+                    return entry[1], STALE
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counters['coalesced'] += 1
+                status = COALESCED
+            else:
+                future = self._inflight[key] = Future()
+                self._counters['misses'] += 1
+                status = MISS
+                if timeout is not None:
+                    self._submit(self._load, key, loader, future)
+
+        if status == MISS and timeout is None:
+            self._load(key, loader, future)
+        try:
+            return future.result(timeout), status
+        except TimeoutError:
+            with self._lock:
+                self._counters['timeouts'] += 1
+            return {'success': False, 'error': 'timeout'}, TIMEOUT
+
+    def _load(self, key, loader, future):
+        """调用 loader 并把结果交给所有等待 future 的调用方（成功的结果写入缓存）"""
+        try:
+            data = loader()
+        except BaseException as e:
+            with self._lock:
+                self._counters['upstream_errors'] += 1
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            if is_failure(data):
+                self._counters['upstream_errors'] += 1
+            else:
+                self._store(key, data)
+            self._inflight.pop(key, None)
+        future.set_result(data)
+
+    def peek(self, key):
+        """
+        非阻塞地读取未过期的数据（供异步视图使用，不触发加载）
+
+        Returns:
+            数据，不存在或已过期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return entry[1]
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, key, data):
+        """写入上游返回的数据（失败结果不缓存）"""
+        with self._lock:
+            if is_failure(data):
+                self._counters['upstream_errors'] += 1
+            else:
+                self._store(key, data)
+
+    def _store(self, key, data):
+        self._entries[key] = (time.monotonic(), data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _submit(self, fn, *args):
+        """提交后台加载或刷新任务（调用方持有锁）"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            # fork 后线程池不可用，重新创建
+            self._executor = ThreadPoolExecutor(max_workers=QUOTE_BACKGROUND_WORKERS,
+                                                thread_name_prefix='quote-background')
+            self._executor_pid = os.getpid()
+        self._executor.submit(fn, *args)
+
+    def _refresh(self, key, loader):
+        try:
+            data = loader()
+        except Exception:
+            data = None
+        with self._lock:
+            self._refreshing.discard(key)
+            if data is None or is_failure(data):
+                # 刷新失败时保留旧数据，直到超出可容忍的过期时长
+                self._counters['refresh_errors'] += 1
+            else:
+                self._counters['refreshes'] += 1
+                self._store(key, data)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 命中、过期命中、未命中、合并等计数及当前配置
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update(
+                entries=len(self._entries),
+                inflight=len(self._inflight),
+                refreshing=len(self._refreshing),
+                ttl=self.ttl,
+                stale_ttl=self.stale_ttl,
+            )
+        return stats
+
+
+# 创建全局缓存实例
+quote_cache = QuoteCache()
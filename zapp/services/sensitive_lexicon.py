@@ -0,0 +1,361 @@
+# zapp/services/sensitive_lexicon.py
+"""预编译的敏感词词库
+
+把 base64 编码的 sensitive_words.txt 编译成一个紧凑的二进制文件：
+词条已解码、去空白、转小写并去重，Aho-Corasick 自动机以扁平数组形式存储。
+运行时通过 mmap 只读映射该文件直接匹配，gunicorn 的多个 worker 共享同一份
+页缓存，而不是各自持有 5 万个 Python 字符串。
+
+源文件的 sha256 记录在文件头中，源文件变化后会自动重新编译。
+
+文件布局（小端 uint32 数组，均按 4 字节对齐）：
+    header
+    node_starts[node_count + 1]   每个节点在转移表中的起止位置
+    trans_chars[trans_count]      转移字符（码点），节点内升序
+    trans_next[trans_count]       转移目标节点
+    fail[node_count]              失败指针
+    output[node_count]            节点命中的词条下标，0xFFFFFFFF 表示无
+    dict_link[node_count]         输出链接
+    word_offsets[word_count + 1]  词条在 blob 中的字节偏移
+    word_lengths[word_count]      词条字符长度
+    blob                          UTF-8 编码的词条
+"""
+import base64
+import contextlib
+import hashlib
+import logging
+import mmap
+import os
+import stat
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+
+from .sensitive_matcher import AhoCorasickMatcher, fold_case
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LEXICON_MAGIC = b'ZLEX'
+LEXICON_FORMAT_VERSION = 1
+# magic, 格式版本, 字节序标记, 源文件sha256, 词条数, 节点数, 转移数, blob字节数
+_HEADER = struct.Struct('<4sHH32sIIII')
+_BYTEORDER_LITTLE = 1
+_NO_OUTPUT = 0xFFFFFFFF
+
+
+def default_lexicon_path(source_path):
+    """编译产物的默认位置：可通过环境变量 SENSITIVE_LEXICON_PATH 覆盖，否则与源文件同目录"""
+    return os.environ.get('SENSITIVE_LEXICON_PATH') or os.path.splitext(source_path)[0] + '.lexicon'
+
+
+def file_sha256(path):
+    """计算文件的sha256摘要"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def decode_words(source_path):
+    """从文件加载base64编码的敏感词并解码
+
+    Returns:
+        list: 解码后的敏感词列表（保持文件顺序，跳过无效行）
+    """
+    words = []
+    with open(source_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            encoded_word = line.strip()
+            if encoded_word:
+                try:
+                    word = base64.b64decode(encoded_word).decode('utf-8').strip()
+                except (base64.binascii.Error, UnicodeDecodeError):
+                    # 跳过无效的编码行
+                    continue
+                if word:
+                    words.append(word)
+    return words
+
+
+@contextlib.contextmanager
+def _build_lock(lexicon_path):
+    """跨进程的编译锁，避免多个worker同时重复编译（Windows下不加锁）"""
+    if fcntl is None:
+        yield
+        return
+    with open(lexicon_path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _u32(values):
+    table = array('I', values)
+    if sys.byteorder != 'little':
+        table.byteswap()
+    return table.tobytes()
+
+
+def build_lexicon(source_path, lexicon_path=None):
+    """把敏感词源文件编译为二进制词库文件
+
+    写入临时文件后原子替换，正在映射旧文件的进程不受影响。
+
+    Args:
+        source_path (str): base64编码的敏感词文件
+        lexicon_path (str): 输出路径，默认见 default_lexicon_path
+
+    Returns:
+        str: 编译产物路径
+    """
+    lexicon_path = lexicon_path or default_lexicon_path(source_path)
+    source_hash = file_sha256(source_path)
+    matcher = AhoCorasickMatcher(decode_words(source_path))
+
+    node_starts, trans_chars, trans_next = [0], [], []
+    for transitions in matcher._goto:
+        for ch in sorted(transitions):
+            trans_chars.append(ord(ch))
+            trans_next.append(transitions[ch])
+        node_starts.append(len(trans_chars))
+
+    encoded = [word.encode('utf-8') for word in matcher.patterns]
+    word_offsets = [0]
+    for word_bytes in encoded:
+        word_offsets.append(word_offsets[-1] + len(word_bytes))
+    blob = b''.join(encoded)
+
+    header = _HEADER.pack(
+        LEXICON_MAGIC, LEXICON_FORMAT_VERSION, _BYTEORDER_LITTLE, source_hash,
+        len(matcher.patterns), len(matcher._goto), len(trans_chars), len(blob),
+    )
+    sections = [
+        header,
+        _u32(node_starts),
+        _u32(trans_chars),
+        _u32(trans_next),
+        _u32(matcher._fail),
+        _u32(_NO_OUTPUT if out < 0 else out for out in matcher._output),
+        _u32(matcher._dict_link),
+        _u32(word_offsets),
+        _u32(len(word) for word in matcher.patterns),
+        blob,
+    ]
+
+    directory = os.path.dirname(os.path.abspath(lexicon_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.lexicon-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for section in sections:
+                f.write(section)
+        # mkstemp 创建的文件权限为0600，改为与源文件一致，否则以其他用户运行的worker无法映射
+        os.chmod(tmp_path, stat.S_IMODE(os.stat(source_path).st_mode))
+        os.replace(tmp_path, lexicon_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return lexicon_path
+
+
+class CompiledLexicon:
+    """mmap映射的只读词库，提供与 AhoCorasickMatcher 相同的匹配接口
+
+    同时实现只读序列协议（len / 下标 / 切片），可直接当作敏感词列表使用，
+    词条按需从映射区解码。
+    """
+
+    def __init__(self, lexicon_path):
+        self.path = lexicon_path
+        with open(lexicon_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        buf = self._mmap
+        if len(buf) < _HEADER.size:
+            raise ValueError("Lexicon file is truncated")
+        (magic, version, byteorder, source_hash,
+         word_count, node_count, trans_count, blob_size) = _HEADER.unpack_from(buf, 0)
+        if magic != LEXICON_MAGIC or version != LEXICON_FORMAT_VERSION:
+            raise ValueError("Unsupported lexicon file format")
+        if byteorder != _BYTEORDER_LITTLE or sys.byteorder != 'little':
+            raise ValueError("Lexicon byte order does not match this platform")
+
+        expected = (_HEADER.size + 4 * ((node_count + 1) + 2 * trans_count + 3 * node_count
+                                         + (word_count + 1) + word_count) + blob_size)
+        if len(buf) != expected:
+            raise ValueError("Lexicon file size does not match its header")
+
+        self.source_hash = source_hash
+        self.word_count = word_count
+        view = memoryview(buf)
+        offset = _HEADER.size
+
+        def take(count):
+            nonlocal offset
+            section = view[offset:offset + 4 * count].cast('I')
+            offset += 4 * count
+            return section
+
+        self._node_starts = take(node_count + 1)
+        self._trans_chars = take(trans_count)
+        self._trans_next = take(trans_count)
+        self._fail = take(node_count)
+        self._output = take(node_count)
+        self._dict_link = take(node_count)
+        self._word_offsets = take(word_count + 1)
+        self._word_lengths = take(word_count)
+        self._blob = view[offset:offset + blob_size]
+        # 根节点的转移最频繁，单独缓存为字典（仅几千项），其余节点在映射区上二分查找
+        root_end = self._node_starts[1]
+        self._root = dict(zip(self._trans_chars[:root_end], self._trans_next[:root_end]))
+
+    @property
+    def version(self):
+        """词库版本：源文件sha256的前12位十六进制"""
+        return self.source_hash.hex()[:12]
+
+    def close(self):
+        """释放映射（仍被引用的 memoryview 会在回收后自动释放）"""
+        for name in ('_node_starts', '_trans_chars', '_trans_next', '_fail', '_output',
+                     '_dict_link', '_word_offsets', '_word_lengths', '_blob'):
+            section = self.__dict__.pop(name, None)
+            if section is not None:
+                section.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __len__(self):
+        return self.word_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.word_count))]
+        if index < 0:
+            index += self.word_count
+        if not 0 <= index < self.word_count:
+            raise IndexError("lexicon index out of range")
+        return self._word(index)
+
+    def __iter__(self):
+        for index in range(self.word_count):
+            yield self._word(index)
+
+    def _word(self, index):
+        return bytes(self._blob[self._word_offsets[index]:self._word_offsets[index + 1]]).decode('utf-8')
+
+    def _iter_matches(self, text, first_only=False):
+        starts, chars, nexts = self._node_starts, self._trans_chars, self._trans_next
+        fail, output, dict_link, lengths = self._fail, self._output, self._dict_link, self._word_lengths
+        root = self._root
+        lowered, origin = fold_case(text)
+        node = 0
+        for pos, ch in enumerate(lowered):
+            code = ord(ch)
+            while node:
+                lo, hi = starts[node], starts[node + 1]
+                i = bisect_left(chars, code, lo, hi)
+                if i < hi and chars[i] == code:
+                    node = nexts[i]
+                    break
+                node = fail[node]
+            else:
+                node = root.get(code, 0)
+            hit = node if output[node] != _NO_OUTPUT else dict_link[node]
+            while hit:
+                word_index = output[hit]
+                start, end = pos + 1 - lengths[word_index], pos + 1
+                if origin is not None:
+                    start, end = origin[start], origin[pos] + 1
+                yield start, end, self._word(word_index)
+                if first_only:
+                    return
+                hit = dict_link[hit]
+
+    def find_all(self, text):
+        """找出文本中所有命中的敏感词，返回 (start, end, word) 列表"""
+        if not text or not self.word_count:
+            return []
+        return list(self._iter_matches(text))
+
+    def search(self, text):
+        """返回第一个命中的敏感词 (start, end, word)，找不到时返回None"""
+        if not text or not self.word_count:
+            return None
+        for match in self._iter_matches(text, first_only=True):
+            return match
+        return None
+
+    def contains(self, text):
+        """判断文本是否包含任一敏感词"""
+        return self.search(text) is not None
+
+
+def _open_if_current(lexicon_path, source_hash):
+    """打开与源文件摘要一致的词库，不存在或已过期时返回None"""
+    try:
+        lexicon = CompiledLexicon(lexicon_path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Invalid lexicon file %s, rebuilding: %s", lexicon_path, e)
+        return None
+    if lexicon.source_hash == source_hash:
+        return lexicon
+    lexicon.close()
+    return None
+
+
+def load_lexicon(source_path, lexicon_path=None):
+    """加载编译好的词库；缺失、损坏或与源文件sha256不一致时自动重新编译
+
+    Args:
+        source_path (str): base64编码的敏感词文件
+        lexicon_path (str): 编译产物路径，默认见 default_lexicon_path
+
+    Returns:
+        CompiledLexicon | AhoCorasickMatcher: 词库不可写时退化为进程内自动机
+    """
+    lexicon_path = lexicon_path or default_lexicon_path(source_path)
+    try:
+        source_hash = file_sha256(source_path)
+    except FileNotFoundError:
+        logger.warning("Sensitive word file not found: %s", source_path)
+        return AhoCorasickMatcher([])
+
+    lexicon = _open_if_current(lexicon_path, source_hash)
+    if lexicon is not None:
+        return lexicon
+
+    try:
+        with _build_lock(lexicon_path):
+            # 拿到锁后再检查一次：其他worker可能已经编译好了
+            lexicon = _open_if_current(lexicon_path, source_hash)
+            if lexicon is None:
+                logger.info("Compiling sensitive word lexicon: %s", lexicon_path)
+                build_lexicon(source_path, lexicon_path)
+                lexicon = CompiledLexicon(lexicon_path)
+        return lexicon
+    except OSError as e:
+        # 目录不可写等情况：退化为进程内自动机，功能不受影响
+        logger.warning("Cannot write lexicon file %s, using in-memory matcher: %s", lexicon_path, e)
+        matcher = AhoCorasickMatcher(decode_words(source_path))
+        matcher.version = source_hash.hex()[:12]
+        return matcher
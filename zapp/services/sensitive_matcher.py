@@ -0,0 +1,147 @@
+# zapp/services/sensitive_matcher.py
+"""敏感词多模式匹配引擎（Aho-Corasick 自动机）
+
+构建一次自动机后，对文本只需单次扫描即可找出全部命中的敏感词，
+复杂度为 O(文本长度 + 命中数)，与敏感词数量无关。
+"""
+from collections import deque
+
+
+def fold_case(text):
+    """将文本转为小写，并在长度发生变化时给出到原始文本的位置映射
+
+    个别字符转小写后会变成多个字符（如 'İ'），此时返回的 origin[i] 为
+    小写文本第 i 个字符在原始文本中的下标；长度不变时 origin 为None。
+
+    Returns:
+        tuple: (lowered, origin)
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered, None
+    return lowered, [i for i, raw in enumerate(text) for _ in raw.lower()]
+
+
+class AhoCorasickMatcher:
+    """基于 Aho-Corasick 自动机的敏感词匹配器
+
+    匹配不区分大小写：模式串在构建时统一转为小写，文本在扫描前转为小写，
+    返回的偏移量始终对应原始文本中的位置。
+    """
+
+    def __init__(self, words):
+        """
+        Args:
+            words (iterable): 敏感词列表，空字符串和重复项会被忽略
+        """
+        # 每个节点的转移表、失败指针、节点自身命中的模式下标、输出链接
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [-1]
+        self._dict_link = [0]
+        self.patterns = []
+        # 词库版本，由加载方设置（如源文件摘要）
+        self.version = None
+
+        seen = set()
+        for word in words:
+            if not word:
+                continue
+            pattern = word.lower()
+            if pattern in seen:
+                continue
+            seen.add(pattern)
+            self._add_pattern(pattern)
+        self._build_links()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __getitem__(self, index):
+        return self.patterns[index]
+
+    def __iter__(self):
+        return iter(self.patterns)
+
+    def _add_pattern(self, pattern):
+        """将模式串插入字典树"""
+        node = 0
+        goto = self._goto
+        for ch in pattern:
+            nxt = goto[node].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[node][ch] = nxt
+                goto.append({})
+                self._fail.append(0)
+                self._output.append(-1)
+                self._dict_link.append(0)
+            node = nxt
+        self._output[node] = len(self.patterns)
+        self.patterns.append(pattern)
+
+    def _build_links(self):
+        """按层序（BFS）计算失败指针和输出链接"""
+        goto, fail, output, dict_link = self._goto, self._fail, self._output, self._dict_link
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                target = goto[state].get(ch, 0)
+                fail[child] = target if target != child else 0
+                # 输出链接指向失败链上最近的一个“有输出”的节点，便于报告所有重叠命中
+                dict_link[child] = target if output[target] >= 0 else dict_link[target]
+
+    def _iter_matches(self, text, first_only=False):
+        goto, fail, output, dict_link = self._goto, self._fail, self._output, self._dict_link
+        patterns = self.patterns
+        # 与原有实现一致，整体转小写后再匹配
+        lowered, origin = fold_case(text)
+        node = 0
+        for pos, ch in enumerate(lowered):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if output[node] >= 0 else dict_link[node]
+            while hit:
+                pattern = patterns[output[hit]]
+                start, end = pos + 1 - len(pattern), pos + 1
+                if origin is not None:
+                    start, end = origin[start], origin[pos] + 1
+                yield start, end, pattern
+                if first_only:
+                    return
+                hit = dict_link[hit]
+
+    def find_all(self, text):
+        """找出文本中所有命中的敏感词（包括相互重叠的命中）
+
+        Args:
+            text (str): 要检查的文本
+
+        Returns:
+            list: (start, end, word) 元组列表，按结束位置排序；start/end 为原始文本中的偏移
+        """
+        if not text or not self.patterns:
+            return []
+        return list(self._iter_matches(text))
+
+    def search(self, text):
+        """返回第一个命中的敏感词，找不到时返回None
+
+        Returns:
+            tuple | None: (start, end, word)
+        """
+        if not text or not self.patterns:
+            return None
+        for match in self._iter_matches(text, first_only=True):
+            return match
+        return None
+
+    def contains(self, text):
+        """判断文本是否包含任一敏感词"""
+        return self.search(text) is not None
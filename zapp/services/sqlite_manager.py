@@ -0,0 +1,88 @@
+# zapp/services/sqlite_manager.py
+"""SQLite连接管理：每个线程为每个数据库保持一个长连接
+
+避免每次请求都重新 connect / 关闭连接、丢失页缓存；连接建立时统一设置
+WAL、synchronous=NORMAL、页缓存和 mmap 等参数，并开启预编译语句缓存。
+"""
+import os
+import sqlite3
+import threading
+
+# 连接参数（可通过环境变量调整）
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', '8192'))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(64 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+# 每个连接缓存的预编译语句数量
+SQLITE_CACHED_STATEMENTS = 256
+
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -SQLITE_CACHE_SIZE_KB),  # 负数表示以KB为单位
+    ('mmap_size', SQLITE_MMAP_SIZE),
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', SQLITE_BUSY_TIMEOUT_MS),
+)
+
+
+class SQLiteConnectionManager:
+    """按线程缓存SQLite连接
+
+    每个线程对每个数据库路径只建立一次连接；fork 出的子进程会丢弃继承来的
+    连接并重新建立（SQLite连接不能跨进程使用）。
+    """
+
+    def __init__(self, pragmas=DEFAULT_PRAGMAS, on_connect=None):
+        """
+        Args:
+            pragmas (iterable): 连接建立时执行的 (名称, 值) PRAGMA 列表
+            on_connect (callable): 新连接建立后的回调，接收连接对象（如建表）
+        """
+        self.pragmas = tuple(pragmas)
+        self.on_connect = on_connect
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def _connections(self):
+        if self._pid != os.getpid():
+            # fork后的子进程：放弃继承自父进程的连接
+            self._local = threading.local()
+            self._pid = os.getpid()
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        return connections
+
+    def connect(self, db_path):
+        """创建一个新连接并应用PRAGMA设置"""
+        conn = sqlite3.connect(db_path, cached_statements=SQLITE_CACHED_STATEMENTS)
+        try:
+            conn.row_factory = sqlite3.Row
+            for name, value in self.pragmas:
+                conn.execute(f'PRAGMA {name}={value}')
+            if self.on_connect is not None:
+                self.on_connect(conn)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def get_connection(self, db_path):
+        """获取当前线程到 db_path 的连接，不存在时新建
+
+        返回的连接可用 `with conn:` 管理事务（成功提交、异常回滚）。
+        """
+        connections = self._connections()
+        conn = connections.get(db_path)
+        if conn is None:
+            conn = connections[db_path] = self.connect(db_path)
+        return conn
+
+    def close(self, db_path=None):
+        """关闭当前线程的连接（db_path为None时关闭全部）"""
+        connections = self._connections()
+        paths = list(connections) if db_path is None else [db_path]
+        for path in paths:
+            conn = connections.pop(path, None)
+            if conn is not None:
+                conn.close()
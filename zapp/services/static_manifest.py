@@ -0,0 +1,200 @@
+# zapp/services/static_manifest.py
+"""静态文件清单：逻辑文件名 -> 实际路径、大小、MIME类型和内容摘要
+
+进程内首次使用时遍历一次 [STATIC_ROOT] + STATICFILES_DIRS 建立清单，
+之后每次查找只是一次字典访问，不再逐个目录拼路径、判断文件是否存在。
+
+- 同名文件按目录顺序取第一个（与原有查找顺序一致）
+- 内容相同的文件共用一个实际路径（assets 和 staticfiles 中的副本只保留一份），
+  各级缓存只缓存一份
+- 每个文件还可以通过带内容摘要的文件名访问（如 DS-DIGIB.3f2a9c1b0d4e.TTF），
+  内容变化后文件名随之变化，因此可以设置为 immutable 长期缓存
+"""
+import hashlib
+import os
+import posixpath
+import threading
+
+from django.conf import settings
+
+from .static_service import find_static_file, guess_mime_type
+
+# 带摘要文件名中使用的摘要长度（十六进制字符数）
+HASH_LENGTH = 12
+
+
+def _file_digest(path):
+    """计算文件内容的sha256（十六进制）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """在扩展名前插入内容摘要：DS-DIGIB.TTF -> DS-DIGIB.<摘要>.TTF"""
+    root, ext = posixpath.splitext(name)
+    return f"{root}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def _normalize_name(name):
+    """规范化逻辑文件名，越出静态目录的名称返回None"""
+    name = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+    if name in ('', '.') or name == '..' or name.startswith('../'):
+        return None
+    return name
+
+
+class StaticManifest:
+    """静态文件清单
+
+    条目为字典：name（逻辑文件名）、source（该名称对应的文件）、path（实际发送的文件，
+    内容相同的文件共用同一个）、size、mtime_ns、mime_type、hash、hashed_name。
+    """
+
+    def __init__(self, static_dirs):
+        """
+        Args:
+            static_dirs (list): 静态目录，按查找优先级排列
+        """
+        self.static_dirs = [str(d) for d in static_dirs]
+        self._entries = {}
+        self._hashed = {}
+        self._by_hash = {}
+        self._built = False
+        self._lock = threading.Lock()
+
+    def build(self):
+        """遍历静态目录重新建立清单"""
+        with self._lock:
+            self._build_locked()
+
+    def _build_locked(self):
+        """在持有 self._lock 时遍历静态目录建立清单"""
+        entries, hashed, by_hash = {}, {}, {}
+        for static_dir in self.static_dirs:
+            if not os.path.isdir(static_dir):
+                continue
+            for dirpath, _, filenames in os.walk(static_dir):
+                for filename in sorted(filenames):
+                    full_path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(full_path, static_dir).replace(os.sep, '/')
+                    # 预压缩副本由 static_service 按源文件查找，不单独登记
+                    if name in entries or (filename.endswith('.gz') and os.path.exists(full_path[:-3])):
+                        continue
+                    entry = self._make_entry(name, full_path, by_hash)
+                    if entry is not None:
+                        entries[name] = entry
+                        hashed[entry["hashed_name"]] = name
+        self._entries, self._hashed, self._by_hash = entries, hashed, by_hash
+        self._built = True
+
+    @staticmethod
+    def _make_entry(name, full_path, by_hash):
+        try:
+            stat = os.stat(full_path)
+            digest = _file_digest(full_path)
+        except OSError:
+            return None
+        canonical = by_hash.setdefault(digest, (full_path, stat.st_size, stat.st_mtime_ns))
+        return {
+            "name": name,
+            "source": full_path,
+            "path": canonical[0],
+            "canonical": canonical,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "mime_type": guess_mime_type(full_path),
+            "hash": digest,
+            "hashed_name": hashed_name(name, digest),
+        }
+
+    def _ensure_built(self):
+        # 双重检查：多个线程同时首次访问时只有一个线程遍历目录，其余线程等待其完成
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._build_locked()
+
+    @staticmethod
+    def _unchanged(path, size, mtime_ns):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+    def _refresh(self, name):
+        """文件不在清单中或已变化时重新登记该文件，文件已不存在时移除"""
+        source = find_static_file(name, self.static_dirs)
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self._hashed.pop(old["hashed_name"], None)
+                if self._by_hash.get(old["hash"], (None,))[0] == old["source"]:
+                    del self._by_hash[old["hash"]]
+            if source is None:
+                return None
+            entry = self._make_entry(name, source, self._by_hash)
+            if entry is not None:
+                self._entries[name] = entry
+                self._hashed[entry["hashed_name"]] = name
+            return entry
+
+    def get(self, name):
+        """
+        按逻辑文件名查找条目；文件被修改或新增时自动更新该条目
+
+        Returns:
+            dict | None: 清单条目，文件不存在时返回None
+        """
+        name = _normalize_name(name)
+        if name is None:
+            return None
+        self._ensure_built()
+        entry = self._entries.get(name)
+        if entry is None or not self._unchanged(entry["source"], entry["size"], entry["mtime_ns"]):
+            return self._refresh(name)
+        if entry["path"] != entry["source"] and not self._unchanged(*entry["canonical"]):
+            # 共用的文件已变化：改回发送该名称自己的文件
+            return self._refresh(name)
+        return entry
+
+    def resolve(self, name):
+        """
+        解析请求路径：支持逻辑文件名和带摘要的文件名
+
+        Returns:
+            tuple: (条目, 是否为带摘要的文件名)；不存在或摘要已过期时为 (None, False)
+        """
+        normalized = _normalize_name(name)
+        if normalized is None:
+            return None, False
+        self._ensure_built()
+        logical = self._hashed.get(normalized)
+        if logical is not None:
+            entry = self.get(logical)
+            if entry is not None and entry["hashed_name"] == normalized:
+                return entry, True
+            return None, False
+        return self.get(normalized), False
+
+    def url_name(self, name):
+        """返回逻辑文件名对应的带摘要文件名，文件不存在时原样返回"""
+        entry = self.get(name)
+        return entry["hashed_name"] if entry is not None else name
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_static_manifest():
+    """获取按 settings 中的静态目录建立的进程级清单"""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = StaticManifest([settings.STATIC_ROOT] + list(settings.STATICFILES_DIRS))
+    return _manifest
@@ -0,0 +1,486 @@
+# zapp/services/static_service.py
+"""静态文件服务：在静态目录中查找文件，并以流式响应返回文件内容
+
+二进制文件不再整体读入内存，而是交给 FileResponse：WSGI 服务器提供
+wsgi.file_wrapper 时（如 gunicorn）直接用 sendfile 发送，否则按块迭代，
+每个请求的内存占用与文件大小无关。
+
+支持 Range 请求（单段返回206，多段返回 multipart/byteranges，无法满足时
+返回416），音频拖动进度时只从文件偏移处读取需要的部分。
+
+响应带有由 (size, mtime, inode) 计算的强ETag和 Last-Modified，条件请求
+命中时返回304；Cache-Control 的 max-age 按扩展名配置（settings.STATIC_CACHE_MAX_AGE）。
+
+可压缩的文件在部署时预先生成 .gz 副本（scripts/compress_static.py），
+客户端接受 gzip 时直接发送副本，请求路径上不做任何压缩。
+
+文件内容优先取自进程内的热点缓存（asset_cache）：小文件直接从内存发送，
+大文件从 mmap 发送；服务器支持 sendfile 时大文件仍交给 sendfile。
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import tempfile
+import threading
+import uuid
+from stat import S_IMODE
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from .asset_cache import asset_cache
+
+# 没有 sendfile 时每次从文件读取并写出的块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+# 单个请求最多接受的区间数，超过时忽略Range返回完整文件（防止滥用）
+MAX_RANGES = 16
+# 未在 settings.STATIC_CACHE_MAX_AGE 中配置的扩展名使用的默认 max-age（秒）
+DEFAULT_CACHE_MAX_AGE = 3600
+# 带内容摘要的文件名内容不会变化，可以长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 预先生成 .gz 副本的扩展名
+COMPRESSIBLE_EXTENSIONS = frozenset({'.txt', '.ttf', '.otf', '.css', '.js', '.json', '.svg', '.html'})
+# 压缩后至少要节省的比例，否则不生成副本
+MIN_COMPRESSION_SAVING = 0.1
+
+# 路径 -> ((size, mtime_ns, inode), ETag)
+_validator_cache = {}
+_validator_lock = threading.Lock()
+
+
+def find_static_file(file_path, static_dirs):
+    """
+    按顺序在静态目录中查找文件
+    :param file_path: 相对于静态目录的文件路径
+    :param static_dirs: 静态目录列表
+    :return: 文件的绝对路径，不存在（或路径越出静态目录）时返回None
+    """
+    for static_dir in static_dirs:
+        root = os.path.realpath(static_dir)
+        full_path = os.path.realpath(os.path.join(root, file_path))
+        if os.path.commonpath([root, full_path]) != root:
+            continue
+        if os.path.isfile(full_path):
+            return full_path
+    return None
+
+
+def guess_mime_type(file_path):
+    """获取文件的MIME类型，无法识别时返回 application/octet-stream"""
+    mime_type, _ = mimetypes.guess_type(file_path)
+    return mime_type or 'application/octet-stream'
+
+
+def stream_file_response(full_path, filename=None, mime_type=None):
+    """
+    构造流式文件响应（自动设置 Content-Length 和 Content-Disposition: inline）
+    :param full_path: 文件绝对路径
+    :param filename: 响应中的文件名，默认取路径的文件名部分
+    :param mime_type: 响应的MIME类型，默认按路径推断
+    :return: FileResponse
+    """
+    response = FileResponse(
+        open(full_path, 'rb'),
+        content_type=mime_type or guess_mime_type(full_path),
+        filename=filename or os.path.basename(full_path),
+    )
+    response.block_size = STREAM_CHUNK_SIZE
+    return response
+
+
+def parse_range_header(header, size):
+    """
+    解析 Range 请求头（仅支持 bytes 单位）
+    :param header: Range 请求头的值
+    :param size: 文件大小
+    :return: None 表示忽略该请求头（格式无效或区间过多）；
+             空列表表示所有区间都无法满足（应返回416）；
+             否则为按起点排序并合并重叠部分后的 [(start, end)]，end 包含在内
+    """
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    
+    ranges = []
+    parts = [part.strip() for part in spec.split(',') if part.strip()]
+    if not parts or len(parts) > MAX_RANGES:
+        return None
+    for part in parts:
+        first, sep, last = part.partition('-')
+        first, last = first.strip(), last.strip()
+        if not sep or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # 后缀区间：最后 N 个字节
+            if not last:
+                return None
+            length = int(last)
+            if length > 0 and size > 0:
+                ranges.append((max(size - length, 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            ranges.append((start, min(int(last), size - 1) if last else size - 1))
+    
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class _RangeFile:
+    """
+    只暴露文件中 [start, start + length) 区间的只读文件对象
+    保留 fileno()，gunicorn 的 sendfile 会从当前偏移开始、按 Content-Length 发送
+    """
+
+    def __init__(self, file, start, length):
+        self._file = file
+        self._remaining = length
+        file.seek(start)
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size) if size else b''
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def _iter_file_range(full_path, start, end):
+    """从文件偏移处按块读取 [start, end] 区间"""
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _iter_content_range(content, start, end):
+    """从缓存的内容（bytes 或 mmap）按块取出 [start, end] 区间"""
+    for pos in range(start, end + 1, STREAM_CHUNK_SIZE):
+        yield content[pos:min(pos + STREAM_CHUNK_SIZE, end + 1)]
+
+
+def _iter_byteranges(read_range, ranges, part_headers, boundary):
+    """按块生成 multipart/byteranges 响应体"""
+    for (start, end), headers in zip(ranges, part_headers):
+        yield headers
+        yield from read_range(start, end)
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('ascii')
+
+
+def _content_response(content, start, end, mime_type, filename, status=200):
+    """用缓存的内容构造响应：bytes 直接作为响应体，mmap 按块发送"""
+    if isinstance(content, bytes):
+        body = content if (start, end + 1) == (0, len(content)) else content[start:end + 1]
+        response = HttpResponse(body, status=status, content_type=mime_type)
+    else:
+        response = StreamingHttpResponse(
+            _iter_content_range(content, start, end), status=status, content_type=mime_type)
+    response["Content-Length"] = str(end - start + 1)
+    response["Content-Disposition"] = content_disposition_header(False, filename)
+    return response
+
+
+def _cached_content(request, full_path):
+    """
+    从热点缓存获取文件内容
+    服务器提供 wsgi.file_wrapper 时大文件返回None，交给 sendfile 发送
+    """
+    allow_mmap = 'wsgi.file_wrapper' not in request.META
+    return asset_cache.get(full_path, allow_mmap=allow_mmap)
+
+
+def range_file_response(request, full_path, filename=None, etag=None, last_modified=None, content=None,
+                        mime_type=None):
+    """
+    构造支持 Range 请求的文件响应
+    :param request: HTTP请求对象
+    :param full_path: 文件绝对路径
+    :param filename: 响应中的文件名，默认取路径的文件名部分
+    :param etag: 文件当前的ETag，用于校验 If-Range
+    :param last_modified: 文件最后修改时间戳（秒），用于校验 If-Range
+    :param content: 已缓存的文件内容（bytes 或 mmap），None表示从文件读取
+    :param mime_type: 响应的MIME类型，默认按路径推断
+    :return: 200（完整文件）、206（部分内容）或416（区间无法满足）响应
+    """
+    header = request.META.get('HTTP_RANGE')
+    size = len(content) if content is not None else os.path.getsize(full_path)
+    filename = filename or os.path.basename(full_path)
+    mime_type = mime_type or guess_mime_type(full_path)
+    ranges = None
+    # If-Range 与当前版本不一致（或无法校验）时按规范返回完整文件
+    if header and _if_range_matches(request, etag, last_modified):
+        ranges = parse_range_header(header, size)
+    
+    if ranges is None:
+        if content is not None:
+            response = _content_response(content, 0, size - 1, mime_type, filename)
+        else:
+            response = stream_file_response(full_path, filename, mime_type)
+    elif not ranges:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    elif len(ranges) == 1 and content is not None:
+        start, end = ranges[0]
+        response = _content_response(content, start, end, mime_type, filename, status=206)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = FileResponse(
+            _RangeFile(open(full_path, 'rb'), start, end - start + 1),
+            status=206,
+            content_type=mime_type,
+            filename=filename,
+        )
+        response.block_size = STREAM_CHUNK_SIZE
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        boundary = uuid.uuid4().hex
+        part_headers = [
+            (f'--{boundary}\r\nContent-Type: {mime_type}\r\n'
+             f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode('ascii')
+            for start, end in ranges
+        ]
+        length = (sum(len(h) + end - start + 1 + 2 for h, (start, end) in zip(part_headers, ranges))
+                  + len(f'--{boundary}--\r\n'))
+        response = StreamingHttpResponse(
+            _iter_byteranges(
+                (lambda start, end: _iter_content_range(content, start, end)) if content is not None
+                else (lambda start, end: _iter_file_range(full_path, start, end)),
+                ranges, part_headers, boundary),
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}',
+        )
+        response["Content-Length"] = str(length)
+    
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def file_validators(full_path):
+    """
+    计算文件的强ETag和最后修改时间
+    每次只stat一次文件，(size, mtime, inode) 未变化时复用按路径缓存的ETag
+    :return: (ETag, 最后修改时间戳（秒）)
+    """
+    stat = os.stat(full_path)
+    key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    cached = _validator_cache.get(full_path)
+    if cached is not None and cached[0] == key:
+        etag = cached[1]
+    else:
+        etag = '"' + hashlib.sha1(repr(key).encode('ascii')).hexdigest()[:20] + '"'
+        with _validator_lock:
+            _validator_cache[full_path] = (key, etag)
+    return etag, int(stat.st_mtime)
+
+
+def cache_control_for(full_path):
+    """按扩展名返回 Cache-Control（max-age 为0时要求每次向服务端确认）"""
+    policies = getattr(settings, 'STATIC_CACHE_MAX_AGE', {})
+    extension = os.path.splitext(full_path)[1].lower()
+    max_age = policies.get(extension, DEFAULT_CACHE_MAX_AGE)
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+def _etag_list_matches(header, etag):
+    """If-None-Match 的弱比较（忽略 W/ 前缀，支持 *）"""
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == '*' or tag == etag:
+            return True
+    return False
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """
+    条件请求判断（静态文件和各个带ETag的接口共用）：
+    有 If-None-Match 时只看ETag，否则比较 If-Modified-Since
+    :param request: HTTP请求对象
+    :param etag: 资源当前的ETag
+    :param last_modified: 资源最后修改时间戳（秒），None表示不支持 If-Modified-Since
+    :return: 客户端缓存的版本仍然有效（应返回304）时为True
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return _etag_list_matches(if_none_match, etag)
+    if last_modified is None:
+        return False
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and last_modified <= since
+
+
+def _if_range_matches(request, etag, last_modified):
+    """If-Range 校验：要求强ETag完全相等，或日期与最后修改时间一致"""
+    value = request.META.get('HTTP_IF_RANGE')
+    if value is None:
+        return True
+    value = value.strip()
+    if value.startswith('"'):
+        return etag is not None and value == etag
+    return last_modified is not None and parse_http_date_safe(value) == last_modified
+
+
+def is_compressible(full_path):
+    """判断文件是否需要预先生成 .gz 副本"""
+    return os.path.splitext(full_path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def precompress_file(full_path):
+    """
+    为文件生成 .gz 副本，副本的mtime设置为与源文件相同，用于判断是否过期
+    源文件未变化时不重复压缩；压缩收益不足时删除旧副本
+    :param full_path: 源文件路径
+    :return: 'fresh'（副本已是最新）、'written'（已重新生成）或 'skipped'（不值得压缩）
+    """
+    gz_path = full_path + '.gz'
+    stat = os.stat(full_path)
+    try:
+        if os.stat(gz_path).st_mtime_ns == stat.st_mtime_ns:
+            return 'fresh'
+    except FileNotFoundError:
+        pass
+    
+    with open(full_path, 'rb') as f:
+        data = f.read()
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) > len(data) * (1 - MIN_COMPRESSION_SAVING):
+        if os.path.exists(gz_path):
+            os.remove(gz_path)
+        return 'skipped'
+    
+    # 写入临时文件后原子替换，避免请求读到写了一半的副本
+    fd, tmp_path = tempfile.mkstemp(prefix='.gz-', dir=os.path.dirname(full_path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(compressed)
+        # mkstemp 创建的文件权限为0600，改为与源文件一致，否则以其他用户运行的worker无法读取
+        os.chmod(tmp_path, S_IMODE(stat.st_mode))
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, gz_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return 'written'
+
+
+def compress_static_dir(root):
+    """
+    遍历目录，为所有可压缩文件生成或更新 .gz 副本
+    :return: [(文件路径, 结果)]，结果含义见 precompress_file
+    """
+    results = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            full_path = os.path.join(dirpath, name)
+            if is_compressible(full_path):
+                results.append((full_path, precompress_file(full_path)))
+    return results
+
+
+def accepts_gzip(request):
+    """解析 Accept-Encoding，判断客户端是否接受gzip（q=0 表示拒绝）"""
+    accepted = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted.get('gzip', accepted.get('x-gzip', accepted.get('*', 0.0))) > 0
+
+
+def _fresh_gzip_variant(full_path):
+    """返回与源文件mtime一致的 .gz 副本路径，不存在或已过期时返回None"""
+    gz_path = full_path + '.gz'
+    try:
+        gz_stat = os.stat(gz_path)
+    except OSError:
+        return None
+    return gz_path if gz_stat.st_mtime_ns == os.stat(full_path).st_mtime_ns else None
+
+
+def static_file_response(request, full_path, filename=None, immutable=False, source_path=None):
+    """
+    返回静态文件：条件请求命中时返回304，否则返回支持Range的文件响应
+    客户端接受gzip且存在最新的 .gz 副本时发送副本（Range请求始终使用原文件）
+    所有响应都带有 ETag、Last-Modified 和按扩展名配置的 Cache-Control
+    :param request: HTTP请求对象
+    :param full_path: 实际发送内容的文件绝对路径
+    :param filename: 响应中的文件名，默认取路径的文件名部分
+    :param immutable: 是否通过带内容摘要的文件名访问（长期缓存）
+    :param source_path: 请求的名称自己对应的文件，默认与 full_path 相同。
+        内容相同的文件共用 full_path 发送，而MIME类型、Cache-Control、是否压缩
+        以及 .gz 副本都按 source_path 确定
+    """
+    source_path = source_path or full_path
+    mime_type = guess_mime_type(source_path)
+    etag, last_modified = file_validators(full_path)
+    compressible = is_compressible(source_path)
+    gz_path = None
+    if compressible and 'HTTP_RANGE' not in request.META and accepts_gzip(request):
+        gz_path = _fresh_gzip_variant(source_path)
+    if gz_path is not None:
+        # 不同编码是不同的表示，需要不同的ETag
+        etag = etag[:-1] + '-gz"'
+    
+    if request.method in ('GET', 'HEAD') and is_not_modified(request, etag, last_modified):
+        response = HttpResponseNotModified()
+    elif gz_path is not None:
+        content = _cached_content(request, gz_path)
+        if content is not None:
+            response = _content_response(content, 0, len(content) - 1, mime_type,
+                                         filename or os.path.basename(source_path))
+        else:
+            response = FileResponse(
+                open(gz_path, 'rb'),
+                content_type=mime_type,
+                filename=filename or os.path.basename(source_path),
+            )
+            response.block_size = STREAM_CHUNK_SIZE
+        response["Content-Encoding"] = "gzip"
+        # Range请求会改用原文件，因此仍然声明支持
+        response["Accept-Ranges"] = "bytes"
+    else:
+        response = range_file_response(request, full_path, filename or os.path.basename(source_path),
+                                       etag, last_modified, content=_cached_content(request, full_path),
+                                       mime_type=mime_type)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else cache_control_for(source_path)
+    if compressible:
+        response["Vary"] = "Accept-Encoding"
+    return response
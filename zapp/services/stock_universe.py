@@ -0,0 +1,165 @@
+# zapp/services/stock_universe.py
+"""股票池：把 a.txt 中的 "名称(代码)" 解析为结构化记录
+
+文件只在 (mtime, size) 变化时重新解析，解析结果和各分页的紧凑JSON都缓存在进程内，
+客户端不再下载原始文本、也不用在浏览器里跑正则。
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# 与 index.html 原先使用的正则一致：名称(数字代码)
+STOCK_PATTERN = re.compile(r'([^()]+)\((\d+)\)')
+# 代码前缀 -> 市场，按顺序匹配（长前缀在前）：
+# 沪市 6xxxxx 及B股 900xxx；深市 0xxxxx/3xxxxx 及B股 200xxx；北交所 4xxxxx/8xxxxx 及 920xxx
+MARKET_PREFIXES = (
+    ('920', 'bj'), ('900', 'sh'),
+    ('6', 'sh'), ('0', 'sz'), ('3', 'sz'), ('2', 'sz'), ('4', 'bj'), ('8', 'bj'),
+)
+MARKETS = ('sh', 'sz', 'bj')
+# 文件在读取期间被改写时重新读取的次数
+LOAD_ATTEMPTS = 3
+# 分页参数
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+# 每个数据版本缓存的分页JSON数量
+PAGE_CACHE_MAX_ENTRIES = 32
+# 紧凑格式中每行记录的字段顺序
+FIELDS = ("code", "label", "market")
+
+
+def market_of(code):
+    """根据代码前缀判断市场（sh/sz/bj），无法识别（如基金、债券代码）时返回None"""
+    for prefix, market in MARKET_PREFIXES:
+        if code.startswith(prefix):
+            return market
+    return None
+
+
+def parse_stock_universe(text):
+    """
+    解析 "名称(代码)" 序列
+    :param text: a.txt 的内容
+    :return: [{"code", "label", "market"}]，按文件顺序，重复的代码只保留第一次出现
+    """
+    records = []
+    seen = set()
+    for match in STOCK_PATTERN.finditer(text):
+        label, code = match.group(1).strip(), match.group(2)
+        if not label or code in seen:
+            continue
+        seen.add(code)
+        records.append({"code": code, "label": label, "market": market_of(code)})
+    return records
+
+
+class StockUniverse:
+    """按文件 mtime 缓存的股票池"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._records = []
+        self._pages = OrderedDict()
+
+    def _load(self):
+        """
+        文件变化时重新解析，返回 (签名, 记录列表)
+        签名与记录来自同一次读取：读取前后文件的 (mtime, size) 不一致时重新读取
+        """
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature == self._signature:
+                return self._signature, self._records
+        for _ in range(LOAD_ATTEMPTS):
+            with open(self.path, 'r', encoding='utf-8', errors='ignore') as f:
+                before = os.fstat(f.fileno())
+                text = f.read()
+                after = os.fstat(f.fileno())
+            signature = (after.st_mtime_ns, after.st_size)
+            if signature == (before.st_mtime_ns, before.st_size):
+                break
+        records = parse_stock_universe(text)
+        with self._lock:
+            self._signature, self._records = signature, records
+            self._pages.clear()
+        return signature, records
+
+    def get_version(self):
+        """数据版本（随文件 mtime/size 变化），用作ETag"""
+        return self.get_version_of(self._load()[0])
+
+    def get_page(self, offset=0, limit=DEFAULT_PAGE_SIZE, market=None):
+        """
+        获取一页记录
+        :param offset: 跳过的记录数
+        :param limit: 每页条数（不超过 MAX_PAGE_SIZE）
+        :param market: 只返回该市场（sh/sz/bj）的记录
+        :return: {"total", "offset", "count", "has_more", "items"}
+        :raises ValueError: 参数无效
+        """
+        offset, limit = self._check_page(offset, limit, market)
+        return self._build_page(self._load()[1], offset, limit, market)
+
+    @staticmethod
+    def _build_page(records, offset, limit, market):
+        if market:
+            records = [record for record in records if record["market"] == market]
+        items = records[offset:offset + limit]
+        return {
+            "total": len(records),
+            "offset": offset,
+            "count": len(items),
+            "has_more": offset + len(items) < len(records),
+            "items": items,
+        }
+
+    def get_page_json(self, offset=0, limit=DEFAULT_PAGE_SIZE, market=None):
+        """
+        获取一页记录的紧凑JSON：items 为 [code, label, market] 数组，字段名只在 fields 中出现一次
+        :return: (数据版本, JSON字节)
+        :raises ValueError: 参数无效
+        """
+        offset, limit = self._check_page(offset, limit, market)
+        # 版本和内容取自同一份快照，避免文件在两次读取之间变化时旧ETag配上新数据
+        signature, records = self._load()
+        key = (offset, limit, market)
+        with self._lock:
+            if signature == self._signature and key in self._pages:
+                self._pages.move_to_end(key)
+                return self.get_version_of(signature), self._pages[key]
+
+        page = self._build_page(records, offset, limit, market)
+        page["fields"] = list(FIELDS)
+        page["items"] = [[item[field] for field in FIELDS] for item in page["items"]]
+        body = json.dumps(page, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            # 文件在此期间又变化时不缓存旧数据
+            if signature == self._signature:
+                self._pages[key] = body
+                while len(self._pages) > PAGE_CACHE_MAX_ENTRIES:
+                    self._pages.popitem(last=False)
+        return self.get_version_of(signature), body
+
+    @staticmethod
+    def get_version_of(signature):
+        """由 (mtime_ns, size) 得到数据版本字符串"""
+        mtime_ns, size = signature
+        return f"{mtime_ns:x}-{size:x}"
+
+    @staticmethod
+    def _check_page(offset, limit, market):
+        try:
+            offset = int(offset) if offset not in (None, '') else 0
+            limit = int(limit) if limit not in (None, '') else DEFAULT_PAGE_SIZE
+        except (TypeError, ValueError):
+            raise ValueError("offset and limit must be integers")
+        if offset < 0 or limit <= 0:
+            raise ValueError("offset must be >= 0 and limit must be > 0")
+        if market and market not in MARKETS:
+            raise ValueError("market must be one of sh, sz, bj")
+        return offset, min(limit, MAX_PAGE_SIZE)
@@ -1,4 +1,9 @@
 # stock_api_utils.py
+import asyncio
+import os
+import threading
+import weakref
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -10,6 +15,109 @@ ANDROID_UA = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
 )
 
+DEFAULT_HEADERS = {
+    'User-Agent': ANDROID_UA,
+    'Referer': 'https://finance.baidu.com/',
+    'Accept': 'application/json, text/javascript, */*; q=0.01'
+}
+
+# 共享连接池参数：缓存的主机连接池数量、每个主机保持的最大长连接数
+HTTP_POOL_CONNECTIONS = int(os.environ.get('STOCK_HTTP_POOL_CONNECTIONS', '4'))
+HTTP_POOL_MAXSIZE = int(os.environ.get('STOCK_HTTP_POOL_MAXSIZE', '16'))
+
+# 异步客户端参数：最大并发连接数、保持的空闲长连接数及其存活时间（秒）
+ASYNC_MAX_CONNECTIONS = int(os.environ.get('STOCK_ASYNC_MAX_CONNECTIONS', '100'))
+ASYNC_MAX_KEEPALIVE = int(os.environ.get('STOCK_ASYNC_MAX_KEEPALIVE', '20'))
+ASYNC_KEEPALIVE_EXPIRY = 30.0
+# 与同步 Session 的 Retry 配置一致
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_session_counters = {"requests": 0, "errors": 0}
+
+
+def retry_backoff(retry: int) -> float:
+    """
+    第 retry 次重试（从1开始）前的等待时间（秒）
+
+    与 urllib3 Retry 的退避一致：第一次重试立即进行，之后为 backoff_factor * 2 ** (retry - 1)
+    """
+    return 0.0 if retry <= 1 else RETRY_BACKOFF_FACTOR * (2 ** (retry - 1))
+
+
+def get_shared_session() -> requests.Session:
+    """
+    获取当前进程共享的 requests Session
+
+    所有请求复用同一个带重试的 HTTPAdapter 及其长连接池，避免每次都重新进行
+    TCP+TLS 握手；fork 出的子进程会重新创建（连接不能跨进程共享）。
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                # 不按 Retry-After 等待：上游给出的等待时间没有上限，会使请求时长无法预估
+                retry = Retry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR,
+                              status_forcelist=list(RETRY_STATUS_FORCELIST),
+                              respect_retry_after_header=False)
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    max_retries=retry,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session, _session_pid = session, pid
+                _session_counters.update(requests=0, errors=0)
+    return _session
+
+
+def _count(name: str) -> None:
+    with _session_lock:
+        _session_counters[name] += 1
+
+
+def get_session_stats() -> Dict[str, Any]:
+    """
+    共享 Session 的连接复用统计
+
+    Returns:
+        dict: 请求数、失败数、实际新建的连接数、每个主机的连接数/请求数，
+              以及连接复用率（1 - 新建连接数 / 发出的HTTP请求数，包含重试）
+    """
+    stats = {
+        "pid": os.getpid(),
+        "pool_connections": HTTP_POOL_CONNECTIONS,
+        "pool_maxsize": HTTP_POOL_MAXSIZE,
+        "requests": _session_counters["requests"],
+        "errors": _session_counters["errors"],
+        "connections_opened": 0,
+        "http_requests": 0,
+        "reuse_ratio": None,
+        "hosts": {},
+    }
+    if _session is None or _session_pid != os.getpid():
+        return stats
+    pools = _session.get_adapter('https://').poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        host = f"{pool.scheme}://{pool.host}:{pool.port}"
+        stats["hosts"][host] = {"connections_opened": pool.num_connections, "http_requests": pool.num_requests}
+        stats["connections_opened"] += pool.num_connections
+        stats["http_requests"] += pool.num_requests
+    if stats["http_requests"]:
+        stats["reuse_ratio"] = round(1 - stats["connections_opened"] / stats["http_requests"], 4)
+    return stats
+
 class StockApiUtils:
     """
     股票API工具类，用于获取股票数据
@@ -17,15 +125,19 @@ class StockApiUtils:
     """
     
     BASE_URL = "https://finance.pae.baidu.com/"
+    # 支持的K线类型
+    KTYPES = ('day', 'week', 'month')
     
-    def __init__(self, stock_code: str):
+    def __init__(self, stock_code: str, ktype: str = 'day'):
         """
         初始化StockApiUtils实例
         
         Args:
             stock_code: 股票代码（如：sh600519, sz000001）
+            ktype: K线类型（day / week / month），默认日K
         """
         self.stock_code = stock_code
+        self.ktype = ktype
     
     def _build_request_url(self) -> str:
         """构建股票数据请求URL"""
@@ -39,7 +151,7 @@ class StockApiUtils:
             'finClientType': 'pc',
             'query': self.stock_code,
             'code': self.stock_code,
-            'ktype': 'day'
+            'ktype': self.ktype
         }
         return f"{self.BASE_URL}vapi/v1/getquotation?{urlencode(params)}"
     
@@ -59,22 +171,16 @@ class StockApiUtils:
         """
         url = self._build_request_url()
         
-        # 使用 requests Session 并配置重试，以提高稳定性
-        session = requests.Session()
-        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
-        session.mount('https://', HTTPAdapter(max_retries=retries))
-
-        headers = {
-            'User-Agent': ANDROID_UA,
-            'Referer': 'https://finance.baidu.com/',
-            'Accept': 'application/json, text/javascript, */*; q=0.01'
-        }
+        # 复用进程级共享 Session（带重试和长连接池），避免每次请求重新握手
+        session = get_shared_session()
+        _count("requests")
 
         try:
-            response = session.get(url, timeout=timeout, headers=headers)
+            response = session.get(url, timeout=timeout)
             response.raise_for_status()
             data = response.json()
         except requests.exceptions.RequestException as e:
+            _count("errors")
             data = {'success': False, 'error': str(e)}
         
         if callback:
@@ -83,3 +189,88 @@ class StockApiUtils:
         return data
 
 
+# 事件循环 -> (共享的 AsyncClient, 负责关闭它的异步生成器)（客户端的连接绑定在创建它的事件循环上）
+_async_clients = weakref.WeakKeyDictionary()
+
+
+async def _close_with_loop(client: httpx.AsyncClient):
+    """
+    在事件循环关闭时关闭客户端
+
+    启动后挂起在 yield 处；asyncio.run 等在关闭事件循环前会调用 loop.shutdown_asyncgens()，
+    此时执行 finally 关闭客户端及其连接。
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def get_async_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环共享的 httpx.AsyncClient（带长连接和连接数上限）
+
+    ASGI 部署时每个进程只有一个事件循环，所有异步请求复用同一个连接池。
+    WSGI 下异步视图由 async_to_sync 为每个请求新建并关闭事件循环，客户端随事件循环一起关闭，
+    不会在每个请求后遗留未关闭的客户端。
+    """
+    loop = asyncio.get_running_loop()
+    client, _ = _async_clients.get(loop, (None, None))
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            limits=httpx.Limits(
+                max_connections=ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_MAX_KEEPALIVE,
+                keepalive_expiry=ASYNC_KEEPALIVE_EXPIRY,
+            ),
+        )
+        closer = _close_with_loop(client)
+        await closer.__anext__()
+        _async_clients[loop] = (client, closer)
+    return client
+
+
+class AsyncStockApiUtils(StockApiUtils):
+    """
+    StockApiUtils 的异步版本（基于 httpx.AsyncClient）
+    请求URL与同步版本完全相同，等待上游响应时不占用worker线程
+    """
+
+    async def fetch_stock_data(self, timeout: int = 30) -> Dict[str, Any]:
+        """
+        发送股票数据请求（异步方法）
+
+        对连接错误以及 429/5xx 响应重试，重试次数和等待时间与同步 Session 的 urllib3 Retry 相同：
+        第一次重试立即进行，之后等待 backoff_factor * 2 ** (n - 1) 秒（见 retry_backoff）
+
+        Args:
+            timeout: 单次请求超时时间（秒），默认30秒
+
+        Returns:
+            响应字典；失败时返回 {'success': False, 'error': ...}
+        """
+        url = self._build_request_url()
+        client = await get_async_client()
+        _count("requests")
+
+        for attempt in range(RETRY_TOTAL + 1):
+            if attempt:
+                await asyncio.sleep(retry_backoff(attempt))
+            try:
+                response = await client.get(url, timeout=timeout)
+                if response.status_code in RETRY_STATUS_FORCELIST and attempt < RETRY_TOTAL:
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except httpx.TransportError as e:
+                error = e
+                if attempt < RETRY_TOTAL:
+                    continue
+            except (httpx.HTTPError, ValueError) as e:
+                # 其余 httpx 错误（状态码、解码、重定向过多等）同样返回失败结果，由视图返回502
+                error = e
+            break
+
+        _count("errors")
+        return {'success': False, 'error': str(error) or type(error).__name__}
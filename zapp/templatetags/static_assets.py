@@ -0,0 +1,12 @@
+# zapp/templatetags/static_assets.py
+from django import template
+
+from ..services.static_manifest import get_static_manifest
+
+register = template.Library()
+
+
+@register.filter
+def hashed(name):
+    """静态文件名 -> 带内容摘要的文件名（可长期缓存），如 {{ 'DS-DIGIB.TTF'|hashed }}"""
+    return get_static_manifest().url_name(name)
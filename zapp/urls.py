@@ -9,16 +9,33 @@ urlpatterns = [
     path('api/timestamp/', views.timestamp_api, name='timestamp_api'),
     path('api/getAllCodes/', views.get_all_codes, name='get_all_codes'),
     path('api/fetch_stock/', views.fetch_stock, name='fetch_stock'),
+    path('api/fetch_stocks/', views.fetch_stocks, name='fetch_stocks'),
+    path('api/stocks/kline/', views.stock_kline, name='stock_kline'),
+    path('api/async/fetch_stock/', views.async_fetch_stock, name='async_fetch_stock'),
+    path('api/stocks/', views.stock_list, name='stock_list'),
+    path('api/stocks/session/', views.stock_session_stats, name='stock_session_stats'),
+    path('api/stocks/cache/', views.stock_cache_stats, name='stock_cache_stats'),
     # 备忘录接口
     path('api/memos/', views.get_all_memos, name='get_all_memos'),
     path('api/memos/add/', views.add_memo, name='add_memo'),
     path('api/memos/delete/', views.delete_memo, name='delete_memo'),
     path('api/memos/search/', views.search_memos, name='search_memos'),
+    path('api/memos/batch_add/', views.add_memos, name='add_memos'),
+    path('api/memos/batch_delete/', views.delete_memos, name='delete_memos'),
+    path('api/memos/lexicon/', views.lexicon_stats, name='lexicon_stats'),
+    # 备忘录异步接口（ASGI）
+    path('api/async/memos/', views.async_get_all_memos, name='async_get_all_memos'),
+    path('api/async/memos/add/', views.async_add_memo, name='async_add_memo'),
+    path('api/async/memos/delete/', views.async_delete_memo, name='async_delete_memo'),
+    path('api/async/memos/search/', views.async_search_memos, name='async_search_memos'),
+    # 批量内容审核接口
+    path('api/moderation/check/', views.check_contents, name='check_contents'),
     path('index', views.index, name='index'),
     path('index/', views.index_with_slash, name='index_with_slash'),
     path('notebook', views.notebook, name='notebook'),
     # 锻炼计时器页面
     path('duanlian', views.duanlian, name='duanlian'),
     # 静态文件访问接口
+    path('api/static/stats/', views.static_cache_stats, name='static_cache_stats'),
     path('static/<path:file_path>', views.static_file_access, name='static_file_access'),
 ]
\ No newline at end of file
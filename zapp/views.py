@@ -1,13 +1,24 @@
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render  # 关键：必须导入render！
 from django.conf import settings
 import time
-import os
-from .services.file_service import get_directory_contents, read_file
-from .services.memo_service import memo_service
-from .stock_api_utils import StockApiUtils
+import json
+import posixpath
+from django.utils.http import http_date
+from .services.file_service import get_directory_listing, get_base64_response
+from .services.asset_cache import asset_cache
+from .services.static_manifest import get_static_manifest
+from .services.static_service import is_not_modified, static_file_response
+from .services.memo_service import memo_service, async_memo_service, DEFAULT_PAGE_SIZE
+from .services.kline import build_compact_kline, parse_columns, parse_indicators, parse_kline_cached
+from .services.quote_batch import iter_quotes, parse_codes, parse_deadline
+from .services.quote_cache import quote_cache
+from .services.stock_universe import StockUniverse
+from .stock_api_utils import StockApiUtils, AsyncStockApiUtils, get_session_stats
 from django.views.decorators.http import require_GET, require_POST
+stock_universe = StockUniverse(settings.STOCK_UNIVERSE_FILE)
+
 def chat_page(request):
     return render(request, 'zapp/chat.html')  # 渲染测试页面
 
@@ -44,9 +55,28 @@ def get_all_codes(request):
                 "message": "Server configuration error: ASSETS_DIR not set"
             }, status=500)
 
-        result = get_directory_contents(assets_dir)
-        # 根据业务逻辑的结果返回响应
-        return JsonResponse(result, status=result["code"])
+        try:
+            params = _directory_list_params(request)
+        except ValueError:
+            return JsonResponse({
+                "code": 400,
+                "data": None,
+                "message": "参数错误：limit/offset/preview 必须是整数"
+            }, status=400)
+
+        result, body, etag, last_modified = get_directory_listing(assets_dir, **params)
+        if body is None:
+            # 出错或读取期间目录发生变化（未缓存）
+            return JsonResponse(result, status=result["code"])
+
+        headers = {"Last-Modified": http_date(last_modified), "Cache-Control": "no-cache"}
+        if is_not_modified(request, etag, last_modified):
+            return _not_modified(etag, headers)
+        response = HttpResponse(body, content_type='application/json')
+        response["ETag"] = etag
+        for name, value in headers.items():
+            response[name] = value
+        return response
     else:
         return JsonResponse({
             "code": 405,
@@ -54,6 +84,20 @@ def get_all_codes(request):
             "message": "Method not allowed (仅支持GET)"
         }, status=405)
 
+def _directory_list_params(request):
+    """解析目录列表接口的过滤、分页和内容参数（整数参数无效时抛出ValueError）"""
+    def optional_int(name):
+        value = request.GET.get(name)
+        return int(value) if value not in (None, '') else None
+
+    return {
+        "limit": optional_int('limit'),
+        "offset": optional_int('offset') or 0,
+        "pattern": request.GET.get('pattern') or None,
+        "content_pattern": request.GET.get('content') or None,
+        "preview_size": optional_int('preview'),
+    }
+
 def index(request):
     # 直接渲染homepage.html模板，无需传递数据
     return render(request, 'zapp/homepage.html')
@@ -63,13 +107,13 @@ def index_with_slash(request):
     return render(request, 'zapp/index.html')
 
 def notebook(request):
-    # 在服务端获取所有备忘录数据
+    # 在服务端只获取第一页备忘录，其余由页面滚动时按游标加载
     try:
-        memos = memo_service.get_all_memos()
+        page = memo_service.get_memos_page()
     except Exception as e:
-        memos = []
+        page = {"items": [], "next_before_id": None, "has_more": False}
     # 将备忘录数据传递给模板
-    return render(request, 'zapp/memo.html', {'initial_memos': memos})
+    return render(request, 'zapp/memo.html', {'initial_memos': page})
 
 
 @require_GET
@@ -78,34 +122,240 @@ def fetch_stock(request):
 
     GET 参数:
         code: 股票代码（例如 003029 或 sh600519）
+        ktype: K线类型（day / week / month），默认 day
+
+    结果按 (code, ktype) 短时缓存，响应头 X-Cache 标明 HIT / STALE / MISS / COALESCED
     """
     code = request.GET.get('code')
     if not code:
         return JsonResponse({"code": 400, "data": None, "message": "Missing 'code' parameter"}, status=400)
+    ktype = request.GET.get('ktype') or 'day'
+    if ktype not in StockApiUtils.KTYPES:
+        return JsonResponse({"code": 400, "data": None, "message": "Invalid 'ktype' parameter"}, status=400)
 
     # 支持用户传入例如 '003029' 或 'sh003029' 等，如果没有市场前缀，默认尝试原样使用
-    stock_api = StockApiUtils(code)
-    result = stock_api.fetch_stock_data()
+    result, cache_status = quote_cache.get(
+        (code, ktype), lambda: StockApiUtils(code, ktype).fetch_stock_data())
 
     # 如果 fetch_stock_data 返回 {'success': False, 'error': ...} 则映射为 502
     if isinstance(result, dict) and result.get('success') is False:
-        return JsonResponse({"code": 502, "data": None, "message": result.get('error')} , status=502)
+        response = JsonResponse({"code": 502, "data": None, "message": result.get('error')} , status=502)
+    else:
+        # 否则返回获取到的原始数据（状态码200）
+        response = JsonResponse({"code": 200, "data": result, "message": "success"})
+    response["X-Cache"] = cache_status
+    return response
+
+
+@require_GET
+def stock_kline(request):
+    """获取单只股票的紧凑K线数据及服务端计算的技术指标
+
+    GET 参数:
+        code: 股票代码
+        ktype: K线类型（day / week / month），默认 day
+        columns: 返回的列，逗号分隔（date,open,high,low,close,volume），默认全部
+        indicators: 指标，逗号分隔，如 ma5,ma20,ema12,macd,rsi,boll
+        limit: 只返回最近的若干根K线（指标仍按完整序列计算）
+
+    返回 {"count", "fields", "columns"}，columns 与 fields 一一对应，缺失值为 null
+    """
+    code = request.GET.get('code')
+    if not code:
+        return JsonResponse({"code": 400, "data": None, "message": "Missing 'code' parameter"}, status=400)
+    ktype = request.GET.get('ktype') or 'day'
+    if ktype not in StockApiUtils.KTYPES:
+        return JsonResponse({"code": 400, "data": None, "message": "Invalid 'ktype' parameter"}, status=400)
+    try:
+        columns = parse_columns(request.GET.get('columns'))
+        specs = parse_indicators(request.GET.get('indicators'))
+        limit = request.GET.get('limit')
+        limit = int(limit) if limit else None
+        if limit is not None and limit <= 0:
+            raise ValueError("limit must be > 0")
+    except ValueError as e:
+        return JsonResponse({"code": 400, "data": None, "message": str(e)}, status=400)
+
+    result, cache_status = quote_cache.get(
+        (code, ktype), lambda: StockApiUtils(code, ktype).fetch_stock_data())
+    if isinstance(result, dict) and result.get('success') is False:
+        response = JsonResponse({"code": 502, "data": None, "message": result.get('error')}, status=502)
+    else:
+        try:
+            kline = parse_kline_cached((code, ktype), result)
+        except ValueError as e:
+            response = JsonResponse({"code": 502, "data": None, "message": str(e)}, status=502)
+        else:
+            data = build_compact_kline(kline, columns, specs, limit)
+            data.update(stock_code=code, ktype=ktype)
+            response = JsonResponse({"code": 200, "data": data, "message": "success"},
+                                    json_dumps_params={"ensure_ascii": False, "separators": (',', ':')})
+    response["X-Cache"] = cache_status
+    return response
+
+
+@require_GET
+async def async_fetch_stock(request):
+    """获取单只股票的数据（异步版本，参数与 fetch_stock 相同）
+
+    基于 httpx.AsyncClient，等待上游时不占用worker线程；ASGI 部署时单个进程可同时处理大量行情请求。
+    未过期的缓存直接返回，否则请求上游并写入缓存（异步路径不做请求合并）
+    """
+    code = request.GET.get('code')
+    if not code:
+        return JsonResponse({"code": 400, "data": None, "message": "Missing 'code' parameter"}, status=400)
+    ktype = request.GET.get('ktype') or 'day'
+    if ktype not in StockApiUtils.KTYPES:
+        return JsonResponse({"code": 400, "data": None, "message": "Invalid 'ktype' parameter"}, status=400)
+
+    result = quote_cache.peek((code, ktype))
+    cache_status = "HIT"
+    if result is None:
+        result = await AsyncStockApiUtils(code, ktype).fetch_stock_data()
+        quote_cache.put((code, ktype), result)
+        cache_status = "MISS"
+
+    if isinstance(result, dict) and result.get('success') is False:
+        response = JsonResponse({"code": 502, "data": None, "message": result.get('error')}, status=502)
+    else:
+        response = JsonResponse({"code": 200, "data": result, "message": "success"})
+    response["X-Cache"] = cache_status
+    return response
 
-    # 否则返回获取到的原始数据（状态码200）
-    return JsonResponse({"code": 200, "data": result, "message": "success"})
+
+@require_GET
+def fetch_stocks(request):
+    """批量获取多只股票的数据（有界并发，单只失败不影响其他）
+
+    GET 参数:
+        codes: 逗号分隔的股票代码（最多500个）
+        ktype: K线类型（day / week / month），默认 day
+        deadline: 整体截止时间（秒），默认15，最大25；到期未完成的股票标记为 timeout
+        stream: 为1时以 NDJSON 流式返回，每完成一只股票输出一行
+    """
+    try:
+        codes = parse_codes(request.GET.get('codes'))
+        deadline = parse_deadline(request.GET.get('deadline'))
+    except ValueError as e:
+        return JsonResponse({"code": 400, "data": None, "message": str(e)}, status=400)
+    ktype = request.GET.get('ktype') or 'day'
+    if ktype not in StockApiUtils.KTYPES:
+        return JsonResponse({"code": 400, "data": None, "message": "Invalid 'ktype' parameter"}, status=400)
+
+    results = iter_quotes(codes, ktype, deadline)
+    if request.GET.get('stream') == '1':
+        lines = (json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n' for item in results)
+        response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        # 禁止反向代理缓冲，保证结果逐条到达
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    items = list(results)
+    return JsonResponse({
+        "code": 200,
+        "data": {
+            "results": items,
+            "total": len(items),
+            "failed": sum(1 for item in items if not item["ok"]),
+            "timed_out": sum(1 for item in items if item.get("error") == "timeout"),
+        },
+        "message": "success"
+    })
+
+
+@require_GET
+def stock_session_stats(request):
+    """行情接口共享连接池的复用统计（当前worker进程）"""
+    return JsonResponse({"code": 200, "data": get_session_stats(), "message": "success"})
+
+
+@require_GET
+def stock_cache_stats(request):
+    """行情缓存统计：命中、过期命中、未命中、请求合并次数（当前worker进程）"""
+    return JsonResponse({"code": 200, "data": quote_cache.get_stats(), "message": "success"})
+
+
+@require_GET
+def stock_list(request):
+    """股票池（由 a.txt 解析，文件变化前只解析一次）
+
+    GET 参数（均可选）:
+        offset: 跳过的记录数，默认0
+        limit: 每页条数，默认1000，最大10000
+        market: 只返回 sh / sz / bj 市场的股票
+    data.items 为 [code, label, market] 数组，字段顺序见 data.fields
+    """
+    try:
+        etag = f'"stocks-{stock_universe.get_version()}"'
+        if is_not_modified(request, etag):
+            return _not_modified(etag, {"Cache-Control": "no-cache"})
+        version, body = stock_universe.get_page_json(
+            request.GET.get('offset'), request.GET.get('limit'), request.GET.get('market') or None)
+    except ValueError as e:
+        return JsonResponse({"code": 400, "data": None, "message": str(e)}, status=400)
+    except FileNotFoundError:
+        return JsonResponse({"code": 404, "data": None, "message": "股票池文件不存在"}, status=404)
+    response = HttpResponse(b'{"code":200,"data":' + body + b',"message":"success"}',
+                            content_type='application/json')
+    response["ETag"] = f'"stocks-{version}"'
+    response["Cache-Control"] = "no-cache"
+    return response
 
 
 # 备忘录接口
 @csrf_exempt
 @require_GET
 def get_all_memos(request):
-    """获取所有备忘录"""
+    """获取备忘录
+
+    GET 参数（可选，任一存在时按游标分页返回）:
+        before_id: 只返回id小于该值的备忘录
+        limit: 每页条数
+    不带参数时返回全部备忘录（兼容旧调用方）
+
+    响应带有基于数据版本号的ETag，客户端携带 If-None-Match 且数据未变化时返回304
+    """
     try:
-        memos = memo_service.get_all_memos()
-        return JsonResponse({"code": 200, "data": memos, "message": "success"})
+        before_id, limit = _memo_list_params(request)
+        etag = f'"memos-v{memo_service.get_data_version()}"'
+        if is_not_modified(request, etag):
+            return _not_modified(etag, {"Cache-Control": "no-cache"})
+        return _memo_list_response(*memo_service.get_memos_json(before_id=before_id, limit=limit))
+    except ValueError as e:
+        return JsonResponse({"code": 400, "data": None, "message": str(e)})
     except Exception as e:
         return JsonResponse({"code": 500, "data": None, "message": str(e)})
 
+
+def _memo_list_params(request):
+    """解析列表接口的分页参数 (before_id, limit)"""
+    before_id = request.GET.get('before_id') or None
+    limit = request.GET.get('limit') or None
+    if before_id is not None and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    return before_id, limit
+
+
+def _memo_list_response(version, body):
+    """用缓存的JSON字节构造列表响应"""
+    response = HttpResponse(
+        b'{"code":200,"data":' + body + b',"message":"success"}',
+        content_type='application/json'
+    )
+    response["ETag"] = f'"memos-v{version}"'
+    # 允许浏览器缓存，但每次使用前都要用ETag向服务端确认
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def _not_modified(etag, headers=None):
+    """构造304响应，保留ETag及缓存相关响应头"""
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
 @csrf_exempt
 @require_POST
 def add_memo(request):
@@ -135,6 +385,54 @@ def delete_memo(request):
     except Exception as e:
         return JsonResponse({"code": 500, "data": None, "message": str(e)})
 
+def _parse_json_body(request):
+    """解析JSON对象请求体，格式无效时返回None"""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+@csrf_exempt
+@require_POST
+def add_memos(request):
+    """批量添加备忘录
+
+    请求体(JSON): {"contents": ["...", "..."]}
+    有效条目在同一个事务中写入，无效条目在 errors 中按下标返回
+    """
+    payload = _parse_json_body(request)
+    if payload is None or 'contents' not in payload:
+        return JsonResponse({"code": 400, "data": None, "message": "Missing 'contents' field"}, status=400)
+    try:
+        result = memo_service.add_memos(payload['contents'])
+        return JsonResponse({"code": 200, "data": result, "message": "success"})
+    except ValueError as e:
+        return JsonResponse({"code": 400, "data": None, "message": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"code": 500, "data": None, "message": str(e)})
+
+
+@csrf_exempt
+@require_POST
+def delete_memos(request):
+    """批量删除备忘录
+
+    请求体(JSON): {"ids": [1, 2, 3]}
+    """
+    payload = _parse_json_body(request)
+    if payload is None or 'ids' not in payload:
+        return JsonResponse({"code": 400, "data": None, "message": "Missing 'ids' field"}, status=400)
+    try:
+        result = memo_service.delete_memos(payload['ids'])
+        return JsonResponse({"code": 200, "data": result, "message": "success"})
+    except ValueError as e:
+        return JsonResponse({"code": 400, "data": None, "message": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"code": 500, "data": None, "message": str(e)})
+
+
 @csrf_exempt
 @require_GET
 def search_memos(request):
@@ -148,61 +446,144 @@ def search_memos(request):
     except Exception as e:
         return JsonResponse({"code": 500, "data": None, "message": str(e)})
 
+# 备忘录异步接口（ASGI部署时使用，数据库操作在专用线程池中执行，不阻塞事件循环）
+@csrf_exempt
+@require_GET
+async def async_get_all_memos(request):
+    """获取备忘录（异步版本，参数与 get_all_memos 相同）"""
+    try:
+        before_id, limit = _memo_list_params(request)
+        etag = f'"memos-v{await async_memo_service.get_data_version()}"'
+        if is_not_modified(request, etag):
+            return _not_modified(etag, {"Cache-Control": "no-cache"})
+        return _memo_list_response(*await async_memo_service.get_memos_json(before_id=before_id, limit=limit))
+    except ValueError as e:
+        return JsonResponse({"code": 400, "data": None, "message": str(e)})
+    except Exception as e:
+        return JsonResponse({"code": 500, "data": None, "message": str(e)})
+
+@csrf_exempt
+@require_POST
+async def async_add_memo(request):
+    """添加新备忘录（异步版本）"""
+    try:
+        content = request.POST.get('content', '').strip()
+        if not content:
+            return JsonResponse({"code": 400, "data": None, "message": "Content cannot be empty"})
+        new_memo = await async_memo_service.add_memo(content)
+        return JsonResponse({"code": 200, "data": new_memo, "message": "success"})
+    except Exception as e:
+        return JsonResponse({"code": 500, "data": None, "message": str(e)})
+
+@csrf_exempt
+@require_POST
+async def async_delete_memo(request):
+    """删除备忘录（异步版本）"""
+    try:
+        memo_id = request.POST.get('id')
+        if not memo_id:
+            return JsonResponse({"code": 400, "data": None, "message": "ID cannot be empty"})
+        success = await async_memo_service.delete_memo(int(memo_id))
+        if success:
+            return JsonResponse({"code": 200, "data": None, "message": "success"})
+        else:
+            return JsonResponse({"code": 404, "data": None, "message": "Memo not found"})
+    except Exception as e:
+        return JsonResponse({"code": 500, "data": None, "message": str(e)})
+
+@csrf_exempt
+@require_GET
+async def async_search_memos(request):
+    """搜索备忘录（异步版本）"""
+    try:
+        keyword = request.GET.get('keyword', '').strip()
+        if not keyword:
+            return JsonResponse({"code": 400, "data": None, "message": "Keyword cannot be empty"})
+        memos = await async_memo_service.search_memos(keyword)
+        return JsonResponse({"code": 200, "data": memos, "message": "success"})
+    except Exception as e:
+        return JsonResponse({"code": 500, "data": None, "message": str(e)})
+
+
+@require_GET
+def lexicon_stats(request):
+    """敏感词库指标：当前版本、词条数、最近一次重建耗时等"""
+    return JsonResponse({"code": 200, "data": memo_service.get_lexicon_stats(), "message": "success"})
+
+
+@csrf_exempt
+@require_POST
+def check_contents(request):
+    """批量内容审核
+
+    请求体(JSON): {"texts": ["...", "..."]}
+    返回每条文本是否包含敏感词以及命中的位置
+    """
+    payload = _parse_json_body(request)
+    if payload is None:
+        return JsonResponse({"code": 400, "data": None, "message": "Invalid JSON body"}, status=400)
+    texts = payload.get('texts')
+    if texts is None:
+        return JsonResponse({"code": 400, "data": None, "message": "Missing 'texts' field"}, status=400)
+    try:
+        results = memo_service.check_contents(texts)
+    except ValueError as e:
+        return JsonResponse({"code": 400, "data": None, "message": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"code": 500, "data": None, "message": str(e)}, status=500)
+    return JsonResponse({
+        "code": 200,
+        "data": {
+            "count": len(results),
+            "sensitive_count": sum(1 for item in results if item["sensitive"]),
+            "results": results,
+        },
+        "message": "success",
+    })
+
 
 def duanlian(request):
     """锻炼计时器页面"""
     return render(request, 'zapp/duanlian.html')
 
+@require_GET
+def static_cache_stats(request):
+    """静态文件热点缓存指标：命中/未命中次数、缓存及映射的字节数"""
+    return JsonResponse({"code": 200, "data": asset_cache.get_stats(), "message": "success"})
+
+
 @require_GET
 def static_file_access(request, file_path):
     """
-    静态文件访问接口，支持二进制和base64格式返回
+    静态文件访问接口，支持二进制（流式）和base64格式返回
     :param request: HTTP请求对象
     :param file_path: 文件路径（相对于静态文件目录）
     :return: 静态文件内容或错误响应
     """
     try:
-        # 确定静态文件目录
-        static_dirs = [settings.STATIC_ROOT] + list(settings.STATICFILES_DIRS)
+        # 在静态文件清单中查找（支持带内容摘要的文件名）
+        entry, immutable = get_static_manifest().resolve(file_path)
         
-        # 查找文件在哪个静态目录中
-        found_file = None
-        for static_dir in static_dirs:
-            full_path = os.path.join(static_dir, file_path)
-            if os.path.exists(full_path) and os.path.isfile(full_path):
-                found_file = full_path
-                break
-        
-        if not found_file:
+        if entry is None:
             return JsonResponse({"code": 404, "data": None, "message": "文件不存在"}, status=404)
+        found_file = entry["path"]
         
         # 获取返回格式
         return_type = request.GET.get('format', 'binary')
         
-        # 读取文件
-        result = read_file(found_file, return_type)
+        if return_type != 'base64':
+            # 返回二进制文件：流式发送，支持Range和条件请求
+            # 内容相同的文件共用 found_file，MIME类型和缓存策略按请求的文件确定
+            return static_file_response(request, found_file, posixpath.basename(entry["name"]), immutable,
+                                        source_path=entry["source"])
         
-        if result["code"] != 200:
-            return JsonResponse(result, status=result["code"])
-        
-        data = result["data"]
-        
-        # 根据返回格式构建响应
-        if return_type == 'base64':
-            return JsonResponse({
-                "code": 200,
-                "data": {
-                    "content": data["content"],
-                    "mime_type": data["mime_type"],
-                    "encoding": data["encoding"]
-                },
-                "message": "success"
-            })
-        else:
-            # 返回二进制文件
-            response = HttpResponse(data["content"], content_type=data["mime_type"])
-            response["Content-Disposition"] = f"inline; filename*=utf-8''{os.path.basename(file_path)}"
-            return response
+        # base64格式：小文件使用缓存的编码结果，大文件流式编码
+        body, length = get_base64_response(found_file, entry["mime_type"])
+        if isinstance(body, bytes):
+            return HttpResponse(body, content_type='application/json')
+        response = StreamingHttpResponse(body, content_type='application/json')
+        response["Content-Length"] = str(length)
+        return response
     
     except Exception as e:
         return JsonResponse({"code": 500, "data": None, "message": f"服务器错误：{str(e)}"}, status=500)
\ No newline at end of file
@@ -124,6 +124,13 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'assets'),  # 添加assets目录到静态文件搜索路径
 ]
 
+# static_file_access 的浏览器缓存时间（秒），按扩展名配置，0 表示每次都向服务端确认
+STATIC_CACHE_MAX_AGE = {
+    '.ttf': 30 * 24 * 3600,  # 字体几乎不会变化
+    '.mp3': 7 * 24 * 3600,
+    '.txt': 0,  # 股票代码列表可能随时更新
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -137,4 +144,6 @@ CHANNEL_LAYERS = {
     }
 }
 
-ASSETS_DIR = Path(os.getenv("ASSETS_DIR", BASE_DIR / "assets"))
\ No newline at end of file
+ASSETS_DIR = Path(os.getenv("ASSETS_DIR", BASE_DIR / "assets"))
+# 股票池文件（"名称(代码)" 序列），由 /api/stocks/ 解析后提供
+STOCK_UNIVERSE_FILE = Path(os.getenv("STOCK_UNIVERSE_FILE", ASSETS_DIR / "a.txt"))
\ No newline at end of file